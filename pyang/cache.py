@@ -0,0 +1,161 @@
+"""Persistent on-disk cache of parsed modules"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+import pyang
+from . import error
+from . import yang_parser
+
+FORMAT = 2
+"""Version of the layout of the cached trees.  Increment when the
+attributes of Statement or Position change, so that the trees cached
+by an older layout are not used."""
+
+
+def get_cache_dir():
+    """Return the directory where pyang keeps its persistent caches.
+
+    Follows the XDG base directory specification, i.e.,
+    `$XDG_CACHE_HOME/pyang`, defaulting to `~/.cache/pyang`.
+    """
+    cachehome = os.getenv('XDG_CACHE_HOME')
+    if not cachehome:
+        cachehome = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cachehome, 'pyang')
+
+
+def write_file_atomic(filename, data):
+    """Atomically write the bytes `data` to `filename`.
+
+    Errors are silently ignored; a cache that cannot be written is
+    just not used.
+    """
+    dirname = os.path.dirname(filename)
+    try:
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmpname = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmpname, filename)
+        return True
+    except OSError:
+        try:
+            os.remove(tmpname)
+        except OSError:
+            pass
+        return False
+
+
+def _make_private_dir(dirname):
+    """Create the directory `dirname`, readable and writable by the user
+    only, if it does not exist.
+
+    Return True if the directory is owned by the user, and cannot be
+    written by anyone else, otherwise False.
+    """
+    try:
+        os.makedirs(dirname, mode=0o700, exist_ok=True)
+        st = os.stat(dirname)
+    except OSError:
+        return False
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        return False
+    return st.st_mode & 0o022 == 0
+
+
+class ParseCache(object):
+    """Content-addressed cache of raw YANG statement trees.
+
+    The tree produced by the YANG parser is stored on disk, keyed by
+    a hash of the module text and the parser options that affect the
+    result.  The trees are stored before any validation is done, so a
+    cached tree is equivalent to a freshly parsed one.
+
+    The trees are stored with pickle, and loading a pickle can run
+    arbitrary code.  The cache directory is therefore created readable
+    and writable by the user only, and it is not used at all unless it
+    is owned by the user and cannot be written by others.
+    """
+
+    def __init__(self, cachedir=None):
+        if cachedir is None:
+            cachedir = os.path.join(get_cache_dir(), 'parse')
+        self.cachedir = cachedir
+        self.usable = _make_private_dir(cachedir)
+        """False if the cache directory cannot be trusted"""
+        self.hits = 0
+        """number of modules found in the cache"""
+        self.misses = 0
+        """number of modules which had to be parsed"""
+
+    def key(self, ctx, text):
+        h = hashlib.sha256()
+        opts = (pyang.__version__, FORMAT, pickle.HIGHEST_PROTOCOL,
+                ctx.keep_comments, ctx.keep_arg_substrings,
+                ctx.max_line_len, ctx.lax_quote_checks)
+        h.update(repr(opts).encode('utf-8'))
+        h.update(b'\0')
+        h.update(text.encode('utf-8', 'surrogatepass'))
+        return h.hexdigest()
+
+    def _filename(self, key):
+        return os.path.join(self.cachedir, key[:2], key[2:] + '.pickle')
+
+    def get(self, key):
+        """Return the cached (`module`, `errors`) for `key`, or None"""
+        if not self.usable:
+            return None
+        try:
+            with open(self._filename(key), 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            # missing, unreadable, truncated, or incompatible entry
+            return None
+
+    def put(self, key, module, errors):
+        if not self.usable:
+            return
+        try:
+            data = pickle.dumps((module, errors), pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError,
+                RecursionError):
+            # e.g. a plugin has put something unpicklable in the tree
+            return
+        write_file_atomic(self._filename(key), data)
+
+    def parse(self, ctx, ref, text):
+        """Parse the YANG `text`, or fetch the parsed tree from the cache.
+
+        Return a Statement on success or None on failure, just like
+        `YangParser.parse()`.  Errors found while parsing are stored
+        with the tree, and added to `ctx.errors` also on a cache hit.
+        """
+        key = self.key(ctx, text)
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            module, errors = entry
+            # the text may have been read from another file
+            _set_ref(module, ref)
+            for epos, etag, eargs in errors:
+                epos.ref = ref
+                error.err_add(ctx.errors, epos, etag, eargs)
+            return module
+        self.misses += 1
+        nerrors = len(ctx.errors)
+        module = yang_parser.YangParser().parse(ctx, ref, text)
+        if module is not None:
+            self.put(key, module, ctx.errors[nerrors:])
+        return module
+
+
+def _set_ref(stmt, ref):
+    stmt.pos.ref = ref
+    for s in stmt.substmts:
+        _set_ref(s, ref)
@@ -1,13 +1,17 @@
 """A parse session context"""
 
 import re
+import concurrent.futures
 
 from . import error
+from . import cache
+from . import repository
 from . import yang_parser
 from . import yin_parser
 from . import util
 from . import statements
 from . import syntax
+from . import schemapath
 
 class Context(object):
     """Class which encapsulates a parse session"""
@@ -25,7 +29,7 @@ class Context(object):
 
         self.strict = False
         self.repository = repository
-        self.errors = []
+        self.errors = error.ErrorList()
         self.canonical = False
         self.verify_revision_history = False
         self.max_line_len = None
@@ -39,6 +43,29 @@ class Context(object):
         self.max_status = None
         self.keep_comments = False
         self.keep_arg_substrings = False
+        self.opaque_extensions = False
+        """True if some module has an unknown extension statement with
+        substatements, which may be any statements"""
+        self.parse_cache = None
+        """a `cache.ParseCache` instance, or None if parsed YANG modules
+        should not be cached"""
+        self.preparsed = {}
+        """dict of ref:(text, module, errors)
+        contains modules parsed in advance by preparse()"""
+        self.sources = {}
+        """dict of module:args
+        contains the arguments to add_module() for the modules added by
+        it, so that they can be added again when they are reset"""
+        self.dependencies = {}
+        """dict of module:[(module, keyword)]
+        contains the dependencies of the validated modules, see
+        get_dependencies()"""
+        self.dependents = {}
+        """dict of module:set(module)
+        contains the validated modules which depend on a module"""
+        self.path_index = schemapath.PathIndex(self)
+        """the paths of the schema nodes in the validated modules,
+        see `schemapath.PathIndex`"""
 
         for mod, rev, handle in self.repository.get_modules_and_revisions(self):
             if mod not in self.revs:
@@ -49,7 +76,12 @@ class Context(object):
     def internal_reset(self):
         self.modules = {}
         self.revs = {}
-        self.errors = []
+        self.errors = error.ErrorList()
+        self.opaque_extensions = False
+        self.sources = {}
+        self.dependencies = {}
+        self.dependents = {}
+        self.path_index.clear()
         for mod, rev, handle in self.repository.get_modules_and_revisions(
                 self):
             if mod not in self.revs:
@@ -60,25 +92,40 @@ class Context(object):
     def add_module(self, ref, text, in_format=None,
                    expect_modulename=None, expect_revision=None,
                    expect_failure_error=True,
-                   primary_module=False):
+                   primary_module=False, replace=False):
         """Parse a module text and add the module data to the context
 
         `ref` is a string which is used to identify the source of
               the text for the user.  used in error messages
         `text` is the raw text data
         `in_format` is one of 'yang' or 'yin'.
+        `replace` if True, a module with the same name and revision
+                  which is already in the context is removed, together
+                  with the modules affected by it; see `del_modules()`.
 
         Returns the parsed and validated module on success, and None on error.
         """
+        module = self._add_module(ref, text, in_format,
+                                  expect_modulename, expect_revision,
+                                  expect_failure_error, primary_module,
+                                  replace)
+        if module is not None and module not in self.sources:
+            self.sources[module] = (ref, text, in_format,
+                                    expect_modulename, expect_revision,
+                                    expect_failure_error, primary_module)
+        return module
+
+    def _add_module(self, ref, text, in_format,
+                    expect_modulename, expect_revision,
+                    expect_failure_error, primary_module, replace):
         if in_format is None:
             in_format = util.guess_format(text)
 
         if in_format == 'yin':
             p = yin_parser.YinParser()
+            module = p.parse(self, ref, text)
         else:
-            p = yang_parser.YangParser()
-
-        module = p.parse(self, ref, text)
+            module = self._parse_yang(ref, text)
         if module is None:
             return None
 
@@ -111,6 +158,11 @@ class Context(object):
                     error.err_add(self.errors, module.pos, 'WBAD_REVISION',
                                   (latest_rev, ref, expect_revision))
 
+        if replace:
+            other = self.modules.get((module.arg, latest_rev))
+            if other is not None:
+                self.del_modules([other])
+
         if module.arg not in self.revs:
             self.revs[module.arg] = []
             revs = self.revs[module.arg]
@@ -118,6 +170,97 @@ class Context(object):
 
         return self.add_parsed_module(module)
 
+    def _parse_yang(self, ref, text):
+        """Parse YANG `text`, using the parse cache if it is enabled"""
+        x = self.preparsed.pop(ref, None)
+        if x is not None and x[0] == text:
+            (_text, module, errors) = x
+            for epos, etag, eargs in errors:
+                error.err_add(self.errors, epos, etag, eargs)
+            return module
+        if self.parse_cache is not None:
+            return self.parse_cache.parse(self, ref, text)
+        return yang_parser.YangParser().parse(self, ref, text)
+
+    def preparse(self, texts, jobs):
+        """Parse YANG modules and their dependencies in parallel.
+
+        `texts` is a list of (`ref`, `text`) for the modules to parse.
+        The modules are parsed by `jobs` worker processes, together with
+        all modules they import or include, as far as these can be found
+        in the repository.
+
+        The modules are not added to the context; the parsed trees are
+        kept until the modules are added with add_module() or loaded
+        from the repository.  Parse errors are reported at that time,
+        so the errors are the same as if the modules were parsed when
+        they are added.
+        """
+        opts = (self.keep_comments, self.keep_arg_substrings,
+                self.max_line_len, self.lax_quote_checks,
+                None if self.parse_cache is None
+                else self.parse_cache.cachedir)
+        texts = [(ref, text) for (ref, text) in texts
+                 if util.guess_format(text) == 'yang']
+        seen = set()
+        try:
+            self._preparse(texts, jobs, opts, seen)
+        except (OSError, NotImplementedError,
+                concurrent.futures.BrokenExecutor):
+            # no worker processes could be used; the remaining modules
+            # are parsed when they are needed
+            pass
+
+    def _preparse(self, texts, jobs, opts, seen):
+        with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+            while texts:
+                futures = []
+                for ref, text in texts:
+                    if ref not in seen:
+                        seen.add(ref)
+                        f = executor.submit(_preparse_worker, ref, text, opts)
+                        futures.append((ref, text, f))
+                texts = []
+                # collect the results in order, to keep the result
+                # independent of the scheduling of the workers
+                for ref, text, f in futures:
+                    (module, errors, hits, misses) = f.result()
+                    if self.parse_cache is not None:
+                        self.parse_cache.hits += hits
+                        self.parse_cache.misses += misses
+                    self.preparsed[ref] = (text, module, errors)
+                    if module is None:
+                        continue
+                    for stmt in (module.search('import') +
+                                 module.search('include')):
+                        x = self._get_dependency_text(stmt)
+                        if x is not None:
+                            texts.append(x)
+
+    def _get_dependency_text(self, stmt):
+        """Return (`ref`, `text`) for an imported or included module"""
+        if stmt.arg not in self.revs or not self.revs[stmt.arg]:
+            return None
+        revs = self.revs[stmt.arg]
+        r = stmt.search_one('revision-date')
+        if r is not None:
+            self._ensure_revs(revs)
+            x = util.keysearch(r.arg, 0, revs)
+            handle = None if x is None else x[1]
+        else:
+            (_revision, handle) = self._get_latest_rev(revs)
+        if handle is None or handle[0] == 'parsed':
+            return None
+        if handle[0] == 'scanned':
+            (_tag, ref, _in_format, text) = handle
+        else:
+            try:
+                ref, in_format, text = self.repository.get_module_from_handle(
+                    handle)
+            except self.repository.ReadError:
+                return None
+        return ref, text
+
     def add_parsed_module(self, module):
         if module is None:
             return None
@@ -146,6 +289,181 @@ class Context(object):
         rev = util.get_latest_revision(module)
         del self.modules[(module.arg, rev)]
 
+    def del_modules(self, modules):
+        """Remove `modules` from the context, and reset the modules
+        affected by them
+
+        A module is affected if it imports, includes, belongs to,
+        augments or deviates a removed module.  The modules augmented
+        or deviated by a removed module are affected as well, since
+        their trees have been changed.  The affected modules which were
+        added by add_module() are added again, and are validated by the
+        next call to validate().  The other affected modules are
+        removed, and read again from the repository when they are
+        needed.
+
+        Returns the list of removed modules, including the affected ones.
+        """
+        removed = self._remove_affected(modules)
+        for m in modules:
+            self.sources.pop(m, None)
+        self._add_again(removed)
+        return removed
+
+    def update_module(self, module, text):
+        """Replace `module`, which was added by add_module(), with a new
+        version of its text
+
+        The modules affected by `module` are reset, as in del_modules().
+        Returns the new module, or None on error.
+        """
+        args = self.sources[module]
+        self.del_modules([module])
+        new = self.add_module(args[0], text, *args[2:])
+        if module in self.deviation_modules:
+            i = self.deviation_modules.index(module)
+            if new is None:
+                del self.deviation_modules[i]
+            else:
+                self.deviation_modules[i] = new
+        return new
+
+    def reset_modules(self, modules):
+        """Reset `modules`, and the modules affected by them, so that
+        they are validated again by the next call to validate()
+
+        The trees of `modules` are kept, but their validation state is
+        reset.  The affected modules are handled as in del_modules().
+
+        Returns the list of reset modules, including the affected ones.
+        """
+        removed = self._remove_affected(modules)
+        for m in modules:
+            m.internal_reset()
+            self.add_parsed_module(m)
+        self._add_again([m for m in removed if m not in modules])
+        return removed
+
+    def _remove_affected(self, modules):
+        # the dependencies of the modules which are not validated are
+        # not in the graph
+        dependents = {}
+        for m in self.modules.values():
+            if m is not None and m not in self.dependencies:
+                for (dep, _keyword) in self.get_dependencies(m):
+                    dependents.setdefault(dep, set()).add(m)
+        removed = []
+        seen = set()
+        stack = list(modules)
+        while stack:
+            m = stack.pop()
+            if m in seen:
+                continue
+            seen.add(m)
+            removed.append(m)
+            stack.extend(self.dependents.get(m, ()))
+            stack.extend(dependents.get(m, ()))
+            for (dep, keyword) in self.dependencies.get(m, ()):
+                if keyword in ('augment', 'deviation'):
+                    stack.append(dep)
+        for m in removed:
+            key = (m.arg, util.get_latest_revision(m))
+            if self.modules.get(key) is m:
+                del self.modules[key]
+            for (dep, _keyword) in self.dependencies.pop(m, ()):
+                if dep in self.dependents:
+                    self.dependents[dep].discard(m)
+            self.dependents.pop(m, None)
+        # the errors are reported again when the modules are validated
+        self.errors[:] = [e for e in self.errors if e[0].top not in seen]
+        self.reset_revs(set(m.arg for m in removed))
+        return removed
+
+    def _add_again(self, removed):
+        removed = set(removed)
+        readd = [(m, args) for (m, args) in self.sources.items()
+                 if m in removed]
+        for (m, args) in readd:
+            del self.sources[m]
+            new = self.add_module(*args)
+            if m in self.deviation_modules:
+                i = self.deviation_modules.index(m)
+                if new is None:
+                    del self.deviation_modules[i]
+                else:
+                    self.deviation_modules[i] = new
+
+    def get_dependencies(self, module):
+        """Return the modules in the context which `module` depends on
+
+        Returns a list of (`module`, `keyword`), where `keyword` is one
+        of 'import', 'include', 'belongs-to', 'augment' or 'deviation'.
+        The augment and deviation dependencies are only known after
+        `module` has been validated.
+        """
+        deps = []
+        for s in module.substmts:
+            if s.keyword in ('import', 'include'):
+                r = s.search_one('revision-date')
+                dep = self._get_loaded_module(s.arg,
+                                              None if r is None else r.arg)
+            elif s.keyword == 'belongs-to':
+                dep = self._get_loaded_module(s.arg)
+            elif s.keyword in ('augment', 'deviation'):
+                dep = getattr(s, 'i_target_node', None)
+                while dep is not None and dep.parent is not None:
+                    dep = dep.parent
+            else:
+                continue
+            if dep is not None and dep is not module:
+                deps.append((dep, s.keyword))
+        return deps
+
+    def _get_loaded_module(self, modulename, revision=None):
+        """Like get_module(), but never reads anything from the repository"""
+        if revision is not None:
+            return self.modules.get((modulename, revision))
+        latest = None
+        for rev, _handle in self.revs.get(modulename, ()):
+            if rev is not None and (latest is None or rev > latest):
+                latest = rev
+        m = self.modules.get((modulename, latest))
+        if m is None:
+            # not in the repository, find the latest one added
+            for (name, rev), other in self.modules.items():
+                if (name == modulename and other is not None and
+                    (m is None or rev > latest)):
+                    m, latest = other, rev
+        return m
+
+    def reset_revs(self, modulenames=None, rescan=False):
+        """Read the modules and their revisions from the repository again
+
+        Only the modules in `modulenames` are reset, or all modules if
+        it is None.  Modules and revisions which were not found, and
+        modules which are not in the repository, are forgotten, so
+        that they are searched for again.  Revisions found by scanning
+        the module headers are kept, unless `rescan` is True.
+        """
+        fresh = {}
+        for mod, rev, handle in self.repository.get_modules_and_revisions(
+                self):
+            if modulenames is None or mod in modulenames:
+                fresh.setdefault(mod, []).append((rev, handle))
+        if modulenames is None:
+            modulenames = set(self.revs) | set(fresh)
+        for modulename in modulenames:
+            revs = fresh.get(modulename)
+            if revs is None:
+                self.revs.pop(modulename, None)
+                continue
+            old = self.revs.get(modulename, [])
+            for i, (rev, handle) in enumerate(old[:len(revs)]):
+                if (handle is not None and handle[0] == 'scanned' and
+                    not rescan):
+                    revs[i] = (rev, handle)
+            self.revs[modulename] = revs
+
     def get_module(self, modulename, revision=None):
         """Return the module if it exists in the context"""
         if revision is None and modulename in self.revs:
@@ -188,11 +506,19 @@ class Context(object):
                     yintext = text
                     p = yin_parser.YinParser(
                         {'no_include': True, 'no_extensions': True})
+                    module = p.parse(self, ref, text)
                 else:
+                    # the module is parsed when it is actually needed
+                    header = yang_parser.scan_header(ref, text)
+                    if header is not None:
+                        _keyword, _name, rev = header
+                        revs[i] = (rev, ('scanned', ref, in_format, text))
+                        i += 1
+                        continue
+                    # let the parser report the errors
                     yintext = None
-                    p = yang_parser.YangParser()
+                    module = self._parse_yang(ref, text)
 
-                module = p.parse(self, ref, text)
                 if module is not None:
                     rev = util.get_latest_revision(module)
                     revs[i] = (rev, ('parsed', module, ref, yintext))
@@ -238,6 +564,13 @@ class Context(object):
             if (modulename, revision) in self.modules:
                 return self.modules[(modulename, revision)]
 
+        if handle is not None and handle[0] == 'scanned':
+            # parse it now, and handle it like a module parsed by
+            # _ensure_revs()
+            (_tag, ref, _in_format, text) = handle
+            module = self._parse_yang(ref, text)
+            handle = None if module is None else ('parsed', module, ref, None)
+
         if handle is None:
             module = None
         elif handle[0] == 'parsed':
@@ -261,9 +594,9 @@ class Context(object):
             try:
                 ref, in_format, text = self.repository.get_module_from_handle(
                     handle)
-                module = self.add_module(
+                module = self._add_module(
                     ref, text, in_format, modulename, revision,
-                    True, primary_module)
+                    True, primary_module, False)
             except self.repository.ReadError as ex:
                 error.err_add(self.errors, pos, 'READ_ERROR', str(ex))
                 module = None
@@ -319,6 +652,9 @@ class Context(object):
         if handle[0] == 'parsed':
             module = handle[1]
             return module
+        elif handle[0] == 'scanned':
+            (_tag, ref, in_format, text) = handle
+            return self._parse_yang(ref, text)
         else:
             # get it from the repos
             try:
@@ -330,10 +666,9 @@ class Context(object):
 
                 if in_format == 'yin':
                     p = yin_parser.YinParser(extra)
+                    return p.parse(self, ref, text)
                 else:
-                    p = yang_parser.YangParser(extra)
-
-                return p.parse(self, ref, text)
+                    return self._parse_yang(ref, text)
             except self.repository.ReadError as ex:
                 return None
 
@@ -347,6 +682,15 @@ class Context(object):
             # may add new modules by import
             statements.validate_module(self, m)
 
+        # update the dependency graph
+        for m in self.modules.values():
+            if (m is not None and m.i_is_validated is True and
+                m not in self.dependencies):
+                deps = self.get_dependencies(m)
+                self.dependencies[m] = deps
+                for (dep, _keyword) in deps:
+                    self.dependents.setdefault(dep, set()).add(m)
+
         # check for duplicate namespaces across all loaded modules
         uri_map = {}
         for k in self.modules:
@@ -369,3 +713,19 @@ class Context(object):
                 error.err_add(self.errors, pos,
                               'DUPLICATE_NAMESPACE',
                               (uri, module_names))
+
+        # the validation moves statements, so the paths computed
+        # before or during the validation may be wrong
+        self.path_index.clear()
+
+def _preparse_worker(ref, text, opts):
+    """Parse a YANG module in a worker process started by preparse()"""
+    ctx = Context(repository.FileRepository(use_env=False))
+    (ctx.keep_comments, ctx.keep_arg_substrings,
+     ctx.max_line_len, ctx.lax_quote_checks, cachedir) = opts
+    if cachedir is not None:
+        ctx.parse_cache = cache.ParseCache(cachedir)
+    module = ctx._parse_yang(ref, text)
+    if ctx.parse_cache is None:
+        return module, ctx.errors, 0, 0
+    return module, ctx.errors, ctx.parse_cache.hits, ctx.parse_cache.misses
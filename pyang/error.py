@@ -1,6 +1,8 @@
 import copy
 import os.path
 
+from . import util
+
 ### struct to keep track of position for error messages
 
 class Position(object):
@@ -17,6 +19,14 @@ class Position(object):
         self.top = None
         self.uses_pos = None
 
+    def __copy__(self):
+        pos = self.__class__.__new__(self.__class__)
+        pos.ref = self.ref
+        pos.line = self.line
+        pos.top = self.top
+        pos.uses_pos = self.uses_pos
+        return pos
+
     def __str__(self):
         return self.label()
 
@@ -461,6 +471,42 @@ error_codes = \
     'UNEXPECTED_ATTRIBUTE':
       (1,
        'unexpected attribute %s'),
+    'INSTANCE_SYNTAX_ERROR':
+      (1,
+       'syntax error in instance data: %s'),
+    'INSTANCE_UNKNOWN_NODE':
+      (2,
+       'unexpected node "%s" in instance data'),
+    'INSTANCE_DUPLICATE_NODE':
+      (2,
+       'node "%s" occurs more than once'),
+    'INSTANCE_BAD_VALUE':
+      (2,
+       'bad value for "%s": %s'),
+    'INSTANCE_BAD_ENCODING':
+      (2,
+       'a JSON %s is not a valid encoding of the value of "%s"'),
+    'INSTANCE_MISSING_KEY':
+      (2,
+       'missing key "%s" in an entry of list "%s"'),
+    'INSTANCE_DUPLICATE_KEY':
+      (2,
+       'duplicate entry with key %s in list "%s"'),
+    'INSTANCE_MISSING_MANDATORY':
+      (2,
+       'missing mandatory %s "%s"'),
+    'INSTANCE_TOO_FEW_ELEMENTS':
+      (2,
+       '%d instances of "%s", min-elements is %d'),
+    'INSTANCE_TOO_MANY_ELEMENTS':
+      (2,
+       '%d instances of "%s", max-elements is %d'),
+    'INSTANCE_CASE_CONFLICT':
+      (2,
+       'node "%s" of case "%s" conflicts with case "%s" of choice "%s"'),
+    'INSTANCE_LEAFREF_NOT_FOUND':
+      (2,
+       'the value "%s" of "%s" does not refer to an existing "%s"'),
     'INVALID_CONFIG':
       (2,
        'config true cannot be set when the parent is config false'),
@@ -564,13 +610,77 @@ def err_to_str(tag, args):
 
 def err_add(errors, pos, tag, args):
     error = (copy.copy(pos), tag, args)
-    # surely this can be done more elegant??
+    if isinstance(errors, ErrorList):
+        try:
+            if errors.get_index().get(_error_key(error)):
+                return
+        except TypeError:
+            # unhashable arguments, fall back to a linear search
+            pass
+        else:
+            errors.append(error)
+            return
     for p, t, a in errors:
         if (p.line == pos.line and p.ref == pos.ref and
             p.top == pos.top and t == tag and a == args):
             return
     errors.append(error)
 
+def _error_key(error):
+    (pos, tag, args) = error
+    return (pos.ref, pos.line, pos.top, tag, args)
+
+class ErrorList(util.IndexedList):
+    """A list of errors, as (Position, tag, args), used for ctx.errors.
+
+    Keeps an index of the errors, so that err_add() finds duplicates
+    without searching the list.
+
+    If `sink` is not None, it is called with each error added to the
+    list.  This is used to report the errors as they are found.
+    """
+
+    __slots__ = ('sink',)
+
+    def __init__(self, *args):
+        util.IndexedList.__init__(self, *args)
+        self.sink = None
+
+    def get_index(self):
+        """Return a dict of (ref, line, top, tag, args):count
+
+        The errors with unhashable arguments are not in the index.
+        """
+        return util.IndexedList.get_index(self)
+
+    def _new_index(self):
+        return {}
+
+    def _add_to_index(self, _pos, error):
+        key = _error_key(error)
+        try:
+            self._index[key] = self._index.get(key, 0) + 1
+        except TypeError:
+            pass
+
+    def append(self, error):
+        util.IndexedList.append(self, error)
+        if self.sink is not None:
+            self.sink(error)
+
+    def extend(self, errors):
+        for error in errors:
+            self.append(error)
+
+    def __iadd__(self, errors):
+        self.extend(errors)
+        return self
+
+    def insert(self, i, error):
+        util.IndexedList.insert(self, i, error)
+        if self.sink is not None:
+            self.sink(error)
+
 def is_warning(level):
     return not is_error(level)
 
@@ -1,6 +1,5 @@
 """Description of YANG & YIN grammar."""
 
-import copy
 import re
 
 from . import util
@@ -76,12 +75,15 @@ top_stmts = [
 
 def add_stmt(stmt, arg_rules):
     """Use by plugins to add grammar for an extension statement."""
+    global stmt_map_generation
     (arg, rules) = arg_rules
     stmt_map[stmt] = (arg, rules)
+    stmt_map_generation += 1
 
 def add_to_stmts_rules(stmts, rules):
     """Use by plugins to add extra rules to the existing rules for
     a statement."""
+    global stmt_map_generation
     def is_rule_less_than(ra, rb):
         rka = ra[0]
         rkb = rb[0]
@@ -93,6 +95,7 @@ def add_to_stmts_rules(stmts, rules):
             return True
         # both are prefixed, compare modulename
         return rka[0] < rkb[0]
+    stmt_map_generation += 1
     for s in stmts:
         (arg, rules0) = stmt_map[s]
         for r in rules:
@@ -553,6 +556,9 @@ where <occurence> is one of: '?', '1', '+', '*'.
 and <case> is a list of substatements
 """
 
+stmt_map_generation = 0
+"""Incremented when stmt_map is changed by plugins"""
+
 
 re_identifier_illegal_prefix = re.compile("^[xX][mM][lL]")
 
@@ -610,7 +616,7 @@ def _chk_stmts(ctx, pos, stmts, parent, spec, canonical):
         if match_res is None and chk_grammar:
             if canonical:
                 save_errors = ctx.errors
-                ctx.errors = []
+                ctx.errors = error.ErrorList()
                 if _match_stmt(ctx, stmt, (spec[1], []), False) is not None:
                     ctx.errors = save_errors
                     if stmt.i_module.i_version == '1':
@@ -666,6 +672,8 @@ def _chk_stmts(ctx, pos, stmts, parent, spec, canonical):
         else:
             # unknown extension
             stmt.is_grammatically_valid = True
+            if stmt.substmts:
+                ctx.opaque_extensions = True
             nspec = [('$any', '*')]
             _chk_stmts(ctx, stmt.pos, stmt.substmts, stmt,
                        (nspec, nspec), canonical)
@@ -725,19 +733,28 @@ def _match_stmt(ctx, stmt, specs, canonical):
             while j < len(cases):
                 # check if this alternative matches - check for a
                 # match with each optional keyword
-                save_errors = copy.copy(ctx.errors)
-                if spec == top_stmts:
-                    match_res = _match_stmt(ctx, stmt, (cases[j],[]), False)
-                else:
-                    match_res = _match_stmt(ctx, stmt, (cases[j],cases[j]),
-                                            canonical)
+                # the errors are collected in a separate list, since
+                # we must not report errors on non-matching branches
+                save_errors = ctx.errors
+                ctx.errors = error.ErrorList()
+                try:
+                    if spec == top_stmts:
+                        match_res = _match_stmt(ctx, stmt, (cases[j],[]),
+                                                False)
+                    else:
+                        match_res = _match_stmt(ctx, stmt,
+                                                (cases[j],cases[j]),
+                                                canonical)
+                finally:
+                    branch_errors = ctx.errors
+                    ctx.errors = save_errors
                 if match_res is not None:
                     # this case branch matched, use it.
+                    for epos, etag, eargs in branch_errors:
+                        error.err_add(ctx.errors, epos, etag, eargs)
                     # remove the choice and add res to the spec.
                     nspec = spec[:i] + match_res[0] + spec[i+1:]
                     return (nspec, canspec)
-                # we must not report errors on non-matching branches
-                ctx.errors = save_errors
                 j += 1
         elif keywd == '$interleave':
             cspec = occurence
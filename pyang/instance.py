@@ -0,0 +1,863 @@
+"""Validation of instance data against validated modules"""
+
+import codecs
+import json.decoder
+import re
+
+import lxml.etree
+
+from . import error
+from . import types
+from .error import err_add
+
+_data_keywords = ('container', 'list', 'leaf', 'leaf-list',
+                  'choice', 'case')
+
+
+def get_leaf_validators(modules):
+    """Return a dict of schema node path:TypeValidator for all leafs
+    and leaf-lists in the data trees of `modules`.
+
+    The paths are on the form used in RFC 8040, where the module name
+    is given for the top-level nodes and when it changes, e.g.
+    /mod:interfaces/interface/name.  Choice and case nodes are not
+    part of the paths.
+    """
+    validators = {}
+
+    def walk(stmt, path, modulename):
+        for ch in stmt.i_children:
+            if ch.keyword not in _data_keywords:
+                continue
+            if ch.keyword in ('choice', 'case'):
+                walk(ch, path, modulename)
+                continue
+            chmodulename = ch.i_module.i_modulename
+            if chmodulename != modulename:
+                chpath = '%s/%s:%s' % (path, chmodulename, ch.arg)
+            else:
+                chpath = '%s/%s' % (path, ch.arg)
+            if ch.keyword in ('leaf', 'leaf-list'):
+                type_ = ch.search_one('type')
+                if getattr(type_, 'i_type_spec', None) is not None:
+                    validators[chpath] = types.TypeValidator(type_)
+            else:
+                walk(ch, chpath, chmodulename)
+    for module in modules:
+        walk(module, '', None)
+    return validators
+
+
+def validate_columns(validators, columns):
+    """Validate columns of values.
+
+    `columns` is a dict of schema node path:sequence of values, as
+    strings.  The paths are the ones returned by
+    get_leaf_validators().  Returns a dict of path:[(index, message)]
+    for the paths with invalid values.  Raises KeyError for an
+    unknown path.
+    """
+    res = {}
+    for path, values in columns.items():
+        errors = validators[path].validate(values)
+        if errors:
+            res[path] = errors
+    return res
+
+
+def validate_file(ctx, modules, filename, errors=None):
+    """Validate the instance document in `filename` against the data
+    trees of `modules`.
+
+    The document is either XML or JSON (RFC 7951); the format is
+    given by the first character in the file.  Errors are added to
+    `errors`, by default ctx.errors.  See InstanceValidator.
+    """
+    if errors is None:
+        errors = ctx.errors
+    InstanceValidator(ctx, modules).validate_file(filename, errors)
+
+
+class InstanceValidator(object):
+    """Validates instance documents against the data trees of a set
+    of validated modules.
+
+    The documents are read in a streaming fashion, XML with
+    lxml.etree.iterparse and JSON with an incremental reader, and are
+    validated while they are read.  Only the nodes on the path from
+    the root to the current node are kept in memory, together with
+    the keys of the entries in the lists on that path, and the values
+    of leafrefs and of the leafs they refer to.
+
+    The values of the leafs and leaf-lists, the keys of the lists,
+    mandatory nodes, min-elements and max-elements are checked.  A
+    leafref must refer to a value of its target leaf somewhere in the
+    document; the predicates in the leafref path are not evaluated.
+    Nodes with "when" statements are not checked to be present, and
+    "must" and "unique" statements are ignored.
+
+    The top-level data nodes of a module are checked to be present
+    only if the document has some data for the module.  A document may
+    have a "data" or "config" root element (in XML) or a single
+    "ietf-restconf:data" member (in JSON) which contains the top-level
+    data nodes.
+    """
+
+    def __init__(self, ctx, modules):
+        self.ctx = ctx
+        self.namespaces = {}
+        for m in ctx.modules.values():
+            if m.keyword == 'module':
+                ns = m.search_one('namespace')
+                if ns is not None:
+                    self.namespaces[ns.arg] = m.i_modulename
+        self._nodes = {}
+        self._leafrefs = []
+        self.root = _SchemaNode(None, 'root')
+        for m in modules:
+            self._add_children(self.root, m.i_children, self.root)
+        for node in self._leafrefs:
+            target = self._nodes.get(id(node.leafref))
+            if target is None:
+                # the target is not in the data trees of the modules
+                node.leafref = None
+            else:
+                node.leafref = target
+                target.is_target = True
+        del self._nodes
+        del self._leafrefs
+
+    def _add_children(self, parent, children, data_parent):
+        """Add the data nodes in `children` to the data node
+        `data_parent`, and their checks to `parent`.  Return the data
+        nodes."""
+        res = []
+        for ch in children:
+            if ch.keyword == 'choice':
+                choice = _SchemaNode(ch, 'choice')
+                for c in ch.i_children:
+                    case = _SchemaNode(c, 'case')
+                    if c.keyword == 'case':
+                        case.nodes = self._add_children(case, c.i_children,
+                                                        data_parent)
+                    else:
+                        # shorthand case
+                        case.nodes = self._add_children(case, [c],
+                                                        data_parent)
+                    choice.cases.append(case)
+                    res.extend(case.nodes)
+                if (choice.min_elements or len(choice.cases) > 1 or
+                    any(case.checks for case in choice.cases)):
+                    parent.checks.append(choice)
+            elif ch.keyword in _instance_keywords:
+                node = _SchemaNode(ch, ch.keyword)
+                data_parent.children[(node.modulename, node.name)] = node
+                self._nodes[id(ch)] = node
+                if ch.keyword in ('leaf', 'leaf-list'):
+                    self._init_leaf(node)
+                elif ch.keyword in ('container', 'list'):
+                    self._add_children(node, ch.i_children, node)
+                    if ch.keyword == 'list':
+                        node.keys = [node.children.get((node.modulename, k))
+                                     for k in _key_names(ch)]
+                        if None in node.keys:
+                            node.keys = []
+                        for k in node.keys:
+                            k.is_key = True
+                if (node.min_elements or
+                    node.max_elements is not None and
+                    node.keyword in ('list', 'leaf-list') or
+                    node.keyword == 'container' and node.checks and
+                    not node.conditional):
+                    parent.checks.append(node)
+                res.append(node)
+        return res
+
+    def _init_leaf(self, node):
+        type_ = node.stmt.search_one('type')
+        spec = getattr(type_, 'i_type_spec', None)
+        if spec is None:
+            return
+        node.json_kinds = _json_kinds(spec)
+        if isinstance(spec, types.IdentityrefTypeSpec):
+            node.idbases = [b.i_identity for b in spec.idbases]
+        else:
+            node.validator = types.TypeValidator(type_)
+        path_type_spec = getattr(node.stmt, 'i_leafref', None)
+        ptr = getattr(node.stmt, 'i_leafref_ptr', None)
+        if (path_type_spec is not None and ptr is not None and
+            path_type_spec.require_instance):
+            node.leafref = ptr[0]
+            self._leafrefs.append(node)
+
+    def validate_file(self, filename, errors):
+        """Validate the XML or JSON document in `filename`, and add the
+        errors to `errors`"""
+        with open(filename, 'rb') as fd:
+            start = fd.read(4096).lstrip()
+            fd.seek(0)
+            run = _Run(self, filename, errors)
+            try:
+                if start.startswith(b'{'):
+                    run.validate_json(fd)
+                else:
+                    run.validate_xml(fd)
+            except _SyntaxError as ex:
+                run.error(ex.line, 'INSTANCE_SYNTAX_ERROR', ex.msg)
+                return
+            except lxml.etree.XMLSyntaxError as ex:
+                run.error(ex.lineno, 'INSTANCE_SYNTAX_ERROR', ex.msg)
+                return
+            run.finish()
+
+
+_instance_keywords = ('container', 'list', 'leaf', 'leaf-list',
+                      'anydata', 'anyxml')
+
+# the JSON tokens which encode the values of the base types, RFC 7951
+# 6; the other base types are encoded as strings
+_json_base_kinds = {
+    'int8': ('number',),
+    'int16': ('number',),
+    'int32': ('number',),
+    'uint8': ('number',),
+    'uint16': ('number',),
+    'uint32': ('number',),
+    'boolean': ('true', 'false'),
+    'empty': ('[',),
+}
+
+_json_kind_names = {
+    'number': 'number',
+    'string': 'string',
+    'true': 'literal',
+    'false': 'literal',
+    '[': 'array',
+}
+
+def _json_kinds(spec):
+    """Return the set of the kinds of the JSON tokens which encode the
+    values of the type `spec`, or None if any kind is accepted."""
+    if isinstance(spec, types.PathTypeSpec):
+        target = getattr(spec, 'i_target_node', None)
+        if target is None:
+            return None
+        spec = target.search_one('type').i_type_spec
+        if spec is None:
+            return None
+        return _json_kinds(spec)
+    if isinstance(spec, types.UnionTypeSpec):
+        kinds = set()
+        for t in spec.types:
+            if t.i_type_spec is None:
+                return None
+            member_kinds = _json_kinds(t.i_type_spec)
+            if member_kinds is None:
+                return None
+            kinds.update(member_kinds)
+        return kinds
+    while spec.base is not None:
+        spec = spec.base
+    return set(_json_base_kinds.get(spec.name, ('string',)))
+
+
+def _key_names(list_stmt):
+    key = list_stmt.search_one('key')
+    if key is None:
+        return []
+    return key.arg.split()
+
+
+def _is_conditional(stmt):
+    if stmt.search_one('when') is not None:
+        return True
+    augment = getattr(stmt, 'i_augment', None)
+    return augment is not None and augment.search_one('when') is not None
+
+
+class _SchemaNode(object):
+    """A data node, choice or case in the schema tree"""
+
+    __slots__ = ('stmt', 'keyword', 'name', 'modulename', 'children',
+                 'checks', 'nodes', 'cases', 'keys', 'min_elements',
+                 'max_elements', 'conditional', 'validator', 'idbases',
+                 'leafref', 'is_target', 'is_key', 'json_kinds')
+
+    def __init__(self, stmt, keyword):
+        self.stmt = stmt
+        self.keyword = keyword
+        self.children = {}
+        self.checks = []
+        self.nodes = []
+        self.cases = []
+        self.keys = []
+        self.min_elements = 0
+        self.max_elements = None
+        self.conditional = False
+        self.validator = None
+        self.idbases = None
+        self.leafref = None
+        self.is_target = False
+        self.is_key = False
+        self.json_kinds = None
+        if stmt is None:
+            self.name = None
+            self.modulename = None
+            return
+        self.name = stmt.arg
+        self.modulename = stmt.i_module.i_modulename
+        self.conditional = _is_conditional(stmt)
+        if keyword in ('leaf', 'choice', 'anydata', 'anyxml'):
+            m = stmt.search_one('mandatory')
+            if m is not None and m.arg == 'true':
+                self.min_elements = 1
+            if keyword != 'choice':
+                self.max_elements = 1
+        elif keyword in ('list', 'leaf-list'):
+            m = stmt.search_one('min-elements')
+            if m is not None and m.arg.isnumeric():
+                self.min_elements = int(m.arg)
+            m = stmt.search_one('max-elements')
+            if m is not None and m.arg.isnumeric():
+                self.max_elements = int(m.arg)
+        elif keyword == 'container':
+            self.max_elements = 1
+            if stmt.search_one('presence') is not None:
+                # a presence container is not implicitly present
+                self.conditional = True
+
+
+class _Frame(object):
+    """A container or list entry in the document being validated"""
+
+    __slots__ = ('node', 'line', 'counts', 'keys', 'entries')
+
+    def __init__(self, node, line):
+        self.node = node
+        self.line = line
+        # node:number of instances
+        self.counts = {}
+        # key node:value, for list entries
+        self.keys = None
+        # list node:set of key values
+        self.entries = None
+
+
+class _SyntaxError(Exception):
+    def __init__(self, msg, line):
+        Exception.__init__(self, msg)
+        self.msg = msg
+        self.line = line
+
+
+class _Run(object):
+    """The validation of one document"""
+
+    def __init__(self, validator, ref, errors):
+        self.validator = validator
+        self.ref = ref
+        self.errors = errors
+        self.root = _Frame(validator.root, 1)
+        # target leaf node:set of values
+        self.target_values = {}
+        # leafref node:{value:line}
+        self.leafref_values = {}
+
+    def error(self, line, tag, args):
+        pos = error.Position(self.ref)
+        pos.line = line
+        err_add(self.errors, pos, tag, args)
+
+    def child(self, frame, modulename, name, line):
+        """Return the schema node for the child `name` of `frame`, or
+        None if there is no such child"""
+        node = frame.node.children.get((modulename, name))
+        if node is None:
+            if (modulename is not None and
+                modulename != frame.node.modulename):
+                name = '%s:%s' % (modulename, name)
+            self.error(line, 'INSTANCE_UNKNOWN_NODE', name)
+        return node
+
+    def count(self, frame, node, line):
+        n = frame.counts.get(node, 0) + 1
+        frame.counts[node] = n
+        if n == 2 and node.max_elements == 1:
+            self.error(line, 'INSTANCE_DUPLICATE_NODE', node.name)
+
+    def enter(self, frame, node, line):
+        """Enter the container or list entry `node` in `frame`"""
+        self.count(frame, node, line)
+        child = _Frame(node, line)
+        if node.keys:
+            child.keys = {}
+        return child
+
+    def exit(self, frame, child):
+        """Exit the container or list entry `child` in `frame`"""
+        node = child.node
+        self.check_children(node.checks, child.counts, child.line)
+        if node.keys:
+            values = []
+            for k in node.keys:
+                v = child.keys.get(k)
+                if v is None:
+                    self.error(child.line, 'INSTANCE_MISSING_KEY',
+                               (k.name, node.name))
+                    return
+                values.append(v)
+            values = tuple(values)
+            if frame.entries is None:
+                frame.entries = {}
+            seen = frame.entries.get(node)
+            if seen is None:
+                seen = frame.entries[node] = set()
+            if values in seen:
+                key = ' '.join('%s=%s' % (k.name, v)
+                               for (k, v) in zip(node.keys, values))
+                self.error(child.line, 'INSTANCE_DUPLICATE_KEY',
+                           (key, node.name))
+            else:
+                seen.add(values)
+
+    def value(self, frame, node, value, line, elem=None):
+        """Validate the value of the leaf or leaf-list `node` in `frame`.
+
+        `elem` is the XML element of the value, or None for JSON.
+        """
+        self.count(frame, node, line)
+        if node.validator is not None:
+            msg = node.validator.check(value)
+        elif node.idbases is not None:
+            msg = self.check_identityref(node, value, elem)
+        else:
+            msg = None
+        if msg is not None:
+            self.error(line, 'INSTANCE_BAD_VALUE', (node.name, msg))
+        if node.is_key and frame.keys is not None:
+            frame.keys[node] = value
+        if node.is_target:
+            values = self.target_values.get(node)
+            if values is None:
+                values = self.target_values[node] = set()
+            values.add(value)
+        if node.leafref is not None:
+            values = self.leafref_values.get(node)
+            if values is None:
+                values = self.leafref_values[node] = {}
+            values.setdefault(value, line)
+
+    def check_identityref(self, node, value, elem):
+        (prefix, _, name) = value.rpartition(':')
+        if elem is None:
+            # JSON, the prefix is a module name
+            modulename = prefix or node.modulename
+        else:
+            ns = elem.nsmap.get(prefix or None)
+            modulename = self.validator.namespaces.get(ns)
+        module = self.validator.ctx.get_module(modulename) \
+            if modulename is not None else None
+        identity = None
+        if module is not None:
+            identity = module.i_identities.get(name)
+        if identity is None:
+            return 'identity "%s" not found' % value
+        for base in node.idbases:
+            if not types.is_derived_from(identity, base):
+                return 'identity "%s" not derived from %s' % (value, base.arg)
+        return None
+
+    def check_children(self, checks, counts, line):
+        """Check the number of instances of the nodes in `checks`"""
+        for c in checks:
+            if c.keyword == 'choice':
+                self.check_choice(c, counts, line)
+                continue
+            n = counts.get(c, 0)
+            if n < c.min_elements and not c.conditional:
+                if c.keyword in ('list', 'leaf-list'):
+                    self.error(line, 'INSTANCE_TOO_FEW_ELEMENTS',
+                               (n, c.name, c.min_elements))
+                else:
+                    self.error(line, 'INSTANCE_MISSING_MANDATORY',
+                               (c.keyword, c.name))
+            elif (c.max_elements is not None and n > c.max_elements and
+                  c.keyword in ('list', 'leaf-list')):
+                self.error(line, 'INSTANCE_TOO_MANY_ELEMENTS',
+                           (n, c.name, c.max_elements))
+            elif n == 0 and c.keyword == 'container' and not c.conditional:
+                # the mandatory nodes in a non-presence container
+                self.check_children(c.checks, counts, line)
+
+    def check_choice(self, choice, counts, line):
+        found = None
+        for case in choice.cases:
+            nodes = [n for n in case.nodes if n in counts]
+            if not nodes:
+                continue
+            self.check_children(case.checks, counts, line)
+            if found is None:
+                found = case
+                continue
+            for n in nodes:
+                self.error(line, 'INSTANCE_CASE_CONFLICT',
+                           (n.name, case.name, found.name, choice.name))
+        if found is None and choice.min_elements and not choice.conditional:
+            self.error(line, 'INSTANCE_MISSING_MANDATORY',
+                       ('choice', choice.name))
+
+    def finish(self):
+        """Check the top-level nodes and the leafrefs"""
+        root = self.root
+        modulenames = set(n.modulename for n in root.counts)
+        checks = [c for c in root.node.checks if c.modulename in modulenames]
+        self.check_children(checks, root.counts, root.line)
+        for node, values in self.leafref_values.items():
+            targets = self.target_values.get(node.leafref, ())
+            for value, line in values.items():
+                if value not in targets:
+                    self.error(line, 'INSTANCE_LEAFREF_NOT_FOUND',
+                               (value, node.name, node.leafref.name))
+
+    def validate_xml(self, fd):
+        namespaces = self.validator.namespaces
+        # tag:(module name, name)
+        names = {}
+        stack = [self.root]
+        skip = 0
+        for (event, elem) in lxml.etree.iterparse(
+                fd, events=('start', 'end'), huge_tree=True,
+                remove_comments=True, remove_pis=True):
+            if skip:
+                if event == 'start':
+                    skip += 1
+                    continue
+                skip -= 1
+                if skip:
+                    continue
+                _free(elem)
+                continue
+            if event == 'start':
+                top = stack[-1]
+                try:
+                    (modulename, name) = names[elem.tag]
+                except KeyError:
+                    (ns, name) = _split_tag(elem.tag)
+                    modulename = namespaces.get(ns, ns)
+                    names[elem.tag] = (modulename, name)
+                line = elem.sourceline
+                if not isinstance(top, _Frame):
+                    # a child of a leaf
+                    self.error(line, 'INSTANCE_UNKNOWN_NODE', name)
+                    skip = 1
+                    continue
+                if (len(stack) == 1 and name in ('data', 'config') and
+                    (modulename, name) not in top.node.children):
+                    stack.append(top)
+                    continue
+                node = self.child(top, modulename, name, line)
+                if node is None:
+                    skip = 1
+                elif node.keyword in ('container', 'list'):
+                    stack.append(self.enter(top, node, line))
+                elif node.keyword in ('leaf', 'leaf-list'):
+                    stack.append(node)
+                else:
+                    # anydata, anyxml
+                    self.count(top, node, line)
+                    skip = 1
+            else:
+                top = stack.pop()
+                if not isinstance(top, _Frame):
+                    # the leaf is freed with its parent
+                    self.value(stack[-1], top, elem.text or '',
+                               elem.sourceline, elem)
+                    continue
+                if top is not stack[-1]:
+                    # not the "data" or "config" root element
+                    self.exit(stack[-1], top)
+                _free(elem)
+
+    def validate_json(self, fd):
+        reader = _JSONReader(fd)
+        reader.expect('{')
+        self.json_members(reader, self.root, top=True)
+        (tok, _) = reader.next()
+        if tok is not None:
+            raise _SyntaxError('unexpected data after the document',
+                               reader.line)
+
+    def json_members(self, reader, frame, top=False):
+        """Read the members of an object, after the '{'"""
+        first = True
+        while True:
+            (name, tok) = reader.member(first)
+            if name is None:
+                return
+            first = False
+            line = reader.line
+            (modulename, _, name) = name.rpartition(':')
+            if not modulename:
+                modulename = frame.node.modulename
+            if name.startswith('@'):
+                # metadata
+                reader.skip_value(tok)
+            elif (top and (modulename, name) == ('ietf-restconf', 'data') and
+                  (modulename, name) not in frame.node.children):
+                reader.expect('{', tok)
+                self.json_members(reader, frame)
+            else:
+                node = self.child(frame, modulename, name, line)
+                if node is None:
+                    reader.skip_value(tok)
+                else:
+                    self.json_node(reader, frame, node, line, tok)
+
+    def json_node(self, reader, frame, node, line, tok):
+        """Read the value of `node`.  `tok` is the first token of the
+        value, or None if it is not read yet."""
+        keyword = node.keyword
+        if keyword == 'container':
+            reader.expect('{', tok)
+            child = self.enter(frame, node, line)
+            self.json_members(reader, child)
+            self.exit(frame, child)
+        elif keyword == 'list':
+            for line in self.json_array(reader, tok):
+                reader.expect('{')
+                child = self.enter(frame, node, line)
+                self.json_members(reader, child)
+                self.exit(frame, child)
+        elif keyword == 'leaf':
+            self.json_value(reader, frame, node, tok)
+        elif keyword == 'leaf-list':
+            for _line in self.json_array(reader, tok):
+                self.json_value(reader, frame, node, None)
+        else:
+            # anydata, anyxml
+            self.count(frame, node, line)
+            reader.skip_value(tok)
+
+    def json_array(self, reader, tok):
+        """Read an array, and yield the line of each element; the
+        element is read by the caller"""
+        reader.expect('[', tok)
+        if reader.peek() == ']':
+            reader.next()
+            return
+        while True:
+            yield reader.line
+            (tok, _) = reader.next()
+            if tok == ']':
+                return
+            if tok != ',':
+                raise _SyntaxError("expected ',' or ']'", reader.line)
+
+    def json_value(self, reader, frame, node, tok):
+        if tok is None:
+            tok = reader.next()
+        (kind, value) = tok
+        if kind == '[':
+            # the empty type
+            reader.expect('null')
+            reader.expect(']')
+            value = ''
+        elif kind in ('true', 'false'):
+            value = kind
+        elif kind not in ('string', 'number'):
+            raise _SyntaxError('expected a value for "%s"' % node.name,
+                               reader.line)
+        if node.json_kinds is not None and kind not in node.json_kinds:
+            self.error(reader.line, 'INSTANCE_BAD_ENCODING',
+                       (_json_kind_names[kind], node.name))
+        self.value(frame, node, value, reader.line)
+
+
+def _split_tag(tag):
+    if tag[0] == '{':
+        (ns, name) = tag[1:].split('}', 1)
+        return (ns, name)
+    return (None, tag)
+
+
+def _free(elem):
+    """Free the element `elem`, and its preceding siblings, after its
+    end event"""
+    elem.clear()
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
+class _JSONReader(object):
+    """Incremental JSON tokenizer.
+
+    Reads the file in chunks and returns tokens as (type, value),
+    where type is one of '{', '}', '[', ']', ':', ',', 'string',
+    'number', 'true', 'false', 'null', or None at the end of the
+    file.  The value of a number is the number as a string.
+    """
+
+    chunk_size = 65536
+
+    # whitespace, followed by a punctuator, a string without escapes,
+    # the start of any other string, a number, or a literal name
+    _token = re.compile(
+        r'([ \t\n\r]*)(?:([{}\[\]:,])|"([^"\\\x00-\x1f]*)"|(")|'
+        r'(-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?)|'
+        r'(true|false|null))')
+
+    # a member name, and a scalar value without escapes
+    _member = re.compile(
+        r'[ \t\n\r]*(,)?[ \t\n\r]*"([^"\\\x00-\x1f]*)"[ \t\n\r]*:'
+        r'(?:[ \t\n\r]*(?:"([^"\\\x00-\x1f]*)"|'
+        r'(-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?)|'
+        r'(true|false))(?=[ \t\n\r]*[,}]))?')
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.buf = ''
+        self.i = 0
+        self.eof = False
+        self.line = 1
+        self._peeked = None
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def _read(self):
+        """Read a chunk, and return False at the end of the file"""
+        if self.eof:
+            return False
+        data = self.fd.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            if isinstance(data, bytes):
+                # report a truncated UTF-8 sequence at the end
+                self._decode(data, True)
+            return False
+        if isinstance(data, bytes):
+            data = self._decode(data)
+        self.buf = self.buf[self.i:] + data
+        self.i = 0
+        return True
+
+    def _decode(self, data, final=False):
+        """Decode the UTF-8 bytes `data`, and raise a _SyntaxError with
+        the line of the first invalid byte if they are not valid"""
+        pending = len(self._decoder.getstate()[0])
+        try:
+            return self._decoder.decode(data, final)
+        except UnicodeDecodeError as ex:
+            line = (self.line + self.buf.count('\n', self.i) +
+                    data.count(b'\n', 0, max(ex.start - pending, 0)))
+            raise _SyntaxError('invalid UTF-8: %s' % ex.reason, line)
+
+    def peek(self):
+        """Return the type of the next token"""
+        if self._peeked is None:
+            self._peeked = self.next()
+        return self._peeked[0]
+
+    def next(self):
+        if self._peeked is not None:
+            tok = self._peeked
+            self._peeked = None
+            return tok
+        while True:
+            m = self._token.match(self.buf, self.i)
+            # the token may continue in the next chunk
+            if (m is None or m.end() == len(self.buf)) and self._read():
+                continue
+            if m is None:
+                if self.buf[self.i:].strip(' \t\n\r'):
+                    raise _SyntaxError('unexpected character %r' %
+                                       self.buf[self.i:].lstrip()[0],
+                                       self.line)
+                self.i = len(self.buf)
+                return (None, None)
+            ws = m.group(1)
+            if ws and '\n' in ws:
+                # skip the whitespace, so that the lines are not
+                # counted again if the token is read again
+                self.line += ws.count('\n')
+                self.i += len(ws)
+            kind = m.lastindex
+            if kind == 2:
+                self.i = m.end()
+                return (m.group(2), None)
+            if kind == 3:
+                self.i = m.end()
+                return ('string', m.group(3))
+            if kind == 4:
+                try:
+                    (val, end) = json.decoder.scanstring(self.buf, m.end())
+                except json.decoder.JSONDecodeError as ex:
+                    # read more if the string may continue in the
+                    # next chunk
+                    if ((ex.msg.startswith('Unterminated') or
+                         len(self.buf) - ex.pos <= 6) and self._read()):
+                        continue
+                    raise _SyntaxError(ex.msg, self.line)
+                self.i = end
+                return ('string', val)
+            self.i = m.end()
+            if kind == 5:
+                return ('number', m.group(5))
+            return (m.group(6), None)
+
+    def member(self, first):
+        """Read the name of the next member of an object, and return
+        (name, token), where token is the first token of the value if
+        it is read, otherwise None.  Return (None, None) at the end of
+        the object.  `first` is True for the first member."""
+        # fast path, read the name and a scalar value
+        m = self._member.match(self.buf, self.i)
+        if (m is not None and (m.group(1) is None) == first and
+            m.end() < len(self.buf) and self._peeked is None):
+            self.line += self.buf.count('\n', self.i, m.end())
+            self.i = m.end()
+            if m.group(3) is not None:
+                return (m.group(2), ('string', m.group(3)))
+            elif m.group(4) is not None:
+                return (m.group(2), ('number', m.group(4)))
+            elif m.group(5) is not None:
+                return (m.group(2), (m.group(5), None))
+            return (m.group(2), None)
+        (tok, name) = self.next()
+        if tok == '}':
+            return (None, None)
+        if not first:
+            if tok != ',':
+                raise _SyntaxError("expected ',' or '}'", self.line)
+            (tok, name) = self.next()
+        if tok != 'string':
+            raise _SyntaxError('expected a member name', self.line)
+        self.expect(':')
+        return (name, None)
+
+    def expect(self, tok, first=None):
+        """Read a token of type `tok`.  `first` is the token if it is
+        already read."""
+        if first is None:
+            first = self.next()
+        if first[0] != tok:
+            raise _SyntaxError("expected '%s'" % tok, self.line)
+
+    def skip_value(self, first=None):
+        """Skip a value.  `first` is the first token of the value if it
+        is already read."""
+        depth = 0
+        while True:
+            if first is not None:
+                (tok, _) = first
+                first = None
+            else:
+                (tok, _) = self.next()
+            if tok in ('{', '['):
+                depth += 1
+            elif tok in ('}', ']'):
+                depth -= 1
+            elif tok is None:
+                raise _SyntaxError('unexpected end of file', self.line)
+            if depth == 0 and tok not in (':', ','):
+                return
@@ -0,0 +1,195 @@
+"""Output files for the emitters"""
+
+import gc
+import gzip
+import io
+import multiprocessing
+import os
+import sys
+import time
+
+from . import error
+
+BUFSIZE = 1024 * 1024
+"""The size of the output buffer"""
+
+DEFAULT_TEMPLATE = '{module}@{revision}.{ext}'
+"""The default template for the file names with --output-dir"""
+
+file_extensions = {
+    'flatten': 'csv',
+    'hypertree': 'xml',
+    'jsonxsl': 'xsl',
+    'jstree': 'html',
+    'omni': 'graffle',
+    'sample-xml-skeleton': 'xml',
+    'tree-json': 'jsonl',
+}
+"""The file extensions for the output formats; the default extension
+is the name of the format"""
+
+
+def output_filename(template, module, fmt):
+    """Return the file name for the output of `module` in the format
+    `fmt`.
+
+    The `template` can refer to {module}, {revision}, {format} and
+    {ext}.  If the module has no revision, "@{revision}" is removed
+    from the template.  Raises KeyError or ValueError for a bad
+    template.
+    """
+    revisions = [r.arg for r in module.search('revision')]
+    if revisions:
+        revision = max(revisions)
+    else:
+        revision = ''
+        template = template.replace('@{revision}', '')
+    return template.format(module=module.arg, revision=revision, format=fmt,
+                           ext=file_extensions.get(fmt, fmt))
+
+
+def emit_modules(ctx, emit_obj, modules, filenames, jobs=1):
+    """Emit each module in `modules` to its own file in `filenames`.
+
+    If `jobs` is greater than one, the modules are emitted by worker
+    processes, which are forked when this function is called, so that
+    they share the validated modules with this process.
+
+    Return a list with (exit_code, msg, nbytes, time) per module,
+    where `exit_code` and `msg` are from the EmitError if the emit
+    failed, and `nbytes` and `time` are from the Output.
+    """
+    global _emit_args
+    _emit_args = (ctx, emit_obj, modules, filenames)
+    try:
+        n = len(modules)
+        if (jobs > 1 and n > 1 and
+            'fork' in multiprocessing.get_all_start_methods()):
+            # move the objects to the permanent generation, so that the
+            # garbage collector in the workers does not write to them
+            gc.freeze()
+            try:
+                mp = multiprocessing.get_context('fork')
+                with mp.Pool(min(jobs, n)) as pool:
+                    return pool.map(_emit_module, range(n), chunksize=1)
+            finally:
+                gc.unfreeze()
+        return [_emit_module(i) for i in range(n)]
+    finally:
+        _emit_args = None
+
+
+_emit_args = None
+
+
+def _emit_module(i):
+    (ctx, emit_obj, modules, filenames) = _emit_args
+    out = Output(filenames[i])
+    try:
+        emit_obj.emit(ctx, [modules[i]], out.fd)
+    except error.EmitError as e:
+        out.abort()
+        return (e.exit_code, e.msg, None, None)
+    except:
+        out.abort()
+        raise
+    out.close()
+    return (None, None, out.nbytes, out.time)
+
+
+class Output(object):
+    """A text file for the output of an emitter.
+
+    The output is written to `filename`, or to stdout if `filename` is
+    None.  A file is first written to a temporary file, which replaces
+    `filename` when the output is closed, so that `filename` is never
+    partially written.  If `compress` is True, or None and `filename`
+    ends with ".gz", the output is compressed with gzip.
+
+    The emitter writes to `fd`, which is buffered in chunks of
+    `bufsize` bytes.  When the output is closed, `nbytes` is the
+    number of (uncompressed) bytes written, and `time` is the time in
+    seconds since the output was opened.
+    """
+
+    def __init__(self, filename=None, compress=None, bufsize=BUFSIZE):
+        self.filename = filename
+        self.tmpfile = None
+        self.nbytes = None
+        self.time = None
+        self._start = time.time()
+        self._file = None
+        self._gzip = None
+        self._counter = None
+        if compress is None:
+            compress = filename is not None and filename.endswith('.gz')
+        if filename is None:
+            sys.stdout.flush()
+            raw = getattr(sys.stdout, 'buffer', None)
+            if raw is None:
+                # stdout is not a standard text file
+                self.fd = sys.stdout
+                return
+            encoding = sys.stdout.encoding
+            errors = sys.stdout.errors
+        else:
+            self.tmpfile = filename + '.tmp'
+            raw = self._file = io.open(self.tmpfile, 'wb')
+            encoding = 'utf-8'
+            errors = 'strict'
+        if compress:
+            raw = self._gzip = gzip.GzipFile(fileobj=raw, mode='wb')
+        self._counter = _Counter(raw)
+        self.fd = io.TextIOWrapper(io.BufferedWriter(self._counter, bufsize),
+                                   encoding=encoding, errors=errors)
+
+    def close(self):
+        """Write the buffered output, and replace `filename` with the
+        temporary file"""
+        self._finish()
+        if self.tmpfile is not None:
+            os.replace(self.tmpfile, self.filename)
+
+    def abort(self):
+        """Close the output, and remove the temporary file"""
+        try:
+            self._finish()
+        finally:
+            if self.tmpfile is not None:
+                os.remove(self.tmpfile)
+
+    def _finish(self):
+        try:
+            if self._counter is None:
+                self.fd.flush()
+            else:
+                # detach the buffers, so that stdout is not closed
+                self.fd.detach().detach()
+                self._counter.close()
+                self.nbytes = self._counter.nbytes
+            if self._gzip is not None:
+                self._gzip.close()
+            if self._file is None:
+                sys.stdout.flush()
+        finally:
+            if self._file is not None:
+                self._file.close()
+            self.time = time.time() - self._start
+
+
+class _Counter(io.RawIOBase):
+    """A raw file which counts the bytes written to `fd`"""
+
+    def __init__(self, fd):
+        io.RawIOBase.__init__(self)
+        self.fd = fd
+        self.nbytes = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.fd.write(b)
+        n = len(b)
+        self.nbytes += n
+        return n
@@ -1,25 +1,93 @@
 """pyang plugin handling"""
 
+import importlib
 import os
 import sys
-import pkg_resources
 
 plugins = []
 """List of registered PyangPlugin instances"""
 
-def init(plugindirs=None):
-    """Initialize the plugin framework"""
+manifest = {
+    'pyang.translators.yin': {'formats': ['yin'], 'options': ['--yin-']},
+    'pyang.translators.dsdl': {'formats': ['dsdl'], 'options': ['--dsdl-']},
+    'pyang.plugins.capability': {'formats': ['capability'],
+                                 'options': ['--capability-']},
+    'pyang.plugins.check_update': {'options': ['--check-update-',
+                                               '-P', '-D']},
+    'pyang.plugins.depend': {'formats': ['depend'], 'options': ['--depend-']},
+    'pyang.plugins.flatten': {'formats': ['flatten'],
+                              'options': ['--flatten-']},
+    'pyang.plugins.identifiers': {'formats': ['identifiers']},
+    'pyang.plugins.jsonxsl': {'formats': ['jsonxsl']},
+    'pyang.plugins.jstree': {'formats': ['jstree'], 'options': ['--jstree-']},
+    'pyang.plugins.jtox': {'formats': ['jtox']},
+    'pyang.plugins.name': {'formats': ['name'], 'options': ['--name-']},
+    'pyang.plugins.omni': {'formats': ['omni'], 'options': ['--omni-']},
+    'pyang.plugins.sample-xml-skeleton': {
+        'formats': ['sample-xml-skeleton'],
+        'options': ['--sample-xml-skeleton-']},
+    'pyang.plugins.sid': {'options': ['--sid-']},
+    'pyang.plugins.tree': {'formats': ['tree', 'tree-json'],
+                           'options': ['--tree-']},
+    'pyang.plugins.uml': {'formats': ['uml'], 'options': ['--uml-']},
+    'pyang.plugins.lint': {'options': ['--lint', '--lint-']},
+    'pyang.plugins.bbf': {'options': ['--bbf'],
+                          'requires': ['pyang.plugins.lint']},
+    'pyang.plugins.ieee': {'options': ['--ieee'],
+                           'requires': ['pyang.plugins.lint']},
+    'pyang.plugins.ietf': {'options': ['--ietf', '--ietf-help'],
+                           'requires': ['pyang.plugins.lint']},
+    'pyang.plugins.mef': {'options': ['--mef'],
+                          'requires': ['pyang.plugins.lint']},
+    'pyang.plugins.threegpp': {'options': ['--3gpp'],
+                               'requires': ['pyang.plugins.lint']},
+    'pyang.transforms.edit': {'transforms': ['edit'],
+                              'options': ['--edit-']},
+}
+"""Manifest of the builtin plugins which can be loaded lazily
+
+dict of module name:{'formats': [format name],
+                     'transforms': [transform name],
+                     'options': [option],
+                     'requires': [module name]}
+
+The formats and transforms are the ones the plugin adds, and the
+options are the option strings it adds, where a long option ending
+with a '-' stands for all options starting with it.  'requires' are
+the plugins whose options the plugin uses.
+
+The builtin plugins which are not in the manifest, such as the ones
+which add extension statements to the grammar, are always loaded.
+"""
+
+loaded = set()
+"""Set of the module names in `manifest` which have been loaded"""
+
+def init(plugindirs=None, args=None):
+    """Initialize the plugin framework
+
+    If `args` is given, it is the list of command line arguments, and
+    the plugins in `manifest` are loaded only if one of their formats,
+    transforms or options is used in `args`.  Otherwise all plugins
+    are loaded.
+    """
     if plugindirs is None:
         plugindirs = []
 
+    if args is None:
+        needed = set(manifest)
+    else:
+        needed = set(get_plugins_for_args(args))
+
     # initialize the builtin plugins
-    from .translators import yang,yin,dsdl
+    from .translators import yang
     yang.pyang_plugin_init()
-    yin.pyang_plugin_init()
-    dsdl.pyang_plugin_init()
+    for modname in ('pyang.translators.yin', 'pyang.translators.dsdl'):
+        if modname in needed:
+            load_plugins([modname])
 
     # initialize installed plugins
-    for ep in pkg_resources.iter_entry_points(group='pyang.plugin'):
+    for ep in _get_entry_points('pyang.plugin'):
         plugin_init = ep.load()
         plugin_init()
 
@@ -27,6 +95,8 @@ def init(plugindirs=None):
     basedir = os.path.split(sys.modules['pyang'].__file__)[0]
     plugindirs.insert(0, basedir + "/transforms")
     plugindirs.insert(0, basedir + "/plugins")
+    builtindirs = {basedir + "/plugins": 'pyang.plugins.',
+                   basedir + "/transforms": 'pyang.transforms.'}
 
     # add paths from env
     pluginpath = os.getenv('PYANG_PLUGINPATH')
@@ -56,6 +126,11 @@ def init(plugindirs=None):
                 if modname not in modnames:
                     modnames.append(modname)
         for modname in modnames:
+            fullname = builtindirs.get(plugindir, '') + modname
+            if fullname in manifest:
+                if fullname in needed:
+                    load_plugins([fullname])
+                continue
             pluginmod = __import__(modname)
             try:
                 pluginmod.pyang_plugin_init()
@@ -64,6 +139,82 @@ def init(plugindirs=None):
                 raise AttributeError(pluginmod.__file__ + ': ' + str(s))
         sys.path = syspath
 
+def load_plugins(modnames):
+    """Load and initialize the plugins `modnames` from `manifest`,
+    and the plugins they require, unless already loaded"""
+    for modname in modnames:
+        if modname in loaded:
+            continue
+        loaded.add(modname)
+        load_plugins(manifest[modname].get('requires', []))
+        pluginmod = importlib.import_module(modname)
+        pluginmod.pyang_plugin_init()
+
+def get_plugins_for_args(args):
+    """Return the module names of the plugins in `manifest` which are
+    needed for the command line arguments `args`
+
+    A plugin is needed if its format or transform is selected, or if
+    one of its options, or an abbreviation of it, is given.  The
+    arguments are not fully parsed, so a plugin may be returned even
+    if it turns out not to be needed.  For help and for the error
+    listing, all plugins are needed.
+    """
+    def match_long(arg, options):
+        for opt in options:
+            if opt.startswith('--'):
+                if opt.startswith(arg):
+                    return True
+                if opt.endswith('-') and arg.startswith(opt):
+                    return True
+        return False
+
+    formats = set()
+    transforms = set()
+    options = set()
+    args = iter(args)
+    for arg in args:
+        if arg == '--':
+            break
+        if arg.startswith('--') and len(arg) > 2:
+            (arg, eq, value) = arg.partition('=')
+            if match_long(arg, ['--help', '--list-errors']):
+                return list(manifest)
+            for (selected, opt) in ((formats, '--format'),
+                                    (transforms, '--transform')):
+                if opt.startswith(arg):
+                    selected.add(value if eq else next(args, None))
+            options.add(arg)
+        elif arg.startswith('-') and len(arg) > 1:
+            for i, c in enumerate(arg[1:], 2):
+                if c in 'he':
+                    return list(manifest)
+                if c in 'ft':
+                    value = arg[i:] or next(args, None)
+                    (formats if c == 'f' else transforms).add(value)
+                    break
+                options.add('-' + c)
+    res = []
+    for modname, info in manifest.items():
+        opts = info.get('options', [])
+        if (formats.intersection(info.get('formats', [])) or
+            transforms.intersection(info.get('transforms', [])) or
+            [arg for arg in options if arg in opts or match_long(arg, opts)]):
+            res.append(modname)
+    return res
+
+def _get_entry_points(group):
+    try:
+        from importlib import metadata
+    except ImportError:
+        # Python < 3.8
+        import pkg_resources
+        return pkg_resources.iter_entry_points(group=group)
+    eps = metadata.entry_points()
+    if hasattr(eps, 'select'):
+        return eps.select(group=group)
+    return eps.get(group, [])
+
 def register_plugin(plugin):
     """Call this to register a pyang plugin. See class PyangPlugin
     for more info.
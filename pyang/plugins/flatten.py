@@ -432,16 +432,15 @@ class FlattenPlugin(plugin.PyangPlugin):
             return "ro", None
 
     def get_mod_prefix_path(self, stmt, with_keys=False):
-        """Duplicate statements.mk_path_str,
+        """Like statements.mk_path_str,
         but output module and prefix both in path.
         """
-        resolved_names = statements.mk_path_list(stmt)
-        xpath_elements = []
-        for index, resolved_name in enumerate(resolved_names):
-            module_name, prefix, node_name, node_keys = resolved_name
-            xpath_element = "%s:%s:%s" % (module_name, prefix, node_name)
-            if with_keys and node_keys:
-                for node_key in node_keys:
+        def element(s, _last):
+            xpath_element = "%s:%s:%s" % (
+                s.i_module.arg, s.i_module.i_prefix, s.arg)
+            if with_keys:
+                for node_key in statements.get_keys(s):
                     xpath_element = "%s[%s]" % (xpath_element, node_key)
-            xpath_elements.append(xpath_element)
-        return "/%s" % "/".join(xpath_elements)
+            return xpath_element
+        return statements.get_path_index(stmt).get_data_path(
+            stmt, ("flatten-mod-prefix", with_keys), element)
@@ -2,6 +2,7 @@
 import optparse
 
 from pyang import plugin
+from pyang import statements
 
 paths_in_module = []
 leafrefs = []
@@ -305,10 +306,12 @@ def fullpath(stmt):
         elif stmt.keyword == 'grouping':
             path = path + '-grouping'
 
-        while stmt.parent is not None:
-            stmt = stmt.parent
-            if stmt.arg is not None:
-                path = stmt.arg + pathsep + path
+        if stmt.parent is not None:
+            # the ancestors are kept in the path index
+            parent_path = statements.get_path_index(stmt).get_arg_path(
+                stmt.parent, pathsep)
+            if parent_path is not None:
+                path = parent_path + pathsep + path
     path = path.replace('-', '_')
     path = path.replace(':', '_')
     path = path.replace('/', '_')
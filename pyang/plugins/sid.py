@@ -17,6 +17,7 @@ from json import JSONDecodeError
 
 
 from pyang import plugin
+from pyang import statements
 from pyang import util
 from pyang import error
 
@@ -288,6 +289,7 @@ class SidFile:
         self.count = False
         self.node_highest = 0
         self.content = collections.OrderedDict()
+        self.item_index = {}
         self.module_name = ''
         self.module_revision = ''
         self.output_file_name = ''
@@ -575,8 +577,11 @@ class SidFile:
         if 'items' not in self.content:
             self.content['items'] = []
 
+        self.item_index = {}
         for item in self.content['items']:
             item['lifecycle'] = 'd' # Set to 'd' deleted, updated to 'o' if present in .yang file
+            self.item_index.setdefault(
+                (item['namespace'], item['identifier']), item)
 
         self.merge_item('module', self.module_name)
 
@@ -656,37 +661,45 @@ class SidFile:
                 self.collect_inner_data_nodes(statement.i_grouping.i_children, prefix)
 
     def get_path(self, statement, prefix=""):
-        path = ""
-
-        while statement.i_module is not None:
-            if (statement.keyword not in self.grouping_keywords
-                    and not self.has_yang_data_extension(statement)):
-                # Locate the data node parent
-                parent = statement.parent
-                while parent.i_module is not None:
-                    if parent.keyword in self.module_keywords:
-                        break
-                    parent = parent.parent
-
-                if (prefix != "" or
-                    (parent.i_module is not None and parent.i_module == statement.i_module)):
-                    path = "/" + statement.arg + path
-                else:
-                    path = "/" + statement.i_module.arg + ":" + statement.arg + path
-
-            statement = statement.parent
+        qualified = prefix == ""
+
+        def step(statement, path):
+            if statement.i_module is None:
+                return ""
+            if path is None:
+                path = ""
+            if (statement.keyword in self.grouping_keywords
+                    or self.has_yang_data_extension(statement)):
+                return path
+
+            # Locate the data node parent
+            parent = statement.parent
+            while parent.i_module is not None:
+                if parent.keyword in self.module_keywords:
+                    break
+                parent = parent.parent
+
+            if (not qualified or
+                (parent.i_module is not None and parent.i_module == statement.i_module)):
+                return path + "/" + statement.arg
+            else:
+                return path + "/" + statement.i_module.arg + ":" + statement.arg
 
-        return prefix + path
+        # the paths of the ancestors are kept in the path index
+        index = statements.get_path_index(statement)
+        return prefix + index.get_path(statement, ("sid", qualified), step)
 
     def merge_item(self, namespace, identifier):
-        for item in self.content['items']:
-            if (namespace == item['namespace'] and identifier == item['identifier']):
-                item['lifecycle'] = 'o' # Item already assigned
-                return
-        self.content['items'].append(collections.OrderedDict(
+        item = self.item_index.get((namespace, identifier))
+        if item is not None:
+            item['lifecycle'] = 'o' # Item already assigned
+            return
+        item = collections.OrderedDict(
             [('namespace', namespace), ('identifier', identifier),
              ('status', 'unstable'),
-             ('sid', -1), ('lifecycle', 'n')]))
+             ('sid', -1), ('lifecycle', 'n')])
+        self.content['items'].append(item)
+        self.item_index[(namespace, identifier)] = item
         self.is_consistent = False
 
     ########################################################
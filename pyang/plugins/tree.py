@@ -5,6 +5,7 @@ Compatible with RFC 8340 and RFC 8791.
 Idea copied from libsmi.
 """
 
+import json
 import optparse
 import sys
 import re
@@ -15,6 +16,7 @@ from pyang import util
 
 def pyang_plugin_init():
     plugin.register_plugin(TreePlugin())
+    plugin.register_plugin(TreeJsonPlugin())
 
 class TreePlugin(plugin.PyangPlugin):
     def __init__(self):
@@ -83,14 +85,36 @@ class TreePlugin(plugin.PyangPlugin):
         ctx.implicit_errors = False
 
     def emit(self, ctx, modules, fd):
-        if ctx.opts.tree_path is not None:
-            path = ctx.opts.tree_path.split('/')
-            if path[0] == '':
-                path = path[1:]
-        else:
-            path = None
         emit_tree(ctx, modules, fd, ctx.opts.tree_depth,
-                  ctx.opts.tree_line_length, path)
+                  ctx.opts.tree_line_length, get_tree_path(ctx))
+
+class TreeJsonPlugin(plugin.PyangPlugin):
+    """The tree as JSON lines, with one JSON object per node.
+
+    Uses the options of the tree output, except --tree-line-length.
+    """
+    def __init__(self):
+        plugin.PyangPlugin.__init__(self, 'tree-json')
+
+    def add_output_format(self, fmts):
+        self.multiple_modules = True
+        fmts['tree-json'] = self
+
+    def setup_fmt(self, ctx):
+        ctx.implicit_errors = False
+
+    def emit(self, ctx, modules, fd):
+        emit_tree_json(ctx, modules, fd, ctx.opts.tree_depth,
+                       get_tree_path(ctx))
+
+def get_tree_path(ctx):
+    if ctx.opts.tree_path is not None:
+        path = ctx.opts.tree_path.split('/')
+        if path[0] == '':
+            path = path[1:]
+    else:
+        path = None
+    return path
 
 def print_help():
     print("""
@@ -151,159 +175,231 @@ def emit_tree(ctx, modules, fd, depth, llen, path):
     for module in modules:
         if printed_header:
             fd.write("\n")
-        chs = [ch for ch in module.i_children
-               if ch.keyword in statements.data_definition_keywords]
-        if path is not None and len(path) > 0:
-            chs = [ch for ch in chs if ch.arg == path[0]]
-            chpath = path[1:]
-        else:
-            chpath = path
-
-        if len(chs) > 0:
+        delimited = set()
+        for (section, top, m, chs, chpath, mode) in \
+                iter_sections(ctx, module, modules, path):
             print_header(module)
-            print_children(chs, module, fd, '', chpath, 'data', depth, llen,
-                           ctx.opts.tree_no_expand_uses,
-                           prefix_with_modname=ctx.opts.modname_prefix)
-
-        mods = [module]
-        for i in module.search('include'):
-            subm = ctx.get_module(i.arg)
-            if subm is not None:
-                mods.append(subm)
-        section_delimiter_printed=False
-        for m in mods:
-            for augment in m.search('augment'):
-                if (hasattr(augment, 'i_target_node') and
-                    hasattr(augment.i_target_node, 'i_module') and
-                    augment.i_target_node.i_module not in modules + mods):
-                    # this augment has not been printed; print it
-                    print_header(module)
-                    if not section_delimiter_printed:
-                        fd.write('\n')
-                        section_delimiter_printed = True
-                    print_path("  augment", ":", augment.arg, fd, llen)
-                    mode = 'augment'
-                    if augment.i_target_node.keyword == 'input':
-                        mode = 'input'
-                    elif augment.i_target_node.keyword == 'output':
-                        mode = 'output'
-                    elif augment.i_target_node.keyword == 'notification':
-                        mode = 'notification'
-                    print_children(augment.i_children, m, fd,
-                                   '  ', path, mode, depth, llen,
-                                   ctx.opts.tree_no_expand_uses,
-                                   prefix_with_modname=ctx.opts.modname_prefix)
-
-        rpcs = [ch for ch in module.i_children
-                if ch.keyword == 'rpc']
-        rpath = path
-        if path is not None:
-            if len(path) > 0:
-                rpcs = [rpc for rpc in rpcs if rpc.arg == path[0]]
-                rpath = path[1:]
+            if section in ('rpc', 'notification'):
+                fd.write("\n  %ss:\n" % section)
+            elif section != 'data':
+                if section not in delimited:
+                    fd.write('\n')
+                    delimited.add(section)
+                if section == 'augment':
+                    print_path("  augment", ":", top, fd, llen)
+                else:
+                    fd.write("  %s %s:\n" % (section, top))
+            if section == 'data':
+                prefix = ''
             else:
-                rpcs = []
-        if len(rpcs) > 0:
-            print_header(module)
-            fd.write("\n  rpcs:\n")
-            print_children(rpcs, module, fd, '  ', rpath, 'rpc', depth, llen,
+                prefix = '  '
+            print_children(chs, m, fd, prefix, chpath, mode, depth, llen,
                            ctx.opts.tree_no_expand_uses,
                            prefix_with_modname=ctx.opts.modname_prefix)
 
-        notifs = [ch for ch in module.i_children
-                  if ch.keyword == 'notification']
-        npath = path
+def emit_tree_json(ctx, modules, fd, depth, path):
+    """Write one JSON object per line for each node in the tree.
+
+    The nodes are the same, and in the same order, as in the tree
+    output.  Each object has the members:
+
+      module       the module of the tree
+      section      'data', 'augment', 'rpc', 'notification', 'grouping',
+                   'yang-data', 'structure' or 'augment-structure'
+      top          the target of the augment, or the name of the
+                   grouping, yang-data or structure, or null
+      path         the names of the node and its ancestors in the section,
+                   as printed in the tree, separated by "/"
+      keyword      the keyword of the node
+      node-module  the module which defines the node
+      status       'current', 'deprecated' or 'obsolete'
+      flags        <flags> in the tree
+      opts         <opts> in the tree, except the keys of a list
+      type         <type> in the tree, or null
+      keys         the keys of a list, or null
+      if-features  the features the node depends on
+      when         true if the node, or the augment or uses which
+                   added it, has a when expression
+      must         true if the node has must expressions
+    """
+    for module in modules:
+        for (section, top, m, chs, chpath, mode) in \
+                iter_sections(ctx, module, modules, path):
+            info = {'module': module.arg, 'section': section, 'top': top}
+            write_json_children(chs, m, fd, info, '', chpath, mode, depth,
+                                ctx.opts.tree_no_expand_uses,
+                                ctx.opts.modname_prefix)
+
+def write_json_children(i_children, module, fd, info, parent, path, mode,
+                        depth, no_expand_uses, prefix_with_modname):
+    if depth == 0:
+        return
+    if no_expand_uses:
+        i_children = unexpand_uses(i_children)
+    for ch in i_children:
+        if ((ch.keyword == 'input' or ch.keyword == 'output') and
+            len(ch.i_children) == 0):
+            continue
+        if ch.keyword == 'input':
+            mode = 'input'
+        elif ch.keyword == 'output':
+            mode = 'output'
+        write_json_node(ch, module, fd, info, parent, path, mode, depth,
+                        no_expand_uses, prefix_with_modname)
+
+def write_json_node(s, module, fd, info, parent, path, mode, depth,
+                    no_expand_uses, prefix_with_modname):
+    subs = get_substmts(s)
+    nodepath = parent + '/' + get_name(s, module, prefix_with_modname)
+    keys = None
+    if s.keyword == 'list':
+        key = subs.get('key')
+        keys = key.arg.split() if key is not None else []
+    status = subs.get('status')
+    when = (subs.get('when') is not None or
+            hasattr(s, 'i_augment') and
+            s.i_augment.search_one('when') is not None or
+            any(u.search_one('when') is not None
+                for u in getattr(s, 'i_uses', ())))
+    node = {
+        'module': info['module'],
+        'section': info['section'],
+        'top': info['top'],
+        'path': nodepath,
+        'keyword': util.keyword_to_str(s.keyword),
+        'node-module': s.i_module.i_modulename,
+        'status': status.arg if status is not None else 'current',
+        'flags': get_flags_str(s, mode),
+        'opts': get_opts_str(s, subs),
+        'type': get_typename(s, prefix_with_modname) or None,
+        'keys': keys,
+        'if-features': get_featurenames(s, subs),
+        'when': when,
+        'must': subs.get('must') is not None,
+    }
+    fd.write(json.dumps(node) + '\n')
+    if hasattr(s, 'i_children') and s.keyword != 'uses':
+        if depth is not None:
+            depth = depth - 1
+        chs = s.i_children
+        if path is not None and len(path) > 0:
+            chs = children_with_arg(chs, path[0])
+            path = path[1:]
+        write_json_children(chs, module, fd, info, nodepath, path, mode,
+                            depth, no_expand_uses, prefix_with_modname)
+
+def iter_sections(ctx, module, modules, path):
+    """Yield the sections of the tree of `module`.
+
+    Yields (section, top, m, chs, path, mode), where `section` is
+    'data', 'augment', 'rpc', 'notification', 'grouping', 'yang-data',
+    'structure' or 'augment-structure', `top` is the target of the
+    augment or the name of the grouping, yang-data or structure, `m` is
+    the (sub)module which defines the section, `chs` are the top-level
+    nodes, `path` is the remaining --tree-path and `mode` is the mode
+    of the nodes.
+    """
+    chs = module.i_children
+    if path is not None and len(path) > 0:
+        chs = children_with_arg(chs, path[0])
+        chpath = path[1:]
+    else:
+        chpath = path
+    chs = [ch for ch in chs
+           if ch.keyword in statements.data_definition_keywords]
+    if len(chs) > 0:
+        yield ('data', None, module, chs, chpath, 'data')
+
+    mods = [module]
+    for i in module.search('include'):
+        subm = ctx.get_module(i.arg)
+        if subm is not None:
+            mods.append(subm)
+    for m in mods:
+        for augment in m.search('augment'):
+            if (hasattr(augment, 'i_target_node') and
+                hasattr(augment.i_target_node, 'i_module') and
+                augment.i_target_node.i_module not in modules + mods):
+                # this augment has not been printed; print it
+                mode = 'augment'
+                if augment.i_target_node.keyword == 'input':
+                    mode = 'input'
+                elif augment.i_target_node.keyword == 'output':
+                    mode = 'output'
+                elif augment.i_target_node.keyword == 'notification':
+                    mode = 'notification'
+                yield ('augment', augment.arg, m, augment.i_children, path,
+                       mode)
+
+    for keyword in ('rpc', 'notification'):
+        chs = module.i_children
+        chpath = path
         if path is not None:
             if len(path) > 0:
-                notifs = [n for n in notifs if n.arg == path[0]]
-                npath = path[1:]
+                chs = children_with_arg(chs, path[0])
+                chpath = path[1:]
             else:
-                notifs = []
-        if len(notifs) > 0:
-            print_header(module)
-            fd.write("\n  notifications:\n")
-            print_children(notifs, module, fd, '  ', npath,
-                           'notification', depth, llen,
-                           ctx.opts.tree_no_expand_uses,
-                           prefix_with_modname=ctx.opts.modname_prefix)
+                chs = []
+        chs = [ch for ch in chs if ch.keyword == keyword]
+        if len(chs) > 0:
+            yield (keyword, None, module, chs, chpath, keyword)
+
+    if ctx.opts.tree_print_groupings:
+        for m in mods:
+            for g in m.search('grouping'):
+                yield ('grouping', g.arg, m, g.i_children, path, 'grouping')
+
+    if ctx.opts.tree_print_yang_data:
+        for yd in module.search(('ietf-restconf', 'yang-data')):
+            yield ('yang-data', yd.arg, module, yd.i_children, path,
+                   'yang-data')
+
+    if ctx.opts.tree_print_structures:
+        for keyword in ('structure', 'augment-structure'):
+            for sx in module.search(('ietf-yang-structure-ext', keyword)):
+                yield (keyword, sx.arg, module, sx.i_children, path,
+                       'structure')
 
-        if ctx.opts.tree_print_groupings:
-            section_delimiter_printed = False
-            for m in mods:
-                for g in m.search('grouping'):
-                    print_header(module)
-                    if not section_delimiter_printed:
-                        fd.write('\n')
-                        section_delimiter_printed = True
-                    fd.write("  grouping %s:\n" % g.arg)
-                    print_children(g.i_children, m, fd,
-                                   '  ', path, 'grouping', depth, llen,
-                                   ctx.opts.tree_no_expand_uses,
-                                   prefix_with_modname=ctx.opts.modname_prefix)
-
-        if ctx.opts.tree_print_yang_data:
-            yds = module.search(('ietf-restconf', 'yang-data'))
-            if len(yds) > 0:
-                print_header(module)
-                section_delimiter_printed = False
-                for yd in yds:
-                    if not section_delimiter_printed:
-                        fd.write('\n')
-                        section_delimiter_printed = True
-                    fd.write("  yang-data %s:\n" % yd.arg)
-                    print_children(yd.i_children, module, fd, '  ', path,
-                                   'yang-data', depth, llen,
-                                   ctx.opts.tree_no_expand_uses,
-                                   prefix_with_modname=ctx.opts.modname_prefix)
-
-        if ctx.opts.tree_print_structures:
-            sxs = module.search(('ietf-yang-structure-ext', 'structure'))
-            if len(sxs) > 0:
-                if not printed_header:
-                    print_header(module)
-                section_delimiter_printed = False
-                for sx in sxs:
-                    if not section_delimiter_printed:
-                        fd.write('\n')
-                        section_delimiter_printed = True
-                    fd.write("  structure %s:\n" % sx.arg)
-                    print_children(sx.i_children, module, fd, '  ', path,
-                                   'structure', depth, llen,
-                                   ctx.opts.tree_no_expand_uses,
-                                   prefix_with_modname=ctx.opts.modname_prefix)
-
-            sxs = module.search(('ietf-yang-structure-ext',
-                                 'augment-structure'))
-            if len(sxs) > 0:
-                if not printed_header:
-                    print_header(module)
-                section_delimiter_printed = False
-                for sx in sxs:
-                    if not section_delimiter_printed:
-                        fd.write('\n')
-                        section_delimiter_printed = True
-                    fd.write("  augment-structure %s:\n" % sx.arg)
-                    print_children(sx.i_children, module, fd, '  ', path,
-                                   'structure', depth, llen,
-                                   ctx.opts.tree_no_expand_uses,
-                                   prefix_with_modname=ctx.opts.modname_prefix)
 
+def children_with_arg(i_children, arg):
+    """Return the children with the argument `arg`, in order.
+
+    Uses the index of the i_children list, so that a --tree-path is
+    resolved without scanning all siblings at each level.
+    """
+    if isinstance(i_children, util.ChildList):
+        return i_children.children_with_arg(arg)
+    return [ch for ch in i_children if ch.arg == arg]
 
 def unexpand_uses(i_children):
     res = []
-    uses = []
+    uses = set()
     for ch in i_children:
         if hasattr(ch, 'i_uses'):
             # take first from i_uses, which means "closest" grouping
             g = ch.i_uses[0].arg
             if g not in uses:
                 # first node from this uses
-                uses.append(g)
+                uses.add(g)
                 res.append(ch.i_uses[0])
         else:
             res.append(ch)
     return res
 
+def get_width(w, chs, module):
+    """Return the width of the widest node name in `chs`, or `w`"""
+    modulename = module.i_modulename
+    for ch in chs:
+        if ch.keyword in ('choice', 'case'):
+            nlen = 3 + get_width(0, ch.i_children, module)
+        elif ch.i_module.i_modulename == modulename:
+            nlen = len(ch.arg)
+        else:
+            nlen = len(ch.i_module.i_prefix) + 1 + len(ch.arg)
+        if nlen > w:
+            w = nlen
+    return w
+
 def print_path(pre, post, path, fd, llen):
     def print_comps(pre, p, is_first):
         line = pre + '/' + p[0]
@@ -340,36 +436,28 @@ def print_path(pre, post, path, fd, llen):
 def print_children(i_children, module, fd, prefix, path, mode, depth,
                    llen, no_expand_uses, width=0, prefix_with_modname=False):
     if depth == 0:
+        # the children are not visited below the depth
         if i_children:
             fd.write(prefix + '     ...\n')
         return
-    def get_width(w, chs):
-        for ch in chs:
-            if ch.keyword in ['choice', 'case']:
-                nlen = 3 + get_width(0, ch.i_children)
-            else:
-                if ch.i_module.i_modulename == module.i_modulename:
-                    nlen = len(ch.arg)
-                else:
-                    nlen = len(ch.i_module.i_prefix) + 1 + len(ch.arg)
-            if nlen > w:
-                w = nlen
-        return w
+    if not i_children:
+        return
 
     if no_expand_uses:
         i_children = unexpand_uses(i_children)
 
     if width == 0:
-        width = get_width(0, i_children)
+        width = get_width(0, i_children, module)
 
+    last = i_children[-1]
+    last_is_empty_output = (last.keyword == 'output' and
+                            len(last.i_children) == 0)
     for ch in i_children:
         if ((ch.keyword == 'input' or ch.keyword == 'output') and
             len(ch.i_children) == 0):
             pass
         else:
-            if (ch == i_children[-1] or
-                (i_children[-1].keyword == 'output' and
-                 len(i_children[-1].i_children) == 0)):
+            if ch is last or last_is_empty_output:
                 # the last test is to detect if we print input, and the
                 # next node is an empty output node; then don't add the |
                 newprefix = prefix + '   '
@@ -386,43 +474,23 @@ def print_children(i_children, module, fd, prefix, path, mode, depth,
 def print_node(s, module, fd, prefix, path, mode, depth, llen,
                no_expand_uses, width, prefix_with_modname=False):
 
-    line = "%s%s--" % (prefix[0:-1], get_status_str(s))
+    subs = get_substmts(s)
+    line = "%s%s--" % (prefix[0:-1], get_status_char(subs.get('status')))
 
     brcol = len(line) + 4
 
-    if s.i_module.i_modulename == module.i_modulename:
-        name = s.arg
-    else:
-        if prefix_with_modname:
-            name = s.i_module.i_modulename + ':' + s.arg
-        else:
-            name = s.i_module.i_prefix + ':' + s.arg
+    name = get_name(s, module, prefix_with_modname)
+    opts = get_opts_str(s, subs)
     flags = get_flags_str(s, mode)
-    if s.keyword == 'list':
-        name += '*'
-        line += flags + " " + name
-    elif s.keyword == 'container':
-        p = s.search_one('presence')
-        if p is not None:
-            name += '!'
-        line += flags + " " + name
+    if s.keyword == 'list' or s.keyword == 'container':
+        line += flags + " " + name + opts
     elif s.keyword  == 'choice':
-        m = s.search_one('mandatory')
-        if m is None or m.arg == 'false':
-            line += flags + ' (' + name + ')?'
-        else:
-            line += flags + ' (' + name + ')'
+        line += flags + ' (' + name + ')' + opts
     elif s.keyword == 'case':
         line += ':(' + name + ')'
         brcol += 1
     else:
-        if s.keyword == 'leaf-list':
-            name += '*'
-        elif (s.keyword == 'leaf' and not hasattr(s, 'i_is_key')
-              or s.keyword == 'anydata' or s.keyword == 'anyxml'):
-            m = s.search_one('mandatory')
-            if m is None or m.arg == 'false':
-                name += '?'
+        name += opts
         t = get_typename(s, prefix_with_modname)
         if t == '':
             line += "%s %s" % (flags, name)
@@ -447,8 +515,8 @@ def print_node(s, module, fd, prefix, path, mode, depth, llen,
             line += "%s %-*s   %s" % (flags, width+1, name, t)
 
     if s.keyword == 'list':
-        if s.search_one('key') is not None:
-            keystr = " [%s]" % re.sub(r'\s+', ' ', s.search_one('key').arg)
+        if subs.get('key') is not None:
+            keystr = " [%s]" % re.sub(r'\s+', ' ', subs['key'].arg)
             if (llen is not None and
                 len(line) + len(keystr) > llen):
                 fd.write(line + '\n')
@@ -457,13 +525,7 @@ def print_node(s, module, fd, prefix, path, mode, depth, llen,
         else:
             line += " []"
 
-    features = s.search('if-feature')
-    featurenames = [f.arg for f in features]
-    if hasattr(s, 'i_augment'):
-        afeatures = s.i_augment.search('if-feature')
-        featurenames.extend([f.arg for f in afeatures
-                             if f.arg not in featurenames])
-
+    featurenames = get_featurenames(s, subs)
     if len(featurenames) > 0:
         fstr = " {%s}?" % ",".join(featurenames)
         if (llen is not None and len(line) + len(fstr) > llen):
@@ -477,8 +539,7 @@ def print_node(s, module, fd, prefix, path, mode, depth, llen,
             depth = depth - 1
         chs = s.i_children
         if path is not None and len(path) > 0:
-            chs = [ch for ch in chs
-                   if ch.arg == path[0]]
+            chs = children_with_arg(chs, path[0])
             path = path[1:]
         if s.keyword in ['choice', 'case']:
             print_children(chs, module, fd, prefix, path, mode, depth,
@@ -489,8 +550,62 @@ def print_node(s, module, fd, prefix, path, mode, depth, llen,
                            no_expand_uses,
                            prefix_with_modname=prefix_with_modname)
 
+def get_name(s, module, prefix_with_modname=False):
+    """Return the name of `s` as printed in the tree of `module`"""
+    if s.i_module.i_modulename == module.i_modulename:
+        return s.arg
+    elif prefix_with_modname:
+        return s.i_module.i_modulename + ':' + s.arg
+    else:
+        return s.i_module.i_prefix + ':' + s.arg
+
+def get_opts_str(s, subs):
+    """Return the <opts> of `s`, except for the keys of a list"""
+    if s.keyword == 'list' or s.keyword == 'leaf-list':
+        return '*'
+    elif s.keyword == 'container':
+        if subs.get('presence') is not None:
+            return '!'
+    elif (s.keyword == 'choice' or
+          s.keyword == 'leaf' and not hasattr(s, 'i_is_key') or
+          s.keyword == 'anydata' or s.keyword == 'anyxml'):
+        m = subs.get('mandatory')
+        if m is None or m.arg == 'false':
+            return '?'
+    return ''
+
+def get_featurenames(s, subs):
+    """Return the names of the features `s` depends on"""
+    featurenames = subs.get('if-feature', [])
+    if hasattr(s, 'i_augment'):
+        afeatures = s.i_augment.search('if-feature')
+        featurenames.extend([f.arg for f in afeatures
+                             if f.arg not in featurenames])
+    return featurenames
+
+def get_substmts(s):
+    """Return a dict with the first 'status', 'presence', 'mandatory',
+    'key', 'when' and 'must' substatement of `s`, and the arguments of
+    its 'if-feature' substatements as a list.
+
+    The substatements are searched in one pass, since the substatements
+    of a container or list include all its children.
+    """
+    subs = {}
+    for ch in s.substmts:
+        keyword = ch.keyword
+        if keyword == 'if-feature':
+            subs.setdefault(keyword, []).append(ch.arg)
+        elif keyword in _node_keywords and keyword not in subs:
+            subs[keyword] = ch
+    return subs
+
+_node_keywords = ('status', 'presence', 'mandatory', 'key', 'when', 'must')
+
 def get_status_str(s):
-    status = s.search_one('status')
+    return get_status_char(s.search_one('status'))
+
+def get_status_char(status):
     if status is None or status.arg == 'current':
         return '+'
     elif status.arg == 'deprecated':
@@ -22,6 +22,7 @@ from pyang import plugin
 from pyang import error
 from pyang import syntax
 from pyang import statements
+from pyang import schemapath
 from pyang import util
 from pyang.error import err_add
 
@@ -169,6 +170,10 @@ class uml_emitter:
 
     def __init__(self, ctx):
         self._ctx = ctx
+        # the statements are moved when groupings and augments are
+        # inlined, so the paths are kept in an index of their own,
+        # which is cleared when a statement is moved
+        self.path_index = schemapath.PathIndex()
         self.ctx_fullpath = ctx.opts.uml_longids
         self.ctx_description = ctx.opts.uml_descr
         self.ctx_classesonly = ctx.opts.uml_classes_only
@@ -303,6 +308,7 @@ class uml_emitter:
                 self.emit_child_stmt(node.parent, node, fd, False)
                 for s in stmt.substmts:
                     s.parent = node
+                    self.path_index.clear()
                     self.emit_child_stmt(node, s, fd)
 
             else:
@@ -415,6 +421,7 @@ class uml_emitter:
                     for children in grouping_node.substmts:
                         # make the inlined parent to parent rather then the grouping to make full path unique
                         children.parent = parent
+                        self.path_index.clear()
                         self.emit_child_stmt(parent, children, fd)
 
         # moved stuff below here in order to include annotations for classes-only
@@ -919,10 +926,16 @@ class uml_emitter:
         path = stmt.arg
         if stmt.keyword not in ('grouping', 'choice', 'case'):
             if self.ctx_fullpath:
-                while stmt.parent is not None:
-                    stmt = stmt.parent
-                    if stmt.arg is not None:
-                        path = stmt.arg + pathsep + path
+                path = self.prepend_ancestors(stmt, pathsep, path)
+        return path
+
+    def prepend_ancestors(self, stmt, pathsep, path):
+        """Return `path` prefixed with the arguments of the ancestors
+        of `stmt`"""
+        if stmt.parent is not None:
+            parent_path = self.path_index.get_arg_path(stmt.parent, pathsep)
+            if parent_path is not None:
+                path = parent_path + pathsep + path
         return path
 
     def augment2identifier(self, stmt):
@@ -933,10 +946,7 @@ class uml_emitter:
             path = path[1:]
         # get module prefix
         mod = path[0:path.find(':')] + '_'
-        while stmt.parent is not None:
-            stmt = stmt.parent
-            if stmt.arg is not None:
-                path = stmt.arg + pathsep + path
+        path = self.prepend_ancestors(stmt, pathsep, path)
         path = mod + path.replace(mod, '')
         return self.make_plantuml_keyword(path)
 
@@ -953,10 +963,7 @@ class uml_emitter:
             elif stmt.keyword == 'grouping':
                 path = path + '-grouping'
 
-            while stmt.parent is not None:
-                stmt = stmt.parent
-                if stmt.arg is not None:
-                    path = stmt.arg + pathsep + path
+            path = self.prepend_ancestors(stmt, pathsep, path)
         return self.make_plantuml_keyword(path)
 
     def last_component(self, s):
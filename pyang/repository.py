@@ -3,11 +3,19 @@
 import os
 import sys
 import io
+import json
+import hashlib
 
 from pathlib import Path
 
 from . import util
 from . import syntax
+from . import cache
+
+INDEX_FILENAME = '.pyang-index'
+"""Name of a pre-built repository index file in a search directory"""
+
+INDEX_VERSION = 1
 
 class Repository(object):
     """Abstract base class that represents a module repository"""
@@ -38,15 +46,20 @@ class Repository(object):
 
 class FileRepository(Repository):
     def __init__(self, path="", use_env=True, no_path_recurse=False,
-                 verbose=False):
+                 verbose=False, use_index=False):
         """Create a Repository which searches the filesystem for modules
 
         `path` is a `os.pathsep`-separated string of directories
+
+        If `use_index` is True, the list of modules found in each
+        directory is kept in a persistent index, which is used as long
+        as no directory in the tree has been modified.
         """
 
         Repository.__init__(self)
         self.dirs = []
         self.no_path_recurse = no_path_recurse
+        self.use_index = use_index
         self.modules = None
         self.verbose = verbose
 
@@ -114,26 +127,36 @@ class FileRepository(Repository):
     def _setup(self, ctx):
         # check all dirs for yang and yin files
         self.modules = []
-        def add_files_from_dir(d):
-            base = Path(d)
-            try:
-                files = base.iterdir()
-            except OSError:
-                files = []
-            for file_path in files:
-                if file_path.is_file():
-                    m = syntax.re_filename.search(file_path.name)
-                    if m is not None:
-                        name, rev, in_format = m.groups()
-                        if not os.access(str(file_path), os.R_OK):
-                            continue
-                        handle = in_format, str(file_path)
-                        self.modules.append((name, rev, handle))
-                elif (not self.no_path_recurse
-                      and d != '.' and file_path.is_dir()):
-                    add_files_from_dir(file_path)
         for d in self.dirs:
-            add_files_from_dir(d)
+            if self.use_index and d != '.':
+                self.modules.extend(self._get_indexed_modules(d))
+            else:
+                self.modules.extend(
+                    scan_directory(d, self.no_path_recurse)[0])
+
+    def _get_indexed_modules(self, d):
+        """Return the modules in `d`, using a repository index if possible.
+
+        A pre-built index in the directory itself is used if it is
+        up-to-date; otherwise an index in the user's cache directory is
+        used, and rebuilt if needed.
+        """
+        for filename in (os.path.join(d, INDEX_FILENAME),
+                         _cached_index_filename(d)):
+            modules = _read_index(filename, d, self.no_path_recurse)
+            if modules is not None:
+                if self.verbose:
+                    sys.stderr.write('# using repository index %s\n'
+                                     % filename)
+                return modules
+        modules, dir_mtimes = scan_directory(d, self.no_path_recurse)
+        data = _mk_index(d, modules, dir_mtimes, self.no_path_recurse)
+        cache.write_file_atomic(_cached_index_filename(d), data)
+        return modules
+
+    def rescan(self):
+        """Scan the directories again when the modules are needed"""
+        self.modules = None
 
     def get_modules_and_revisions(self, ctx):
         if self.modules is None:
@@ -160,3 +183,99 @@ class FileRepository(Repository):
         if in_format is None:
             in_format = util.guess_format(text)
         return absfilename, in_format, text
+
+
+def scan_directory(d, no_path_recurse=False):
+    """Find all readable YANG and YIN files in the directory `d`.
+
+    Returns (`modules`, `dir_mtimes`), where `modules` is a list of
+    (`modulename`, `revision`, `handle`) as returned by
+    `get_modules_and_revisions()`, and `dir_mtimes` maps each scanned
+    directory to its modification time.
+    """
+    modules = []
+    dir_mtimes = {}
+    def add_files_from_dir(d):
+        base = Path(d)
+        try:
+            dir_mtimes[str(base)] = base.stat().st_mtime_ns
+            files = base.iterdir()
+        except OSError:
+            files = []
+        for file_path in files:
+            if file_path.is_file():
+                m = syntax.re_filename.search(file_path.name)
+                if m is not None:
+                    name, rev, in_format = m.groups()
+                    if not os.access(str(file_path), os.R_OK):
+                        continue
+                    handle = in_format, str(file_path)
+                    modules.append((name, rev, handle))
+            elif (not no_path_recurse
+                  and d != '.' and file_path.is_dir()):
+                add_files_from_dir(file_path)
+    add_files_from_dir(d)
+    return modules, dir_mtimes
+
+def write_index(d, no_path_recurse=False):
+    """Build a repository index for `d`, and write it into `d`.
+
+    The index is used by a `FileRepository` with `use_index` set,
+    until some directory in the tree is modified.
+    Returns the number of indexed files.
+    """
+    filename = os.path.join(d, INDEX_FILENAME)
+    # create the file before scanning, so that the directory's
+    # modification time stays the same when the index is written
+    with io.open(filename, "w", encoding="utf-8"):
+        pass
+    modules, dir_mtimes = scan_directory(d, no_path_recurse)
+    data = _mk_index(d, modules, dir_mtimes, no_path_recurse)
+    with io.open(filename, "wb") as fd:
+        fd.write(data)
+    return len(modules)
+
+def _cached_index_filename(d):
+    h = hashlib.sha256(os.path.abspath(d).encode('utf-8')).hexdigest()
+    return os.path.join(cache.get_cache_dir(), 'repo-index', h + '.json')
+
+def _mk_index(d, modules, dir_mtimes, no_path_recurse):
+    # paths are stored relative to `d`, so that a pre-built index
+    # can be used also when the tree is mounted somewhere else
+    def relpath(path):
+        return os.path.relpath(path, d)
+    index = {}
+    for name, rev, (in_format, path) in modules:
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+        index.setdefault(name, []).append(
+            (rev, relpath(path), mtime, in_format))
+    data = {
+        'version': INDEX_VERSION,
+        'no_path_recurse': bool(no_path_recurse),
+        'dirs': {relpath(p): mtime for p, mtime in dir_mtimes.items()},
+        'modules': index,
+    }
+    return json.dumps(data).encode('utf-8')
+
+def _read_index(filename, d, no_path_recurse):
+    """Return the list of modules in an up-to-date index, or None"""
+    try:
+        with io.open(filename, "r", encoding="utf-8") as fd:
+            data = json.load(fd)
+        if (data['version'] != INDEX_VERSION or
+            data['no_path_recurse'] != bool(no_path_recurse)):
+            return None
+        for p, mtime in data['dirs'].items():
+            if os.stat(os.path.join(d, p)).st_mtime_ns != mtime:
+                return None
+        modules = []
+        for name, entries in data['modules'].items():
+            for rev, path, _mtime, in_format in entries:
+                handle = in_format, os.path.join(d, path)
+                modules.append((name, rev, handle))
+        return modules
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
@@ -0,0 +1,142 @@
+"""Index of the paths of the schema nodes
+
+The paths of the schema nodes are used by many output formats, often
+with variants such as module names instead of prefixes, or the keys
+of the lists.  The index keeps the path of each node once it has been
+computed, and computes the path of a node from the path of its
+parent, so that the paths of all nodes in a tree are computed in time
+linear in the size of the tree, instead of walking up the parents
+from each node.
+"""
+
+transparent_keywords = ('case', 'input', 'output')
+"""The keywords of the statements which are not in a data path"""
+
+
+class PathIndex(object):
+    """The paths of the schema nodes in a context.
+
+    The paths are computed when they are first needed, and kept until
+    clear() is called.  The context clears the index when the modules
+    are validated, since validation moves statements, e.g., from an
+    augment to its target node.
+    """
+
+    def __init__(self, ctx=None):
+        self.ctx = ctx
+        self._paths = {}
+        """dict of kind:{stmt:path}"""
+        self._nodes = None
+        """dict of path:stmt, built by get_node()"""
+
+    def clear(self):
+        """Forget all paths"""
+        self._paths = {}
+        self._nodes = None
+
+    def get_path(self, stmt, kind, step):
+        """Return the path of the kind `kind` of `stmt`.
+
+        The path is computed as step(stmt, parent_path), where
+        `parent_path` is the path of the same kind of the parent of
+        `stmt`, or None if `stmt` has no parent.  `kind` is a hashable
+        value which identifies the kind of path, and thus `step`.
+        """
+        paths = self._paths.get(kind)
+        if paths is None:
+            paths = self._paths[kind] = {}
+        try:
+            return paths[stmt]
+        except KeyError:
+            pass
+        if stmt.parent is None:
+            path = step(stmt, None)
+        else:
+            path = step(stmt, self.get_path(stmt.parent, kind, step))
+        paths[stmt] = path
+        return path
+
+    def get_data_path(self, stmt, kind, element):
+        """Return the data path of the kind `kind` of `stmt`.
+
+        The data path has one element per ancestor of `stmt`, and for
+        `stmt` itself, except for the module and for the statements in
+        `transparent_keywords`.  The elements are separated by "/", and
+        each element is formatted as element(s, last), where `last` is
+        the statement of the previous element, or None for the first
+        element.
+        """
+        def step(s, parent):
+            if parent is None:
+                return ('', None)
+            elif s.keyword in transparent_keywords:
+                return parent
+            (path, last) = parent
+            return (path + '/' + element(s, last), s)
+        return self.get_path(stmt, ('data', kind), step)[0] or '/'
+
+    def get_xpath(self, stmt, with_prefixes=False, prefix_onchange=False,
+                  prefix_to_module=False, resolve_top_prefix_to_module=False,
+                  with_keys=False):
+        """Return the data path of `stmt`; see statements.mk_path_str()"""
+        def element(s, last):
+            name = s.arg
+            prefix = s.i_module.i_prefix
+            if (with_prefixes or
+                (prefix_onchange and
+                 (last is None or prefix != last.i_module.i_prefix))):
+                if (prefix_to_module or
+                    (last is None and resolve_top_prefix_to_module)):
+                    prefix = s.i_module.arg
+                name = '%s:%s' % (prefix, name)
+            if with_keys:
+                for key in get_keys(s):
+                    name = '%s[%s]' % (name, key)
+            return name
+        kind = ('xpath', with_prefixes, prefix_onchange, prefix_to_module,
+                resolve_top_prefix_to_module, with_keys)
+        return self.get_data_path(stmt, kind, element)
+
+    def get_arg_path(self, stmt, sep):
+        """Return the arguments of `stmt` and its ancestors, from the
+        top, separated by `sep`.  The statements without argument are
+        skipped.  Returns None if no statement has an argument."""
+        def step(s, parent):
+            if s.arg is None:
+                return parent
+            elif parent is None:
+                return s.arg
+            return parent + sep + s.arg
+        return self.get_path(stmt, ('arg', sep), step)
+
+    def get_node(self, path):
+        """Return the schema node with the data path `path`, or None.
+
+        `path` is the data path as returned by
+        statements.get_xpath(stmt, prefix_to_module=True), e.g.,
+        "/ietf-interfaces:interfaces/interface/name".  The nodes are
+        searched in the data trees, rpcs and notifications of the
+        modules in the context.
+        """
+        if self._nodes is None:
+            nodes = {}
+            def add(stmts):
+                for s in stmts:
+                    if s.keyword not in transparent_keywords:
+                        p = self.get_xpath(s, prefix_onchange=True,
+                                           prefix_to_module=True)
+                        nodes.setdefault(p, s)
+                    add(getattr(s, 'i_children', ()))
+            for m in self.ctx.modules.values():
+                if m is not None and m.keyword == 'module':
+                    add(getattr(m, 'i_children', ()))
+            self._nodes = nodes
+        return self._nodes.get(path)
+
+
+def get_keys(stmt):
+    """Return the names of the keys of `stmt`"""
+    key = stmt.search_one('key')
+    if key is None or not key.arg:
+        return []
+    return key.arg.split()
@@ -5,6 +5,8 @@ import os
 import optparse
 import io
 import codecs
+import json
+import time
 from pathlib import Path
 
 import pyang
@@ -12,10 +14,16 @@ from pyang import plugin
 from pyang import error
 from pyang import util
 from pyang import hello
+from pyang import instance
+from pyang import output
+from pyang import cache
 from pyang import context
 from pyang import repository
+from pyang import server
 from pyang import statements
 from pyang import syntax
+from pyang import watch
+from pyang import xpath_parser
 
 
 def run():
@@ -36,7 +44,7 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
             else:
                 continue
             plugindirs.append(path)
-    plugin.init(plugindirs)
+    plugin.init(plugindirs, sys.argv[1:])
 
     fmts = {}
     xforms = {}
@@ -105,6 +113,12 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
                              dest="ignore_errors",
                              action="store_true",
                              help="Ignore all errors.  Use with care."),
+        optparse.make_option("--stream-errors",
+                             dest="stream_errors",
+                             action="store_true",
+                             help="Print each error and warning as soon " \
+                             "as it is found, instead of all of them " \
+                             "sorted after validation."),
         optparse.make_option("--canonical",
                              dest="canonical",
                              action="store_true",
@@ -133,7 +147,20 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
         optparse.make_option("-o", "--output",
                              dest="outfile",
                              help="Write the output to OUTFILE instead " \
-                             "of stdout."),
+                             "of stdout.  If OUTFILE ends with .gz, the " \
+                             "output is compressed with gzip."),
+        optparse.make_option("--output-dir",
+                             metavar="DIR",
+                             dest="output_dir",
+                             help="Write the output for each module to " \
+                             "its own file in DIR."),
+        optparse.make_option("--output-template",
+                             metavar="TEMPLATE",
+                             dest="output_template",
+                             default=output.DEFAULT_TEMPLATE,
+                             help="The names of the files written with " \
+                             "--output-dir.  Default is '%s'." %
+                             output.DEFAULT_TEMPLATE.replace('%', '%%')),
         optparse.make_option("-F", "--features",
                              metavar="FEATURES",
                              dest="features",
@@ -159,6 +186,13 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
                              default=[],
                              action="append",
                              help="Deviation module"),
+        optparse.make_option("--validate-instance",
+                             metavar="FILE",
+                             dest="validate_instance",
+                             default=[],
+                             action="append",
+                             help="Validate the XML or JSON instance " \
+                             "document FILE against the module(s)."),
         optparse.make_option("-p", "--path",
                              dest="path",
                              default=[],
@@ -206,6 +240,59 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
                              action="store_true",
                              help="Do not recurse into directories in the \
                                    yang path."),
+        optparse.make_option("--parse-cache",
+                             dest="parse_cache",
+                             action="store_true",
+                             help="Keep the parsed modules in an on-disk "
+                             "cache, and use them when the same module "
+                             "text is read again."),
+        optparse.make_option("--repo-index",
+                             dest="repo_index",
+                             action="store_true",
+                             help="Use persistent indexes of the modules "
+                             "found in the search path directories."),
+        optparse.make_option("--build-repo-index",
+                             metavar="DIR",
+                             dest="build_repo_index",
+                             default=[],
+                             action="append",
+                             help="Write a module index for DIR, to be used "
+                             "with --repo-index, and exit."),
+        optparse.make_option("-j", "--jobs",
+                             dest="jobs",
+                             type="int",
+                             default=1,
+                             help="Parse the modules and their imports, "
+                             "and emit the modules with --output-dir, "
+                             "using JOBS processes."),
+        optparse.make_option("--watch",
+                             dest="watch",
+                             action="store_true",
+                             help="Watch the modules and the modules they "
+                             "use, and validate and convert them again "
+                             "when they change."),
+        optparse.make_option("--profile-validation",
+                             dest="profile_validation",
+                             action="store_true",
+                             help="Print the time spent in each validation "
+                             "phase, validation function and module to "
+                             "stderr, sorted by time."),
+        optparse.make_option("--profile-validation-json",
+                             dest="profile_validation_json",
+                             metavar="FILE",
+                             help="Write the validation profile as JSON "
+                             "to FILE."),
+        optparse.make_option("--serve",
+                             dest="serve",
+                             action="store_true",
+                             help="Run as a validation server, reading "
+                             "JSON requests from stdin and writing JSON "
+                             "responses to stdout, one per line."),
+        optparse.make_option("--serve-socket",
+                             dest="serve_socket",
+                             metavar="PATH",
+                             help="Like --serve, but serve requests on "
+                             "the UNIX socket PATH."),
         ]
 
     optparser = optparse.OptionParser(usage, add_help_option = False)
@@ -217,12 +304,33 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
 
     (o, args) = optparser.parse_args()
 
-    if o.outfile is not None and o.format is None:
+    if ((o.outfile is not None or o.output_dir is not None) and
+        o.format is None):
         sys.stderr.write("no format specified\n")
         sys.exit(1)
 
+    if o.outfile is not None and o.output_dir is not None:
+        sys.stderr.write("-o and --output-dir cannot be used together\n")
+        sys.exit(1)
+
     filenames = args
 
+    if o.watch and (o.hello or o.transforms or not filenames):
+        sys.stderr.write("--watch needs files, and cannot be used with "
+                         "--hello or transforms\n")
+        sys.exit(1)
+
+    if o.build_repo_index:
+        for d in o.build_repo_index:
+            try:
+                n = repository.write_index(d, o.no_path_recurse)
+            except IOError as ex:
+                sys.stderr.write("error %s: %s\n" % (d, ex))
+                sys.exit(1)
+            if o.verbose:
+                sys.stderr.write("# indexed %d modules in %s\n" % (n, d))
+        sys.exit(0)
+
     # Parse hello if present
     if o.hello:
         if len(filenames) > 1:
@@ -247,7 +355,8 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
         path += os.pathsep + "."
 
     repos = repository.FileRepository(path, no_path_recurse=o.no_path_recurse,
-                                      verbose=o.verbose)
+                                      verbose=o.verbose,
+                                      use_index=o.repo_index)
 
     ctx = context.Context(repos)
 
@@ -261,6 +370,8 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
     ctx.lax_quote_checks = o.lax_quote_checks
     ctx.strict = o.strict
     ctx.max_status = o.max_status
+    if o.parse_cache:
+        ctx.parse_cache = cache.ParseCache()
 
     # make a map of features to support, per module
     if o.hello:
@@ -326,9 +437,58 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
     if emit_obj is not None:
         xform_and_emit_objs.append(emit_obj)
 
+    if o.profile_validation or o.profile_validation_json is not None:
+        profile = statements.ValidationProfile()
+        statements.set_validation_profile(profile)
+    else:
+        profile = None
+
     for p in plugin.plugins:
         p.pre_load_modules(ctx)
 
+    if o.serve or o.serve_socket is not None:
+        if o.hello or xform_objs or filenames:
+            sys.stderr.write("--serve cannot be used with --hello, "
+                             "transforms or files\n")
+            sys.exit(1)
+        deviations = []
+        for filename in ctx.opts.deviations:
+            try:
+                with io.open(filename, "r", encoding="utf-8") as fd:
+                    deviations.append((filename, fd.read()))
+            except IOError as ex:
+                sys.stderr.write("error %s: %s\n" % (filename, ex))
+                sys.exit(1)
+        srv = server.Server(ctx, emit_obj, deviations)
+        if o.serve_socket is not None:
+            srv.serve_socket(o.serve_socket)
+        else:
+            srv.serve(sys.stdin, sys.stdout)
+        sys.exit(0)
+
+    if o.jobs > 1 and not o.hello:
+        texts = []
+        for filename in filenames + ctx.opts.deviations:
+            try:
+                with io.open(filename, "r", encoding="utf-8") as fd:
+                    texts.append((filename, fd.read()))
+            except (IOError, UnicodeDecodeError):
+                # reported when the file is read below
+                pass
+        ctx.preparse(texts, o.jobs)
+
+    def add_primary_module(filename, text):
+        m = syntax.re_filename.search(Path(filename).name)
+        ctx.yin_module_map = {}
+        if m is not None:
+            name, rev, in_format = m.groups()
+            name = os.path.basename(name)
+            return ctx.add_module(filename, text, in_format, name, rev,
+                                  expect_failure_error=False,
+                                  primary_module=True)
+        else:
+            return ctx.add_module(filename, text, primary_module=True)
+
     exit_code = 0
     modules = []
 
@@ -358,7 +518,8 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
                 modules.append(module)
         if (len(filenames) > 1 and
             emit_obj is not None and
-            not emit_obj.multiple_modules):
+            not emit_obj.multiple_modules and
+            o.output_dir is None):
             sys.stderr.write("too many files to convert\n")
             sys.exit(1)
 
@@ -375,27 +536,101 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
                 s = str(ex).replace('utf-8', 'utf8')
                 sys.stderr.write("%s: unicode error: %s\n" % (filename, s))
                 sys.exit(1)
-            m = syntax.re_filename.search(Path(filename).name)
-            ctx.yin_module_map = {}
-            if m is not None:
-                name, rev, in_format = m.groups()
-                name = os.path.basename(name)
-                module = ctx.add_module(filename, text, in_format, name, rev,
-                                        expect_failure_error=False,
-                                        primary_module=True)
-            else:
-                module = ctx.add_module(filename, text, primary_module=True)
+            module = add_primary_module(filename, text)
             if module is None:
                 exit_code = 1
             else:
                 modules.append(module)
 
+    def print_errors():
+        """Print the errors in ctx.errors, and return the exit code"""
+        def keyfun(e):
+            if e[0].ref == filenames[0]:
+                return 0
+            else:
+                return 1
+
+        ctx.errors.sort(key=lambda e: (e[0].ref, e[0].line))
+        if len(filenames) > 0:
+            # first print error for the first filename given
+            ctx.errors.sort(key=keyfun)
+
+        if o.ignore_errors:
+            ctx.errors = error.ErrorList()
+
+        exit_code = 0
+        for epos, etag, eargs in ctx.errors:
+            if print_error(epos, etag, eargs):
+                exit_code = 1
+        return exit_code
+
+    def print_error(epos, etag, eargs):
+        """Print an error, unless it is ignored.  Return True if it is
+        printed as an error."""
+        if etag in o.ignore_error_tags:
+            return False
+        if (ctx.implicit_errors is False and
+            epos.top is not None and
+            epos.top.arg not in modulenames and
+            (not hasattr(epos.top, 'i_modulename') or
+             epos.top.i_modulename not in modulenames) and
+            epos.ref not in filenames):
+            # this module was added implicitly (by import); skip this
+            # error the code includes submodules
+            return False
+        is_error = False
+        elevel = error.err_level(etag)
+        if error.is_warning(elevel) and etag not in o.errors:
+            kind = "warning"
+            if 'error' in o.warnings and etag not in o.warnings:
+                kind = "error"
+                is_error = True
+            elif 'none' in o.warnings:
+                return False
+        else:
+            kind = "error"
+            is_error = True
+        emsg = (etag if o.print_error_code
+                else error.err_to_str(etag, eargs))
+
+        if o.msg_template is not None:
+            try:
+                sys.stderr.write(str(o.msg_template).format(
+                    file=epos.ref, line=epos.line,
+                    code=etag, type=kind,
+                    msg=error.err_to_str(etag, eargs),
+                    level=elevel) + '\n')
+            except KeyError as error_msg:
+                sys.stderr.write(
+                    "unsupported key %s in msg-template\n" % error_msg)
+                sys.exit(1)
+        else:
+            sys.stderr.write('%s: %s: %s\n' %
+                             (epos.label(o.print_error_basename),
+                              kind, emsg))
+        return is_error
+
     modulenames = []
     for m in modules:
         modulenames.append(m.arg)
         for s in m.search('include'):
             modulenames.append(s.arg)
 
+    streamed_errors = None
+    stream_exit_code = 0
+    def stream_error(err):
+        nonlocal stream_exit_code
+        if print_error(*err):
+            stream_exit_code = 1
+
+    if o.stream_errors and not o.ignore_errors:
+        # the primary modules are known, so from now on the errors
+        # can be printed when they are found
+        if print_errors() != 0:
+            exit_code = 1
+        streamed_errors = ctx.errors
+        streamed_errors.sink = stream_error
+
     # apply deviations
     for filename in ctx.opts.deviations:
         try:
@@ -460,11 +695,10 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
         for xform_obj in xform_objs:
             try:
                 if not xform_obj.transform(ctx, modules):
-                    ctx.internal_reset()
-                    for module in modules:
-                        module.internal_reset()
-                        ctx.add_parsed_module(module)
-                        ctx_validate_and_prune()
+                    # only the transformed modules and the modules
+                    # affected by them need to be validated again
+                    ctx.reset_modules(modules)
+                    ctx_validate_and_prune()
             except error.TransformError as e:
                 if e.msg != "":
                     sys.stderr.write(e.msg + '\n')
@@ -477,84 +711,157 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
     for p in plugin.plugins:
         p.post_validate_ctx(ctx, modules)
 
-    def keyfun(e):
-        if e[0].ref == filenames[0]:
-            return 0
-        else:
-            return 1
-
-    ctx.errors.sort(key=lambda e: (e[0].ref, e[0].line))
-    if len(filenames) > 0:
-        # first print error for the first filename given
-        ctx.errors.sort(key=keyfun)
-
-    if o.ignore_errors:
-        ctx.errors = []
-
-    for epos, etag, eargs in ctx.errors:
-        if etag in o.ignore_error_tags:
-            continue
-        if (ctx.implicit_errors is False and
-            epos.top is not None and
-            epos.top.arg not in modulenames and
-            (not hasattr(epos.top, 'i_modulename') or
-             epos.top.i_modulename not in modulenames) and
-            epos.ref not in filenames):
-            # this module was added implicitly (by import); skip this error
-            # the code includes submodules
-            continue
-        elevel = error.err_level(etag)
-        if error.is_warning(elevel) and etag not in o.errors:
-            kind = "warning"
-            if 'error' in o.warnings and etag not in o.warnings:
-                kind = "error"
-                exit_code = 1
-            elif 'none' in o.warnings:
-                continue
-        else:
-            kind = "error"
-            exit_code = 1
-        emsg = etag if o.print_error_code else error.err_to_str(etag, eargs)
+    for filename in o.validate_instance:
+        try:
+            instance.validate_file(ctx, modules, filename)
+        except IOError as ex:
+            sys.stderr.write("error %s: %s\n" % (filename, ex))
+            sys.exit(1)
 
-        if o.msg_template is not None:
-            try:
-                sys.stderr.write(str(o.msg_template).format(
-                    file=epos.ref, line=epos.line,
-                    code=etag, type=kind,
-                    msg=error.err_to_str(etag, eargs),
-                    level=elevel) + '\n')
-            except KeyError as error_msg:
-                sys.stderr.write(
-                    "unsupported key %s in msg-template\n" % error_msg)
-                sys.exit(1)
-        else:
-            sys.stderr.write('%s: %s: %s\n' %
-                             (epos.label(o.print_error_basename), kind, emsg))
+    if o.verbose and ctx.parse_cache is not None:
+        if not ctx.parse_cache.usable:
+            sys.stderr.write("# parse cache: not used, %s is not private "
+                             "to the user\n" % ctx.parse_cache.cachedir)
+        sys.stderr.write("# parse cache: %d hits, %d misses\n" %
+                         (ctx.parse_cache.hits, ctx.parse_cache.misses))
+    if o.verbose:
+        sys.stderr.write("# xpath cache: %d hits, %d misses\n" %
+                         (xpath_parser.cache.hits, xpath_parser.cache.misses))
+    if o.profile_validation:
+        profile.write(sys.stderr)
+    if o.profile_validation_json is not None:
+        try:
+            with io.open(o.profile_validation_json, "w",
+                         encoding="utf-8") as fd:
+                json.dump(profile.get_report(), fd, indent=2)
+                fd.write("\n")
+        except IOError as ex:
+            sys.stderr.write("error %s: %s\n" %
+                             (o.profile_validation_json, ex))
+            sys.exit(1)
 
-    if emit_obj is not None and len(modules) > 0:
-        tmpfile = None
-        if o.outfile is None:
-            fd = sys.stdout
+    def report_emit(what, nbytes, t):
+        if nbytes is not None:
+            sys.stderr.write("# emit %s: %d bytes in %.3f s\n" %
+                             (what, nbytes, t))
         else:
-            tmpfile = o.outfile + ".tmp"
-            fd = io.open(tmpfile, "w+", encoding="utf-8")
+            sys.stderr.write("# emit %s: %.3f s\n" % (what, t))
+
+    def emit():
+        """Emit the modules, and return the exit code of a failure,
+        or None"""
+        if o.output_dir is not None:
+            return emit_to_dir()
+        out = output.Output(o.outfile)
         try:
-            emit_obj.emit(ctx, modules, fd)
+            emit_obj.emit(ctx, modules, out.fd)
         except error.EmitError as e:
             if e.msg != "":
                 sys.stderr.write(e.msg + '\n')
-            if tmpfile is not None:
-                fd.close()
-                os.remove(tmpfile)
-            sys.exit(e.exit_code)
+            out.abort()
+            return e.exit_code
         except:
-            if tmpfile is not None:
-                fd.close()
-                os.remove(tmpfile)
+            out.abort()
             raise
-        if tmpfile is not None:
-            fd.close()
-            os.rename(tmpfile, o.outfile)
+        out.close()
+        if o.verbose:
+            report_emit(o.format, out.nbytes, out.time)
+        return None
+
+    def emit_to_dir():
+        """Emit each module to its own file in o.output_dir, and return
+        the exit code of a failure, or None"""
+        outfiles = {}
+        for m in modules:
+            try:
+                name = output.output_filename(o.output_template, m, o.format)
+            except (KeyError, ValueError, IndexError) as ex:
+                sys.stderr.write("bad output template '%s': %s\n" %
+                                 (o.output_template, ex))
+                return 1
+            outfile = os.path.join(o.output_dir, name)
+            if outfile in outfiles:
+                sys.stderr.write("modules %s and %s are both written "
+                                 "to %s\n" % (outfiles[outfile].arg, m.arg,
+                                              outfile))
+                return 1
+            outfiles[outfile] = m
+        try:
+            os.makedirs(o.output_dir, exist_ok=True)
+        except OSError as ex:
+            sys.stderr.write("error %s: %s\n" % (o.output_dir, ex))
+            return 1
+        outfiles = list(outfiles)
+        res = output.emit_modules(ctx, emit_obj, modules, outfiles, o.jobs)
+        exit_code = None
+        for outfile, (code, msg, nbytes, t) in zip(outfiles, res):
+            if code is not None:
+                if msg != "":
+                    sys.stderr.write("%s: %s\n" % (outfile, msg))
+                exit_code = code
+            elif o.verbose:
+                report_emit(outfile, nbytes, t)
+        return exit_code
+
+    if streamed_errors is not None:
+        streamed_errors.sink = None
+        if stream_exit_code != 0:
+            exit_code = 1
+        if ctx.errors is not streamed_errors and print_errors() != 0:
+            # a plugin has replaced the list
+            exit_code = 1
+    elif print_errors() != 0:
+        exit_code = 1
+
+    if emit_obj is not None and len(modules) > 0:
+        emit_exit_code = emit()
+        if emit_exit_code is not None and not o.watch:
+            sys.exit(emit_exit_code)
+
+    def revalidate(new_modules, start):
+        """Validate and emit the modules again after a change"""
+        nonlocal modules, modulenames
+        modules = new_modules
+        validated = set(m for m in ctx.modules.values()
+                        if m is not None and m.i_is_validated is True)
+        modulenames = []
+        for m in modules:
+            modulenames.append(m.arg)
+            for s in m.search('include'):
+                modulenames.append(s.arg)
+        # the errors in the instance documents refer to no module, and
+        # are found again below
+        instance_files = set(os.path.abspath(f) for f in o.validate_instance)
+        ctx.errors[:] = [e for e in ctx.errors
+                         if os.path.abspath(e[0].ref) not in instance_files]
+        for p in plugin.plugins:
+            p.pre_validate_ctx(ctx, modules)
+        if len(xform_and_emit_objs) > 0 and len(modules) > 0:
+            for obj in xform_and_emit_objs:
+                obj.pre_validate(ctx, modules)
+        ctx_validate_and_prune()
+        if len(xform_and_emit_objs) > 0 and len(modules) > 0:
+            for obj in xform_and_emit_objs:
+                obj.post_validate(ctx, modules)
+        for p in plugin.plugins:
+            p.post_validate_ctx(ctx, modules)
+        for filename in o.validate_instance:
+            try:
+                instance.validate_file(ctx, modules, filename)
+            except IOError as ex:
+                sys.stderr.write("error %s: %s\n" % (filename, ex))
+        print_errors()
+        if emit_obj is not None and len(modules) > 0:
+            emit()
+        if o.verbose:
+            n = len([m for m in ctx.modules.values() if m not in validated])
+            sys.stderr.write("# revalidated %d modules in %.3f s\n" %
+                             (n, time.time() - start))
+
+    if o.watch:
+        updater = watch.ModuleUpdater(ctx, filenames, ctx.opts.deviations,
+                                      add_primary_module, o.no_path_recurse)
+        updater.run(watch.get_watcher(), revalidate)
 
     sys.exit(exit_code)
 
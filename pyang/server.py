@@ -0,0 +1,404 @@
+"""Batch validation server which keeps a warm context between requests
+
+The server reads requests and writes responses as JSON objects, one
+per line.  A request to validate modules read from files is:
+
+  {"id": ID, "files": [FILENAME, ...]}
+
+and a request to validate module texts is:
+
+  {"id": ID, "modules": [{"ref": REF, "text": TEXT}, ...]}
+
+If the server was started with an output format, the modules are also
+converted, unless the request has "emit": false.  The response is:
+
+  {"id": ID, "ok": BOOL, "errors": [ERROR, ...], "output": STRING,
+   "stats": STATS}
+
+where each ERROR is an object with "file", "line", "code", "type" and
+"message", and STATS has the time spent on the request, the parse
+cache hits and misses, the number of modules in the context and the
+number of modules which had to be reset, the XPath cache hits and
+misses, and the memory usage of the server process.
+`{"op": "stats"}` returns only the stats, and `{"op": "shutdown"}`
+stops the server.  A request which cannot be handled, e.g., because a
+file cannot be read, gets the response `{"id": ID, "error": MESSAGE}`.
+
+The modules given in a request are removed from the context when the
+request is done, together with the modules they affect (see
+`Context.del_modules()`).  All other modules, typically the imported
+ones, stay validated in the context, and their errors are kept so
+that they are reported also when they are used by a later request.
+"""
+
+import io
+import json
+import os
+import socketserver
+import stat
+import sys
+import time
+from pathlib import Path
+
+from . import error
+from . import plugin
+from . import syntax
+from . import xpath_parser
+
+
+class RequestError(Exception):
+    """raised when a request cannot be handled"""
+
+
+class Server(object):
+    """Validates modules in a warm context, see the module documentation"""
+
+    def __init__(self, ctx, emit_obj=None, deviations=()):
+        """`ctx` is a set up `Context`, with options in `ctx.opts`.
+        `emit_obj` is the `PyangPlugin` used to convert the modules.
+        `deviations` is a list of (ref, text) of deviation modules
+        which are used for all requests.
+        """
+        self.ctx = ctx
+        self.emit_obj = emit_obj
+        self.deviations = list(deviations)
+        self.module_errors = {}
+        """dict of module:[error]
+        contains the errors found when a module in the context was
+        validated"""
+        self.requests = 0
+        self.done = False
+
+    def serve(self, infd, outfd):
+        """Handle the requests read from `infd` until EOF or shutdown"""
+        for line in infd:
+            if not line.strip():
+                continue
+            outfd.write(self.handle_line(line) + '\n')
+            outfd.flush()
+            if self.done:
+                break
+
+    def serve_socket(self, path):
+        """Handle requests on the UNIX socket `path` until shutdown
+
+        One connection is served at a time.
+        """
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                # left behind by a previous server
+                os.remove(path)
+        except OSError:
+            pass
+        srv = socketserver.UnixStreamServer(path, _RequestHandler)
+        srv.pyang_server = self
+        try:
+            while not self.done:
+                srv.handle_request()
+        finally:
+            srv.server_close()
+            os.remove(path)
+
+    def handle_line(self, line):
+        """Handle a request encoded as a JSON line, and return the response"""
+        try:
+            request = json.loads(line)
+        except ValueError as ex:
+            response = {'id': None, 'error': 'bad request: %s' % ex}
+        else:
+            response = self.handle(request)
+        return json.dumps(response)
+
+    def handle(self, request):
+        """Handle a decoded request, and return the response"""
+        if not isinstance(request, dict):
+            return {'id': None, 'error': 'bad request: not an object'}
+        op = request.get('op', 'validate')
+        try:
+            if op == 'validate':
+                response = self.validate(request)
+            elif op == 'stats':
+                response = {'stats': self.get_stats(None)}
+            elif op == 'shutdown':
+                self.done = True
+                response = {}
+            else:
+                raise RequestError('unknown op "%s"' % op)
+        except RequestError as ex:
+            response = {'error': str(ex)}
+        except Exception as ex:
+            response = {'error': 'internal error: %s' % _exc_str(ex)}
+        return dict(id=request.get('id'), **response)
+
+    def validate(self, request):
+        ctx = self.ctx
+        start = time.perf_counter()
+        self.requests += 1
+        texts = self._get_texts(request)
+        emit = request.get('emit', True)
+        if not isinstance(emit, bool):
+            raise RequestError('bad "emit", expected true or false')
+        emit_obj = self.emit_obj if emit else None
+        if (emit_obj is not None and not emit_obj.multiple_modules and
+            len(texts) > 1):
+            raise RequestError('too many modules to convert')
+        before = set(ctx.modules.values())
+        modules = []
+        try:
+            return self._validate(texts, emit_obj, modules, start)
+        except Exception as ex:
+            # do not leave the modules of the failed request, or the
+            # modules they have changed, in the context
+            modules.extend(m for m in ctx.modules.values()
+                           if m is not None and m not in before and
+                           m not in modules)
+            ctx.del_modules(modules)
+            self._forget_module_errors()
+            raise RequestError('internal error: %s' % _exc_str(ex))
+
+    def _validate(self, texts, emit_obj, modules, start):
+        """Validate the modules `texts`, and add them to `modules`"""
+        ctx = self.ctx
+        if ctx.parse_cache is not None:
+            cache_start = (ctx.parse_cache.hits, ctx.parse_cache.misses)
+        else:
+            cache_start = None
+        xpath_start = (xpath_parser.cache.hits, xpath_parser.cache.misses)
+
+        ctx.errors = error.ErrorList()
+        ctx.reset_revs()
+        warm = set(m for m in ctx.modules.values()
+                   if m is not None and m.i_is_validated is True)
+        ok = True
+        for ref, text in texts:
+            ctx.yin_module_map = {}
+            m = syntax.re_filename.search(Path(ref).name)
+            if m is not None:
+                name, rev, in_format = m.groups()
+                module = ctx.add_module(ref, text, in_format, name, rev,
+                                        expect_failure_error=False,
+                                        primary_module=True, replace=True)
+            else:
+                module = ctx.add_module(ref, text, primary_module=True,
+                                        replace=True)
+            if module is None:
+                ok = False
+            else:
+                modules.append(module)
+        self._add_deviation_modules()
+
+        for p in plugin.plugins:
+            p.pre_validate_ctx(ctx, modules)
+        if emit_obj is not None and modules:
+            emit_obj.pre_validate(ctx, modules)
+        ctx.validate()
+        for m in modules:
+            m.prune()
+        if emit_obj is not None and modules:
+            emit_obj.post_validate(ctx, modules)
+        for p in plugin.plugins:
+            p.post_validate_ctx(ctx, modules)
+
+        errors = self._get_errors(modules, warm, [ref for ref, _ in texts])
+        for e in errors:
+            if e['type'] == 'error':
+                ok = False
+
+        output = None
+        if emit_obj is not None and modules:
+            fd = io.StringIO()
+            try:
+                emit_obj.emit(ctx, modules, fd)
+                output = fd.getvalue()
+            except error.EmitError as ex:
+                ok = False
+                if ex.msg != "":
+                    errors.append({'file': None, 'line': 0, 'code': None,
+                                   'type': 'error', 'message': ex.msg})
+
+        # the modules given in the request are not kept, and neither
+        # are the modules they have changed
+        ctx.del_modules(modules)
+        loaded = self._forget_module_errors()
+        stats = self.get_stats(start, cache_start, xpath_start)
+        stats['reset'] = len(warm - loaded)
+        return {'ok': ok, 'errors': errors, 'output': output,
+                'stats': stats}
+
+    def _forget_module_errors(self):
+        """Forget the errors of the modules which are no longer in the
+        context, and return the set of modules in the context"""
+        loaded = set(self.ctx.modules.values())
+        for m in list(self.module_errors):
+            if m not in loaded:
+                del self.module_errors[m]
+        return loaded
+
+    def _get_texts(self, request):
+        texts = []
+        files = request.get('files', [])
+        if (not isinstance(files, list) or
+            not all(isinstance(f, str) for f in files)):
+            raise RequestError('bad "files", expected a list of file names')
+        for filename in files:
+            try:
+                with io.open(filename, "r", encoding="utf-8") as fd:
+                    texts.append((filename, fd.read()))
+            except (IOError, UnicodeDecodeError) as ex:
+                raise RequestError('error %s: %s' % (filename, ex))
+        mods = request.get('modules', [])
+        if not isinstance(mods, list):
+            raise RequestError('bad "modules", expected a list of modules')
+        for m in mods:
+            if (not isinstance(m, dict) or
+                not isinstance(m.get('ref'), str) or
+                not isinstance(m.get('text'), str)):
+                raise RequestError('bad module, expected "ref" and "text" '
+                                   'strings')
+            texts.append((m['ref'], m['text']))
+        if not texts:
+            raise RequestError('no modules given')
+        return texts
+
+    def _add_deviation_modules(self):
+        ctx = self.ctx
+        loaded = set(ctx.modules.values())
+        devmods = []
+        for m in ctx.deviation_modules:
+            if m in loaded:
+                devmods.append(m)
+        refs = set(m.pos.ref for m in devmods)
+        for ref, text in self.deviations:
+            if ref not in refs:
+                m = ctx.add_module(ref, text)
+                if m is not None:
+                    devmods.append(m)
+        ctx.deviation_modules = devmods
+
+    def _get_errors(self, modules, warm, refs):
+        """Return the errors to report for `modules`, as the command
+        line tool would"""
+        ctx = self.ctx
+        opts = ctx.opts
+        # remember the errors in the modules validated by this request
+        for e in ctx.errors:
+            top = e[0].top
+            if top is not None and top not in warm:
+                self.module_errors.setdefault(top, []).append(e)
+        # find all modules used by this request
+        used = set()
+        stack = modules + ctx.deviation_modules
+        while stack:
+            m = stack.pop()
+            if m not in used:
+                used.add(m)
+                stack.extend(dep for (dep, _) in ctx.get_dependencies(m))
+        errors = []
+        for m in used:
+            if m in warm:
+                for (epos, etag, eargs) in self.module_errors.get(m, ()):
+                    error.err_add(errors, epos, etag, eargs)
+        # the top of a syntax error is the partial module, which is not
+        # in the context
+        loaded = set(ctx.modules.values())
+        for (epos, etag, eargs) in ctx.errors:
+            if (epos.top is None or epos.top in used or
+                epos.top not in loaded or epos.ref in refs):
+                error.err_add(errors, epos, etag, eargs)
+
+        if opts.ignore_errors:
+            return []
+        errors.sort(key=lambda e: (e[0].ref, e[0].line))
+        errors.sort(key=lambda e: e[0].ref != refs[0])
+        modulenames = set()
+        for m in modules:
+            modulenames.add(m.arg)
+            for s in m.search('include'):
+                modulenames.add(s.arg)
+        res = []
+        for (epos, etag, eargs) in errors:
+            if etag in opts.ignore_error_tags:
+                continue
+            if (ctx.implicit_errors is False and
+                epos.top is not None and
+                epos.top.arg not in modulenames and
+                getattr(epos.top, 'i_modulename', None) not in modulenames and
+                epos.ref not in refs):
+                continue
+            elevel = error.err_level(etag)
+            if error.is_warning(elevel) and etag not in opts.errors:
+                kind = "warning"
+                if 'error' in opts.warnings and etag not in opts.warnings:
+                    kind = "error"
+                elif 'none' in opts.warnings:
+                    continue
+            else:
+                kind = "error"
+            res.append({'file': epos.ref, 'line': epos.line, 'code': etag,
+                        'type': kind,
+                        'message': error.err_to_str(etag, eargs)})
+        return res
+
+    def get_stats(self, start, cache_start=(0, 0), xpath_start=(0, 0)):
+        """Return the stats since the time `start`, the parse cache
+        counts `cache_start` and the XPath cache counts `xpath_start`"""
+        ctx = self.ctx
+        stats = {}
+        if start is not None:
+            stats['time'] = round(time.perf_counter() - start, 6)
+        stats['requests'] = self.requests
+        stats['modules'] = len(ctx.modules)
+        if ctx.parse_cache is not None and cache_start is not None:
+            (hits, misses) = cache_start
+            stats['parse_cache'] = {'hits': ctx.parse_cache.hits - hits,
+                                    'misses': ctx.parse_cache.misses - misses}
+        (hits, misses) = xpath_start
+        stats['xpath_cache'] = {'hits': xpath_parser.cache.hits - hits,
+                                'misses': xpath_parser.cache.misses - misses}
+        stats['memory'] = get_memory_usage()
+        return stats
+
+
+def _exc_str(ex):
+    msg = str(ex)
+    if msg:
+        return '%s: %s' % (ex.__class__.__name__, msg)
+    return ex.__class__.__name__
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        srv = self.server.pyang_server
+        for line in self.rfile:
+            line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            response = srv.handle_line(line) + '\n'
+            self.wfile.write(response.encode('utf-8'))
+            self.wfile.flush()
+            if srv.done:
+                break
+
+
+def get_memory_usage():
+    """Return a dict with the current and peak resident set size in kB
+
+    The values which cannot be found on this platform are left out.
+    """
+    res = {}
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        res['rss'] = pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            # reported in bytes
+            maxrss //= 1024
+        res['maxrss'] = maxrss
+    except ImportError:
+        pass
+    return res
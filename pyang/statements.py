@@ -1,11 +1,14 @@
 import copy
 import re
+import time
+from types import MappingProxyType
 
 from . import util
 from . import types
 from . import syntax
 from . import grammar
 from . import xpath
+from . import schemapath
 from .error import err_add
 
 ### Functions that plugins can use
@@ -32,7 +35,9 @@ def _sequence(one, two):
         return two
     elif two is None:
         return one
-    return lambda *args, **kargs: (one(*args, **kargs), two(*args, **kargs))[1]
+    f = lambda *args, **kargs: (one(*args, **kargs), two(*args, **kargs))[1]
+    f.sequence = (one, two)
+    return f
 
 def add_validation_fun(phase, keywords, fun):
     """Add a validation function to some phase in the framework.
@@ -43,12 +48,27 @@ def add_validation_fun(phase, keywords, fun):
     for keyword in keywords:
         _validation_map[phase, keyword] = _sequence(
             _validation_map.get((phase, keyword)), fun)
+    _validation_dispatch.clear()
 
 def add_validation_var(var_name, var_fun):
     """Add a validation variable to the framework.
 
+    `var_fun` is called with a keyword, and returns True if the
+    validation functions for `var_name` should be called for statements
+    with that keyword.  The result is cached per keyword.
     Can be used by plugins to do special validation of extensions."""
     _validation_variables.append((var_name, var_fun))
+    _validation_dispatch.clear()
+
+def set_validation_profile(profile):
+    """Set a ValidationProfile which records the time spent in the
+    validation phases and functions, or None to stop profiling.
+
+    All validation functions, also the ones added by plugins, are
+    timed separately."""
+    global _validation_profile
+    _validation_profile = profile
+    _validation_dispatch.clear()
 
 def set_phase_i_children(phase):
     """Marks that the phase is run over the expanded i_children.
@@ -66,6 +86,7 @@ def add_data_keyword(keyword):
 
 def add_keyword_with_children(keyword):
     _keyword_with_children[keyword] = True
+    _validation_dispatch.clear()
 
 def is_keyword_with_children(keyword):
     return keyword in _keyword_with_children
@@ -286,6 +307,15 @@ _validation_variables = [
     ('$extension', lambda keyword: util.is_prefixed(keyword)),
 ]
 
+_validation_dispatch = {}
+"""dict of phase:_PhaseDispatch, compiled from _validation_map.
+Cleared when the validation functions or variables are changed."""
+
+_validation_dispatch_grammar = None
+"""grammar.stmt_map_generation when _validation_dispatch was compiled"""
+
+_validation_profile = None
+
 data_keywords = ['leaf', 'leaf-list', 'container', 'list', 'choice', 'case',
                  'anyxml', 'anydata', 'action', 'rpc', 'notification']
 
@@ -293,6 +323,20 @@ _keywords_with_no_explicit_config = ['action', 'rpc', 'notification']
 
 _copy_uses_keywords = []
 
+_uses_nocopy_keywords = ['type', 'uses', 'unique', 'if-feature',
+                         'typedef', 'grouping',
+                         'description', 'reference', 'units', 'presence',
+                         'status', 'ordered-by']
+"""Substatements which are not copied when a grouping is expanded, but
+shared by the grouping and all its expanded copies.
+
+The type is not copied since it cannot be modified anyway, and this
+also works better for some plugins that generate output from the
+i_children list.  The other statements are never modified in place, a
+refine or deviate statement replaces them in the `substmts` of the
+expanded node.  Their `parent` and `pos` are the ones in the grouping.
+"""
+
 _copy_augment_keywords = []
 
 _refinements = [
@@ -352,45 +396,229 @@ _valid_deviations = {
 
 ### Validation
 
+class ValidationProfile(object):
+    """Time spent in the validation phases and validation functions.
+
+    Enabled with set_validation_profile()."""
+
+    def __init__(self):
+        self.phases = {}
+        """dict of phase:[count, seconds]
+        `count` is the number of validated (sub)modules.  The time
+        spent in the validation of other modules, e.g. imported modules,
+        is not included."""
+        self.modules = {}
+        """dict of modulename:{phase:seconds}
+        Like `phases`, per (sub)module."""
+        self.functions = {}
+        """dict of (phase, keyword, function name):[calls, seconds]
+        `keyword` is a keyword, a validation variable or '*'.  The time
+        includes the validation of other modules started by the
+        function."""
+        self._stack = []
+
+    def enter_phase(self, module, phase):
+        now = time.perf_counter()
+        if self._stack:
+            self._add_phase_time(self._stack[-1], now)
+        self._stack.append([module.arg, phase, now])
+        self.phases.setdefault(phase, [0, 0.0])[0] += 1
+
+    def leave_phase(self):
+        now = time.perf_counter()
+        self._add_phase_time(self._stack.pop(), now)
+        if self._stack:
+            self._stack[-1][2] = now
+
+    def _add_phase_time(self, entry, now):
+        (modulename, phase, start) = entry
+        self.phases[phase][1] += now - start
+        phases = self.modules.setdefault(modulename, {})
+        phases[phase] = phases.get(phase, 0.0) + now - start
+
+    def wrap(self, phase, keyword, f):
+        """Return a function which calls `f` and records the time spent
+        in each of the functions it was built from by
+        add_validation_fun()."""
+        timed = [self._wrap_one(phase, keyword, g) for g in _unsequence(f)]
+        if len(timed) == 1:
+            return timed[0]
+        def timed_sequence(ctx, stmt):
+            res = None
+            for g in timed:
+                res = g(ctx, stmt)
+            return res
+        return timed_sequence
+
+    def _wrap_one(self, phase, keyword, f):
+        key = (phase, util.keyword_to_str(keyword), _function_name(f))
+        counter = self.functions.setdefault(key, [0, 0.0])
+        def timed(ctx, stmt):
+            start = time.perf_counter()
+            try:
+                return f(ctx, stmt)
+            finally:
+                counter[0] += 1
+                counter[1] += time.perf_counter() - start
+        return timed
+
+    def get_report(self):
+        """Return the profile as a dict suitable for JSON, with the
+        phases, functions and modules sorted by time."""
+        def by_time(x):
+            return -x['seconds']
+        phases = [{'phase': phase, 'count': count, 'seconds': secs}
+                  for phase, (count, secs) in self.phases.items()]
+        functions = [{'phase': phase, 'keyword': keyword,
+                      'function': fname, 'calls': calls, 'seconds': secs}
+                     for (phase, keyword, fname), (calls, secs)
+                     in self.functions.items()]
+        modules = [{'module': modulename,
+                    'seconds': sum(phases_.values()),
+                    'phases': phases_}
+                   for modulename, phases_ in self.modules.items()]
+        return {'phases': sorted(phases, key=by_time),
+                'functions': sorted(functions, key=by_time),
+                'modules': sorted(modules, key=by_time)}
+
+    def write(self, fd):
+        """Write a text report to `fd`"""
+        report = self.get_report()
+        fd.write('%-20s %8s %10s\n' % ('phase', 'modules', 'seconds'))
+        for x in report['phases']:
+            fd.write('%-20s %8d %10.3f\n' %
+                     (x['phase'], x['count'], x['seconds']))
+        fd.write('\n%-20s %-20s %-40s %8s %10s\n' %
+                 ('phase', 'keyword', 'function', 'calls', 'seconds'))
+        for x in report['functions']:
+            fd.write('%-20s %-20s %-40s %8d %10.3f\n' %
+                     (x['phase'], x['keyword'], x['function'],
+                      x['calls'], x['seconds']))
+        fd.write('\n%-40s %10s  %s\n' % ('module', 'seconds', 'slowest phase'))
+        for x in report['modules']:
+            phase = max(x['phases'], key=x['phases'].get)
+            fd.write('%-40s %10.3f  %s %.3f\n' %
+                     (x['module'], x['seconds'], phase, x['phases'][phase]))
+
+def _unsequence(f):
+    """Return the functions which `f` was built from by _sequence()"""
+    if hasattr(f, 'sequence'):
+        (one, two) = f.sequence
+        return _unsequence(one) + _unsequence(two)
+    return [f]
+
+def _function_name(f):
+    name = getattr(f, '__qualname__', None) or repr(f)
+    code = getattr(f, '__code__', None)
+    if (getattr(f, '__name__', None) == '<lambda>' and
+        code is not None and code.co_names):
+        # the validation functions are often lambdas which call a
+        # function or method, use its name
+        name = code.co_names[0]
+    return '%s.%s' % (getattr(f, '__module__', None), name)
+
+class _PhaseDispatch(object):
+    """The validation functions of a phase, compiled per keyword"""
+
+    def __init__(self, phase, children):
+        self.phase = phase
+        self.i_children = phase in _v_i_children
+        self.funs = {}
+        """dict of keyword:tuple of validation functions"""
+        keywords = set(k for (p, k) in _validation_map if p == phase)
+        self.empty = len(keywords) == 0
+        if ('*' in keywords or
+            any(var_name in keywords for var_name, _ in _validation_variables)):
+            self.relevant = None
+        else:
+            self.relevant = _relevant_keywords(keywords, children)
+        """the keywords which have validation functions, or can have
+        descendants with validation functions, or None if all keywords
+        are relevant"""
+
+    def compile(self, keyword):
+        """Return the validation functions for `keyword`, in the order
+        exact match, validation variables, wildcard."""
+        phase = self.phase
+        funs = []
+        key = (phase, keyword)
+        if key in _validation_map:
+            funs.append((keyword, _validation_map[key]))
+        for var_name, var_f in _validation_variables:
+            key = (phase, var_name)
+            if key in _validation_map and var_f(keyword) is True:
+                funs.append((var_name, _validation_map[key]))
+        key = (phase, '*')
+        if key in _validation_map:
+            funs.append(('*', _validation_map[key]))
+        if _validation_profile is not None:
+            res = tuple(_validation_profile.wrap(phase, k, f)
+                        for k, f in funs)
+        else:
+            res = tuple(f for _k, f in funs)
+        self.funs[keyword] = res
+        return res
+
+def _relevant_keywords(keywords, children):
+    """Return `keywords` and the keywords which can have descendants in
+    `keywords` according to the grammar"""
+    res = set(keywords)
+    if not res:
+        return frozenset()
+    changed = True
+    while changed:
+        changed = False
+        for keyword, subkeywords in children.items():
+            if keyword not in res and ('$any' in subkeywords or
+                                       not subkeywords.isdisjoint(res)):
+                res.add(keyword)
+                changed = True
+    return frozenset(res)
+
+def _get_phase_dispatch(phase):
+    global _validation_dispatch_grammar
+    if _validation_dispatch_grammar != grammar.stmt_map_generation:
+        _validation_dispatch.clear()
+        _validation_dispatch_grammar = grammar.stmt_map_generation
+    try:
+        return _validation_dispatch[phase]
+    except KeyError:
+        pass
+    children = {}
+    for keyword, (_arg_type, subspec) in grammar.stmt_map.items():
+        children[keyword] = \
+            set(k for k, _occurance in grammar.flatten_spec(subspec))
+    d = _PhaseDispatch(phase, children)
+    _validation_dispatch[phase] = d
+    return d
+
 def validate_module(ctx, module):
     """Validate `module`, which is a Statement representing a (sub)module"""
 
     if module.i_is_validated:
         return
 
-    def iterate(stmt, phase):
+    def iterate(stmt, d, relevant):
         # if the grammar is not yet checked or if it is checked and
         # valid, then we continue.
         if getattr(stmt, 'is_grammatically_valid', None) is False:
             return
-        # first check an exact match
-        key = (phase, stmt.keyword)
+        # call the functions for an exact match, the special variables,
+        # and the wildcard, in that order
+        funs = d.funs.get(stmt.keyword)
+        if funs is None:
+            funs = d.compile(stmt.keyword)
         res = 'recurse'
-        if key in _validation_map:
-            f = _validation_map[key]
-            res = f(ctx, stmt)
-            if res == 'stop':
-                raise Abort
-        # then also run match by special variable
-        for var_name, var_f in _validation_variables:
-            key = phase, var_name
-            if key in _validation_map and var_f(stmt.keyword) is True:
-                f = _validation_map[key]
-                res = f(ctx, stmt)
-                if res == 'stop':
-                    raise Abort
-        # then run wildcard
-        wildcard = (phase, '*')
-        if wildcard in _validation_map:
-            f = _validation_map[wildcard]
+        for f in funs:
             res = f(ctx, stmt)
             if res == 'stop':
                 raise Abort
         if res == 'continue':
             pass
         else:
-            # default is to recurse
-            if phase in _v_i_children:
+            # default is to recurse, but not into statements which
+            # cannot have any statements with validation functions
+            if d.i_children:
                 if stmt.keyword == 'grouping':
                     return
                 if stmt.i_module is not None and stmt.i_module != module:
@@ -399,19 +627,38 @@ def validate_module(ctx, module):
                     return
                 if hasattr(stmt, 'i_children'):
                     for s in stmt.i_children:
-                        iterate(s, phase)
+                        if relevant is None or s.keyword in relevant:
+                            iterate(s, d, relevant)
                 for s in stmt.substmts:
-                    if (hasattr(s, 'i_has_i_children') or
-                        (phase, s.keyword) in _v_i_children_keywords):
-                        iterate(s, phase)
+                    if ((hasattr(s, 'i_has_i_children') or
+                         (d.phase, s.keyword) in _v_i_children_keywords) and
+                        (relevant is None or s.keyword in relevant)):
+                        iterate(s, d, relevant)
             else:
                 for s in stmt.substmts:
-                    iterate(s, phase)
+                    if relevant is None or s.keyword in relevant:
+                        iterate(s, d, relevant)
 
     module.i_is_validated = 'in_progress'
+    profile = _validation_profile
     try:
         for phase in _validation_phases:
-            iterate(module, phase)
+            d = _get_phase_dispatch(phase)
+            if d.empty:
+                continue
+            if ctx.opaque_extensions:
+                # unknown extensions can have any substatements
+                relevant = None
+            else:
+                relevant = d.relevant
+            if profile is None:
+                iterate(module, d, relevant)
+            else:
+                profile.enter_phase(module, phase)
+                try:
+                    iterate(module, d, relevant)
+                finally:
+                    profile.leave_phase()
     except Abort:
         pass
     module.i_is_validated = True
@@ -499,13 +746,28 @@ def v_init_extension(ctx, stmt):
     stmt.i_extension_revision = revision
     stmt.i_extension = None
 
+_no_definitions = MappingProxyType({})
+"""Read-only i_typedefs and i_groupings of the statements which
+cannot have any definitions"""
+
 def v_init_stmt(ctx, stmt):
-    stmt.i_typedefs = {}
-    stmt.i_groupings = {}
+    # most statements have no typedefs or groupings, and share one
+    # empty mapping.  the definitions of included submodules are
+    # added to the module's mappings.
+    if (stmt.keyword in ('module', 'submodule') or
+        stmt.search_one('typedef') is not None):
+        stmt.i_typedefs = {}
+    else:
+        stmt.i_typedefs = _no_definitions
+    if (stmt.keyword in ('module', 'submodule') or
+        stmt.search_one('grouping') is not None):
+        stmt.i_groupings = {}
+    else:
+        stmt.i_groupings = _no_definitions
     stmt.i_uniques = []
 
 def v_init_has_children(ctx, stmt):
-    stmt.i_children = []
+    stmt.i_children = util.ChildList()
 
 def v_init_import(ctx, stmt):
     stmt.i_is_safe_import = False
@@ -1415,7 +1677,7 @@ def v_expand_1_children(ctx, stmt):
             # create the implicitly defined input node
             input_ = new_statement(stmt.top, stmt, stmt.pos, 'input', 'input')
             v_init_stmt(ctx, input_)
-            input_.i_children = []
+            input_.i_children = util.ChildList()
             input_.i_module = stmt.i_module
             stmt.i_children.append(input_)
         else:
@@ -1432,7 +1694,7 @@ def v_expand_1_children(ctx, stmt):
             # create the implicitly defined output node
             output = new_statement(stmt.top, stmt, stmt.pos, 'output', 'output')
             v_init_stmt(ctx, output)
-            output.i_children = []
+            output.i_children = util.ChildList()
             output.i_module = stmt.i_module
             stmt.i_children.append(output)
         else:
@@ -1568,6 +1830,9 @@ def v_expand_1_uses(ctx, stmt):
     for s in whens:
         s.i_origin = 'uses'
     iffeatures = list(stmt.search('if-feature'))
+    # the copies of the statements on the same line in the grouping
+    # share one Position, which refers to the uses statement
+    positions = {}
     # first, copy the grouping into our i_children
     for g in stmt.i_grouping.i_children:
         if util.keysearch(g.keyword, 0, subspec) is None:
@@ -1577,17 +1842,20 @@ def v_expand_1_uses(ctx, stmt):
                      g.pos))
             continue
 
-        # don't copy the type since it cannot be modified anyway.
-        # not copying the type also works better for some plugins that
-        # generate output from the i_children list.
+        # don't copy the statements in _uses_nocopy_keywords, they are
+        # shared with the grouping.
         def post_copy(old, new):
             # inline the definition into our module
             new.i_module = stmt.i_module
             if hasattr(old, 'i_not_implemented'):
                 new.i_not_implemented = old.i_not_implemented
-            new.i_children = []
+            new.i_children = util.ChildList()
             new.i_uniques = []
-            new.pos.uses_pos = stmt.pos
+            pos = positions.get(old.pos)
+            if pos is None:
+                pos = positions[old.pos] = copy.copy(old.pos)
+                pos.uses_pos = stmt.pos
+            new.pos = pos
             # build the i_children list of pointers
             if hasattr(old, 'i_children'):
                 for x in old.i_children:
@@ -1599,14 +1867,11 @@ def v_expand_1_uses(ctx, stmt):
                     else:
                         # otherwise, copy the i_child
                         newx = x.copy(new, stmt,
-                                      nocopy=['type','uses', 'unique',
-                                              'if-feature',
-                                              'typedef','grouping'],
+                                      nocopy=_uses_nocopy_keywords,
                                       copyf=post_copy)
                         new.i_children.append(newx)
         newg = g.copy(stmt.parent, stmt,
-                      nocopy=['type','uses','unique', 'if-feature',
-                              'typedef','grouping'],
+                      nocopy=_uses_nocopy_keywords,
                       copyf=post_copy)
         for s in whens:
             news = s.copy(newg)
@@ -1872,7 +2137,7 @@ def create_new_case(ctx, choice, child, expand=True):
     new_case = new_statement(child.top, choice, child.pos, 'case', child.arg)
     v_init_stmt(ctx, new_case)
     child.parent = new_case
-    new_case.i_children = [child]
+    new_case.i_children = util.ChildList([child])
     new_case.i_module = child.i_module
     s = child.search_one('status')
     if s is not None:
@@ -2487,6 +2752,8 @@ def is_mandatory_node(stmt):
     return False
 
 def search_child(children, modulename, identifier):
+    if isinstance(children, util.ChildList):
+        children = children.children_named(modulename, identifier)
     for child in children:
         if child.arg == identifier:
             if (child.i_module.i_modulename == modulename or
@@ -2543,6 +2810,8 @@ def search_grouping(stmt, name):
     return None
 
 def search_data_keyword_child(children, modulename, identifier):
+    if isinstance(children, util.ChildList):
+        children = children.children_named(modulename, identifier)
     for child in children:
         if (child.arg == identifier and
             child.i_module.i_modulename == modulename and
@@ -2603,7 +2872,7 @@ def find_target_node(ctx, stmt, is_augment=False):
                                   identifier)
                 v_init_stmt(ctx, child)
                 child.i_module = module
-                child.i_children = []
+                child.i_children = util.ChildList()
                 child.i_config = node.i_config
                 node.i_children.append(child)
                 # keep track of this temporary statement
@@ -2948,7 +3217,7 @@ class Statement(object):
     # a Statement can have! Subclasses can add additional slots as needed.
     __slots__ = (
         # Baseline instance attributes, documented in __init__ below
-        'top', 'parent', 'pos', 'raw_keyword', 'keyword',
+        'top', 'parent', 'stmt_parent', 'pos', 'raw_keyword', 'keyword',
         'ext_mod', 'arg', 'substmts',
 
         # Applicable to most (all?) Statements, widely used
@@ -2975,6 +3244,9 @@ class Statement(object):
         'i_uses_pos',
         'i_uses_top',
 
+        # Only on Statements added by an augment - see v_expand_2_augment()
+        'i_augment',
+
         # YANG language extensions
         'i_extension_modulename',
         'i_extension_revision',
@@ -3053,8 +3325,12 @@ class Statement(object):
 
     def copy(self, parent=None, uses=None, uses_top=True,
              nocopy=(), ignore=(), copyf=None):
+        """Return a copy of the receiver and its substatements.
+
+        The copy shares `pos` with the receiver; assign a new Position
+        to the copy instead of modifying it.
+        """
         new = copy.copy(self)
-        new.pos = copy.copy(new.pos)
         if uses is not None:
             if hasattr(new, 'i_uses'):
                 # make a copy of i_uses before modifying it
@@ -3187,14 +3463,11 @@ class CommentStatement(Statement):
     )
 
 class ChoiceStatement(Statement):
-    __slots__ = (
-        'i_augment',
-    )
+    __slots__ = ()
 
 
 class ContainerStatement(Statement):
     __slots__ = (
-        'i_augment',
         'i_not_supported',
         'i_this_not_supported',
     )
@@ -3230,7 +3503,6 @@ class ImportStatement(Statement):
 
 class LeafLeaflistStatement(Statement):
     __slots__ = (
-        'i_augment',
         'i_default',                    # also in TypedefStatement
         'i_default_str',                # also in TypedefStatement
         'i_leafref',                    # also in TypedefStatement
@@ -3245,7 +3517,6 @@ class LeafLeaflistStatement(Statement):
 
 class ListStatement(Statement):
     __slots__ = (
-        'i_augment',
         'i_key',                      # List of Statements that're keys to self
         'i_unique',
         'i_not_supported',
@@ -3388,25 +3659,24 @@ def mk_path_str(stmt,
     with_keys will include "[key]" to indicate the key names in the XPath.
 
     Prefixes may be included in the path if the prefix changes mid-path.
+
+    The path is kept in the path index of the context, see
+    get_path_index().
+    """
+    return get_path_index(stmt).get_xpath(
+        stmt, with_prefixes, prefix_onchange, prefix_to_module,
+        resolve_top_prefix_to_module, with_keys)
+
+def get_path_index(stmt):
+    """Returns the schema path index of the context of `stmt`.
+
+    If `stmt` is not in a validated module, a new empty index is
+    returned.
     """
-    resolved_names = mk_path_list(stmt)
-    xpath_elements = []
-    last_prefix = None
-    for index, resolved_name in enumerate(resolved_names):
-        module_name, prefix, node_name, node_keys = resolved_name
-        xpath_element = node_name
-        if with_prefixes or (prefix_onchange and prefix != last_prefix):
-            new_prefix = prefix
-            if (prefix_to_module or
-                (index == 0 and resolve_top_prefix_to_module)):
-                new_prefix = module_name
-            xpath_element = '%s:%s' % (new_prefix, node_name)
-        if with_keys and node_keys:
-            for node_key in node_keys:
-                xpath_element = '%s[%s]' % (xpath_element, node_key)
-        xpath_elements.append(xpath_element)
-        last_prefix = prefix
-    return '/%s' % '/'.join(xpath_elements)
+    ctx = getattr(stmt.top, 'i_ctx', None)
+    if ctx is None:
+        return schemapath.PathIndex()
+    return ctx.path_index
 
 def get_xpath(stmt, qualified=False, prefix_to_module=False, with_keys=False):
     """Gets the XPath path of the data node `stmt`.
@@ -3452,12 +3722,7 @@ def get_keys(stmt):
     """Gets the key names for the node if present.
     Returns a list of key name strings.
     """
-    key_obj = stmt.search_one('key')
-    key_names = []
-    keys = getattr(key_obj, 'arg', None)
-    if keys:
-        key_names = keys.split()
-    return key_names
+    return schemapath.get_keys(stmt)
 
 def get_qualified_type(stmt):
     """Gets the qualified, top-level type of the node.
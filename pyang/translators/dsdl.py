@@ -461,7 +461,7 @@ class HybridDSDLSchema(object):
             pref = "$pref:"
         else:
             pref = self.prefix_stack[-1] + ":"
-        toks = xpath_lexer.scan(xpe)
+        toks = xpath_lexer.tokens(xpe)
         prev = None
         res = ""
         for tok in toks:
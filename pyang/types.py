@@ -1,9 +1,13 @@
 """YANG built-in types"""
 
 import base64
+import re
+import unicodedata
+
 import lxml.etree
 
 from . import util
+from . import error
 from . import syntax
 from .error import err_add
 
@@ -591,6 +595,14 @@ class LengthTypeSpec(TypeSpec):
 
 
 class XSDPattern(object):
+    """A compiled YANG pattern, i.e., an XSD regular expression.
+
+    The patterns are compiled once per expression, and cached.  The
+    syntax of the expression is checked by lxml.  Values which only
+    contain ASCII characters are matched with an equivalent Python
+    regular expression, if the expression can be translated (see
+    _XSDRegexTranslator); other values are matched by lxml.
+    """
 
     SCHEMA = '''<?xml version="1.0"?>
                 <xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
@@ -610,6 +622,9 @@ class XSDPattern(object):
     _pattern = None
     _avalue = None
 
+    cache = util.LRUCache(10000)
+    """Cache of expression:_CompiledPattern"""
+
     @classmethod
     def _prepare_documents(cls):
         if cls._schema is None:
@@ -618,23 +633,34 @@ class XSDPattern(object):
             cls._pattern = cls._schema[0][0][0][0]
 
     def __init__(self, spec, pos, invert_match):
-        self._prepare_documents()
         self.spec = spec
         self.pos = pos
         self.invert_match = invert_match
+        compiled = self.cache.get(spec, self._compile)
+        self.schema = compiled.schema
+        self.error = compiled.error
+        self.regex = compiled.regex
 
-        self._pattern.set('value', spec)
+    @classmethod
+    def _compile(cls, spec):
+        cls._prepare_documents()
+        cls._pattern.set('value', spec)
         try:
-            self.schema = lxml.etree.XMLSchema(etree=self._schema)
+            schema = lxml.etree.XMLSchema(etree=cls._schema)
         except lxml.etree.XMLSchemaParseError as err:
-            self.schema = None
-            self.error = err
-        else:
-            self.error = None
+            return _CompiledPattern(None, err, None)
+        try:
+            regex = re.compile(_XSDRegexTranslator(spec).translate())
+        except (_Untranslatable, re.error):
+            regex = None
+        return _CompiledPattern(schema, None, regex)
 
     def __call__(self, value):
         if self.schema is None:
             return None
+        if self.regex is not None and value.isascii():
+            return ((self.regex.fullmatch(value) is not None)
+                    is not self.invert_match)
         self._avalue.text = value
         return self.schema.validate(self._avalue) is not self.invert_match
 
@@ -649,6 +675,236 @@ class XSDPattern(object):
     __nonzero__ = __bool__
 
 
+class _CompiledPattern(object):
+    __slots__ = ('schema', 'error', 'regex')
+
+    def __init__(self, schema, error, regex):
+        self.schema = schema
+        """the lxml XMLSchema, or None if the expression is invalid"""
+        self.error = error
+        """the lxml error if the expression is invalid, otherwise None"""
+        self.regex = regex
+        """the equivalent Python regular expression for ASCII values,
+        or None"""
+
+
+_ascii_chars = frozenset(chr(i) for i in range(128))
+
+def _ascii_category(category):
+    return frozenset(c for c in _ascii_chars
+                     if unicodedata.category(c).startswith(category))
+
+_xsd_categories = frozenset([
+    'L', 'Lu', 'Ll', 'Lt', 'Lm', 'Lo', 'M', 'Mn', 'Mc', 'Me',
+    'N', 'Nd', 'Nl', 'No', 'P', 'Pc', 'Pd', 'Ps', 'Pe', 'Pi', 'Pf', 'Po',
+    'Z', 'Zs', 'Zl', 'Zp', 'S', 'Sm', 'Sc', 'Sk', 'So',
+    'C', 'Cc', 'Cf', 'Co', 'Cn'])
+
+_letters = _ascii_category('L')
+
+_multi_char_escapes = {
+    's': frozenset(' \t\n\r'),
+    'i': _letters | frozenset('_:'),
+    'c': _letters | _ascii_category('Nd') | frozenset('.-_:'),
+    'd': _ascii_category('Nd'),
+    'w': _ascii_chars - (_ascii_category('P') | _ascii_category('Z') |
+                         _ascii_category('C')),
+}
+"""The ASCII characters matched by the XSD multi-character escapes"""
+
+for _c in list(_multi_char_escapes):
+    _multi_char_escapes[_c.upper()] = _ascii_chars - _multi_char_escapes[_c]
+del _c
+
+_single_char_escapes = {'n': '\n', 'r': '\r', 't': '\t'}
+for _c in '\\|.-^?*+{}()[]':
+    _single_char_escapes[_c] = _c
+del _c
+
+_xsd_metachars = frozenset('.\\?*+{}()[]|')
+
+class _Untranslatable(Exception):
+    pass
+
+class _XSDRegexTranslator(object):
+    """Translate an XSD regular expression to a Python regular
+    expression which matches the same ASCII strings.
+
+    Each character class is translated to the explicit set of ASCII
+    characters it matches, so that the translation does not depend on
+    the Unicode tables.  Raises _Untranslatable if the expression uses
+    a construct which is not handled, e.g. a block escape other than
+    IsBasicLatin.  The expression must be valid; this is checked by
+    lxml first.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.i = 0
+
+    def translate(self):
+        res = self.reg_exp()
+        if self.i != len(self.spec):
+            raise _Untranslatable()
+        return res
+
+    def peek(self):
+        if self.i < len(self.spec):
+            return self.spec[self.i]
+        return None
+
+    def next(self):
+        c = self.peek()
+        if c is None:
+            raise _Untranslatable()
+        self.i += 1
+        return c
+
+    def reg_exp(self):
+        branches = [self.branch()]
+        while self.peek() == '|':
+            self.i += 1
+            branches.append(self.branch())
+        return '|'.join(branches)
+
+    def branch(self):
+        res = []
+        while self.peek() not in (None, '|', ')'):
+            res.append(self.atom() + self.quantifier())
+        return ''.join(res)
+
+    def atom(self):
+        c = self.next()
+        if c == '(':
+            res = '(?:' + self.reg_exp() + ')'
+            if self.next() != ')':
+                raise _Untranslatable()
+            return res
+        elif c == '[':
+            return _chars_to_re(self.char_class_expr())
+        elif c == '.':
+            return _chars_to_re(_ascii_chars - frozenset('\n\r'))
+        elif c == '\\':
+            chars = self.escape()
+            if isinstance(chars, str):
+                return re.escape(chars)
+            return _chars_to_re(chars)
+        elif c in _xsd_metachars:
+            raise _Untranslatable()
+        return re.escape(c)
+
+    def quantifier(self):
+        c = self.peek()
+        if c in ('?', '*', '+'):
+            self.i += 1
+            return c
+        elif c == '{':
+            m = re.compile(r'\{(\d+)(,(\d*))?\}').match(self.spec, self.i)
+            if m is None:
+                raise _Untranslatable()
+            self.i = m.end()
+            return m.group(0)
+        return ''
+
+    def escape(self):
+        """Return the character of a single character escape, or the
+        set of ASCII characters matched by a class escape"""
+        c = self.next()
+        if c in _single_char_escapes:
+            return _single_char_escapes[c]
+        elif c in _multi_char_escapes:
+            return _multi_char_escapes[c]
+        elif c in ('p', 'P'):
+            m = re.compile(r'\{([A-Za-z0-9-]+)\}').match(self.spec, self.i)
+            if m is None:
+                raise _Untranslatable()
+            self.i = m.end()
+            name = m.group(1)
+            if name in _xsd_categories:
+                chars = _ascii_category(name)
+            elif name == 'IsBasicLatin':
+                chars = _ascii_chars
+            else:
+                raise _Untranslatable()
+            if c == 'P':
+                return _ascii_chars - chars
+            return chars
+        raise _Untranslatable()
+
+    def char_class_expr(self):
+        """Return the set of ASCII characters matched by a character
+        class expression; the '[' is already consumed"""
+        negate = False
+        if self.peek() == '^':
+            self.i += 1
+            negate = True
+        chars = set()
+        subtract = frozenset()
+        first = True
+        while True:
+            c = self.next()
+            if c == ']' and not first:
+                break
+            elif c == '-' and self.peek() == '[' and not first:
+                self.i += 1
+                subtract = self.char_class_expr()
+                if self.next() != ']':
+                    raise _Untranslatable()
+                break
+            elif c == '-' and not first and self.peek() != ']':
+                raise _Untranslatable()
+            elif c == '[' or (c == ']' and first):
+                raise _Untranslatable()
+            if c == '\\':
+                start = self.escape()
+            else:
+                start = c
+            first = False
+            if (isinstance(start, str) and self.peek() == '-' and
+                self.spec[self.i + 1:self.i + 2] not in ('', ']', '[')):
+                self.i += 1
+                end = self.next()
+                if end == '\\':
+                    end = self.escape()
+                    if not isinstance(end, str):
+                        raise _Untranslatable()
+                elif end == '[':
+                    raise _Untranslatable()
+                if ord(end) < ord(start):
+                    raise _Untranslatable()
+                chars.update(chr(i) for i in
+                             range(ord(start), min(ord(end), 127) + 1))
+            elif isinstance(start, str):
+                if start in _ascii_chars:
+                    chars.add(start)
+            else:
+                chars.update(start)
+        if negate:
+            return _ascii_chars - chars - subtract
+        return frozenset(chars) - subtract
+
+def _chars_to_re(chars):
+    if not chars:
+        # matches nothing
+        return '(?!)'
+    codes = sorted(ord(c) for c in chars)
+    ranges = []
+    start = prev = codes[0]
+    for code in codes[1:]:
+        if code != prev + 1:
+            ranges.append((start, prev))
+            start = code
+        prev = code
+    ranges.append((start, prev))
+    res = []
+    for (start, end) in ranges:
+        if end - start >= 2:
+            res.append(re.escape(chr(start)) + '-' + re.escape(chr(end)))
+        else:
+            res.extend(re.escape(chr(c)) for c in range(start, end + 1))
+    return '[' + ''.join(res) + ']'
+
+
 def validate_pattern_expr(errors, stmt):
     invert_match = stmt.search_one('modifier', arg='invert-match') is not None
     pattern = XSDPattern(stmt.arg, stmt.pos, invert_match)
@@ -1049,6 +1305,110 @@ class UnionTypeSpec(TypeSpec):
                 (val, self.definition, 'no member type matched' + errstr))
         return False
 
+# the lexical representation of an integer in instance data
+re_instance_integer = re.compile(r'[+-]?[0-9]+\Z')
+
+def is_int_type_spec(spec):
+    """Return True if `spec` is an integer type, or derived from one"""
+    while spec is not None:
+        if isinstance(spec, IntTypeSpec):
+            return True
+        spec = spec.base
+    return False
+
+class TypeValidator(object):
+    """Validates instance data values against a type.
+
+    Built from a type statement in a validated module, e.g. the type
+    of a leaf.  The values are given as strings, in the lexical
+    representation of the type, as in a default statement.
+
+    A valid value does not allocate an error; the same errors list is
+    used for all values.  The results of the last `cache_size`
+    distinct values are cached.
+    """
+
+    cache_size = 1024
+
+    def __init__(self, type_stmt):
+        self.type_stmt = type_stmt
+        self.type_spec = type_stmt.i_type_spec
+        self.module = type_stmt.i_module
+        self._errors = []
+        self._results = {}
+
+    def check(self, value):
+        """Return None if `value` is valid, otherwise an error message"""
+        try:
+            return self._results[value]
+        except KeyError:
+            pass
+        res = self._check(value)
+        if len(self._results) >= self.cache_size:
+            self._results.clear()
+        self._results[value] = res
+        return res
+
+    def _check(self, value):
+        spec = self.type_spec
+        if isinstance(spec, EmptyTypeSpec):
+            if value == '':
+                return None
+            return 'the value "%s" is not empty' % value
+        errors = self._errors
+        if self._validate(spec, value, errors):
+            return None
+        if errors:
+            (_pos, tag, args) = errors[0]
+            msg = error.err_to_str(tag, args)
+        else:
+            msg = 'the value "%s" is invalid' % value
+        del errors[:]
+        return msg
+
+    def _validate(self, spec, value, errors):
+        pos = self.type_stmt.pos
+        if isinstance(spec, PathTypeSpec):
+            target = getattr(spec, 'i_target_node', None)
+            if target is None:
+                return True
+            spec = target.search_one('type').i_type_spec
+            if spec is None:
+                return True
+        if isinstance(spec, UnionTypeSpec):
+            # validate the members here, since their integers are
+            # parsed differently from the ones in the module
+            for t in spec.types:
+                if (t.i_type_spec is not None and
+                    self._validate(t.i_type_spec, value, [])):
+                    return True
+            err_add(errors, pos, 'TYPE_VALUE',
+                    (value, spec.definition, 'no member type matched'))
+            return False
+        elif isinstance(spec, EmptyTypeSpec):
+            return value == ''
+        elif is_int_type_spec(spec):
+            # the instance data integers are decimal, RFC 7950 9.2.1
+            if re_instance_integer.match(value) is None:
+                err_add(errors, pos, 'TYPE_VALUE',
+                        (value, spec.definition, 'not an integer'))
+                return False
+            val = int(value, 10)
+        else:
+            val = spec.str_to_val(errors, pos, value, self.module)
+            if val is None:
+                return False
+        return spec.validate(errors, pos, val, self.module)
+
+    def validate(self, values):
+        """Validate a sequence of values.
+
+        Return a list of (index, message) for the invalid values.
+        """
+        check = self.check
+        return [(i, msg) for (i, msg) in enumerate(map(check, values))
+                if msg is not None]
+
 yang_type_specs = {
    'int8': IntTypeSpec('int8', -128, 127),
    'int16': IntTypeSpec('int16', -32768, 32767),
@@ -1,9 +1,8 @@
+import collections
 import os.path
 import sys
 from numbers import Integral as int_types
 
-from .error import err_add
-
 
 def attrsearch(tag, attr, in_list):
     for x in in_list:
@@ -78,6 +77,8 @@ def prefix_to_modulename_and_revision(module, prefix, pos, errors):
         (modulename, revision) = module.i_prefixes[prefix]
     except KeyError:
         if prefix not in module.i_missing_prefixes:
+            # imported here, since the error module uses this module
+            from .error import err_add
             err_add(errors, pos, 'PREFIX_NOT_DEFINED', prefix)
         module.i_missing_prefixes[prefix] = True
         return None, None
@@ -144,8 +145,29 @@ def report_file_read(filename, extra=None):
     files_read[realpath] = True
 
 
+_data_node_skip = ('choice', 'case', 'input', 'output')
+"""Keywords of the schema nodes which are not data nodes"""
+
 def search_data_node(children, modulename, identifier, last_skipped = None):
-    skip = ['choice', 'case', 'input', 'output']
+    if isinstance(children, ChildList) and (last_skipped is None or
+                                            last_skipped in _data_node_skip):
+        (by_name, skipped) = children.get_index()
+        # same result as the scan below: the first matching data node,
+        # unless a choice, case, input or output before it has a match
+        res = None
+        for pos, child in by_name.get((modulename, identifier), ()):
+            if (child.keyword not in _data_node_skip and
+                child.i_module.i_modulename == modulename):
+                (res, res_pos) = (child, pos)
+                break
+        for pos, child in skipped:
+            if res is not None and pos > res_pos:
+                break
+            r = search_data_node(child.i_children, modulename, identifier)
+            if r is not None:
+                return r
+        return res
+    skip = list(_data_node_skip)
     if last_skipped is not None:
         skip.append(last_skipped)
     for child in children:
@@ -174,3 +196,175 @@ def data_node_up(node):
     if p and p.keyword in skip:
         return closest_ancestor_data_node(p)
     return p
+
+
+class IndexedList(list):
+    """A list which keeps an index of its items.
+
+    The index is built by get_index() when it is first needed.  It is
+    kept up to date when an item is appended, and dropped when the
+    list is changed in any other way.  The index is not copied with
+    the list.
+
+    Subclasses define _new_index(), which returns an empty index, and
+    _add_to_index(position, item).
+    """
+
+    __slots__ = ('_index',)
+
+    def __init__(self, *args):
+        list.__init__(self, *args)
+        self._index = None
+
+    def __copy__(self):
+        return self.__class__(self)
+
+    def __reduce_ex__(self, protocol):
+        return (self.__class__, (list(self),))
+
+    def get_index(self):
+        if self._index is None:
+            self._index = self._new_index()
+            for pos, item in enumerate(self):
+                self._add_to_index(pos, item)
+        return self._index
+
+    def _new_index(self):
+        raise NotImplementedError
+
+    def _add_to_index(self, pos, item):
+        raise NotImplementedError
+
+    def _drop_index(self):
+        self._index = None
+
+    def append(self, item):
+        if self._index is not None:
+            self._add_to_index(len(self), item)
+        list.append(self, item)
+
+    def _modified(method):
+        def modify(self, *args, **kwargs):
+            self._drop_index()
+            return method(self, *args, **kwargs)
+        modify.__name__ = method.__name__
+        modify.__doc__ = method.__doc__
+        return modify
+
+    extend = _modified(list.extend)
+    insert = _modified(list.insert)
+    remove = _modified(list.remove)
+    pop = _modified(list.pop)
+    clear = _modified(list.clear)
+    sort = _modified(list.sort)
+    reverse = _modified(list.reverse)
+    __setitem__ = _modified(list.__setitem__)
+    __delitem__ = _modified(list.__delitem__)
+    __iadd__ = _modified(list.__iadd__)
+    __imul__ = _modified(list.__imul__)
+    del _modified
+
+
+class ChildList(IndexedList):
+    """A list of child statements, used for i_children.
+
+    Keeps an index of the children by module name and argument.  The
+    arguments and the modules of the children must not be changed
+    while they are in the list.
+    """
+
+    __slots__ = ('_arg_index',)
+
+    def __init__(self, *args):
+        IndexedList.__init__(self, *args)
+        self._arg_index = None
+
+    def get_index(self):
+        """Return (by_name, skipped)
+
+        `by_name` is a dict of (modulename, argument):[(position,
+        child)], and `skipped` is a list of (position, child) for the
+        children which are not data nodes, i.e. choice, case, input and
+        output.  A child of a submodule is also found by the name of
+        the module which includes the submodule.
+        """
+        return IndexedList.get_index(self)
+
+    def _new_index(self):
+        return ({}, [])
+
+    def _add_to_index(self, pos, child):
+        (by_name, skipped) = self._index
+        module = child.i_module
+        by_name.setdefault((module.i_modulename, child.arg),
+                           []).append((pos, child))
+        including = getattr(module, 'i_including_modulename', None)
+        if including is not None and including != module.i_modulename:
+            by_name.setdefault((including, child.arg),
+                               []).append((pos, child))
+        if child.keyword in _data_node_skip:
+            skipped.append((pos, child))
+
+    def _drop_index(self):
+        self._index = None
+        self._arg_index = None
+
+    def children_named(self, modulename, arg):
+        """Return the children with the module name `modulename` and
+        the argument `arg`, in order"""
+        return [child for _pos, child
+                in self.get_index()[0].get((modulename, arg), ())]
+
+    def children_with_arg(self, arg):
+        """Return the children with the argument `arg`, in order"""
+        if self._arg_index is None:
+            self._arg_index = {}
+            for child in self:
+                self._arg_index.setdefault(child.arg, []).append(child)
+        return list(self._arg_index.get(arg, ()))
+
+    def append(self, child):
+        # keep the indexes up to date, children are often appended
+        # one at a time while the list is searched
+        if self._arg_index is not None:
+            self._arg_index.setdefault(child.arg, []).append(child)
+        IndexedList.append(self, child)
+
+
+class LRUCache(object):
+    """A cache which holds at most `maxsize` entries
+
+    When the cache is full, the least recently used entry is dropped.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        """number of lookups which found the key in the cache"""
+        self.misses = 0
+        """number of lookups which had to compute the value"""
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, compute):
+        """Return the value for `key`.  If it is not in the cache,
+        `compute(key)` is called and its result is stored."""
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            value = compute(key)
+            self.entries[key] = value
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+            return value
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,373 @@
+"""Watch module files and directories for changes
+
+On Linux, inotify is used through ctypes; elsewhere, or if inotify
+cannot be used, the files and directories are polled.
+"""
+
+import errno
+import io
+import os
+import select
+import struct
+import sys
+import time
+
+from . import repository
+from . import syntax
+
+
+def get_watcher(interval=0.5):
+    """Return an `InotifyWatcher` if possible, otherwise a `PollWatcher`"""
+    try:
+        return InotifyWatcher()
+    except OSError:
+        return PollWatcher(interval)
+
+
+class ModuleUpdater(object):
+    """Keeps the modules in a context up to date with their files
+
+    `filenames` are the files of the primary modules, and
+    `deviations` the files of the deviation modules.  The primary
+    modules are added to the context with add_primary_module(filename,
+    text).  The directories of the repository of the context are
+    watched, and their subdirectories unless `no_path_recurse` is
+    True.
+    """
+
+    def __init__(self, ctx, filenames, deviations, add_primary_module,
+                 no_path_recurse=False):
+        self.ctx = ctx
+        self.filenames = filenames
+        self.deviations = deviations
+        self.add_primary_module = add_primary_module
+        self.no_path_recurse = no_path_recurse
+
+    def run(self, watcher, revalidate):
+        """Wait for changes with `watcher`, and update the modules
+
+        After each change, revalidate(modules, start) is called with
+        the primary modules, and the time the change was seen.  Never
+        returns.
+        """
+        dirs = self.get_dirs()
+        while True:
+            watcher.watch(self.get_files(), dirs)
+            (changed, dirs_changed) = watcher.wait()
+            start = time.time()
+            if dirs_changed:
+                dirs = self.get_dirs()
+            revalidate(self.update(changed, dirs_changed), start)
+
+    def get_dirs(self):
+        """Return the directories to watch"""
+        dirs = []
+        for d in self.ctx.repository.dirs:
+            if d == '.' or self.no_path_recurse:
+                dirs.append(d)
+            else:
+                dirs.extend(repository.scan_directory(d)[1])
+        return [os.path.abspath(d) for d in dirs]
+
+    def get_files(self):
+        """Return the files to watch"""
+        files = set(os.path.abspath(f)
+                    for f in self.filenames + self.deviations)
+        for m in self.ctx.modules.values():
+            if m is not None and os.path.isfile(m.pos.ref):
+                files.add(os.path.abspath(m.pos.ref))
+        return files
+
+    def update(self, changed, dirs_changed):
+        """Update the context from the `changed` files, and return the
+        primary modules
+
+        If `dirs_changed` is True, modules may have been added to or
+        removed from the repository.  The updated modules, and the
+        modules affected by them, are left to be validated.
+        """
+        ctx = self.ctx
+        if dirs_changed:
+            # modules may have been added or removed, start over
+            ctx.repository.rescan()
+            ctx.del_modules([m for m in ctx.modules.values()
+                             if m is not None and m not in ctx.sources])
+            for m in list(ctx.sources):
+                if m in ctx.sources and m.i_is_validated:
+                    ctx.update_module(m, ctx.sources[m][1])
+            ctx.reset_revs(rescan=True)
+        sources = {}
+        for m, args in ctx.sources.items():
+            sources[os.path.abspath(args[0])] = m
+        loaded = {}
+        for m in ctx.modules.values():
+            if m is not None:
+                loaded.setdefault(os.path.abspath(m.pos.ref), []).append(m)
+        for filename in self.filenames + self.deviations:
+            f = os.path.abspath(filename)
+            if f in changed and f not in sources:
+                # it could not be read or parsed before
+                text = _read_file(filename)
+                if text is None:
+                    continue
+                self._forget_errors(f)
+                if filename in self.filenames:
+                    self.add_primary_module(filename, text)
+                else:
+                    m = ctx.add_module(filename, text)
+                    if m is not None:
+                        ctx.deviation_modules.append(m)
+        for f in changed:
+            m = sources.get(f)
+            if m is not None:
+                text = _read_file(f)
+                if text is not None and text == ctx.sources[m][1]:
+                    continue
+                self._forget_errors(f)
+                if text is None:
+                    ctx.del_modules([m])
+                    if m in ctx.deviation_modules:
+                        ctx.deviation_modules.remove(m)
+                else:
+                    ctx.update_module(m, text)
+            elif f in loaded:
+                # a module found in the repository
+                self._forget_errors(f)
+                ctx.del_modules(loaded[f])
+                ctx.reset_revs(set(m.arg for m in loaded[f]), rescan=True)
+        primary = {}
+        for m, args in ctx.sources.items():
+            if args[6]:
+                primary[os.path.abspath(args[0])] = m
+        return [primary[os.path.abspath(f)] for f in self.filenames
+                if os.path.abspath(f) in primary]
+
+    def _forget_errors(self, filename):
+        """Remove the errors in `filename` from the context
+
+        They are found again when the file is parsed and validated.  A
+        file which could not be parsed has no module, so its errors
+        are not removed with the modules.
+        """
+        errors = self.ctx.errors
+        errors[:] = [e for e in errors
+                     if os.path.abspath(e[0].ref) != filename]
+
+
+class Watcher(object):
+    """Base class for watchers
+
+    A watcher is given the files to watch, and the directories whose
+    modules are watched.  A file is changed if it is written, replaced,
+    or removed.  A directory is changed if a module file or a
+    subdirectory is added to or removed from it.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.dirs = {}
+
+    def watch(self, files, dirs):
+        """Set the `files` and the directories `dirs` to watch"""
+        self.files = dict((f, _stat(f)) for f in files)
+        self.dirs = dict((d, _list_dir(d)) for d in dirs)
+
+    def wait(self):
+        """Wait until a watched file or directory changes
+
+        Returns (`files`, `dirs_changed`), where `files` is the set of
+        changed files, and `dirs_changed` is True if a watched
+        directory has changed.
+        """
+        while True:
+            (files, dirs) = self._wait_events()
+            changed = set()
+            for f in files:
+                st = _stat(f)
+                if f in self.files and st != self.files[f]:
+                    self.files[f] = st
+                    changed.add(f)
+            dirs_changed = False
+            for d in dirs:
+                entries = _list_dir(d)
+                if d in self.dirs and entries != self.dirs[d]:
+                    self.dirs[d] = entries
+                    dirs_changed = True
+            if changed or dirs_changed:
+                return changed, dirs_changed
+
+    def _wait_events(self):
+        """Return the files and directories which might have changed"""
+        raise NotImplementedError
+
+
+class PollWatcher(Watcher):
+    """Watches by checking the status of all files every `interval` s"""
+
+    def __init__(self, interval=0.5):
+        Watcher.__init__(self)
+        self.interval = interval
+        self.dir_stats = {}
+
+    def watch(self, files, dirs):
+        Watcher.watch(self, files, dirs)
+        self.dir_stats = dict((d, _stat(d)) for d in dirs)
+
+    def _wait_events(self):
+        while True:
+            time.sleep(self.interval)
+            files = [f for f in self.files if _stat(f) != self.files[f]]
+            dirs = []
+            for d in self.dirs:
+                st = _stat(d)
+                if st != self.dir_stats[d]:
+                    self.dir_stats[d] = st
+                    dirs.append(d)
+            if files or dirs:
+                return files, dirs
+
+
+# from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+_event_header = struct.Struct('iIII')
+
+
+class InotifyWatcher(Watcher):
+    """Watches by waiting for inotify events in the parent directories
+
+    Raises OSError if inotify is not available.
+    """
+
+    # wait this long for more events after the first one, so that
+    # all the writes done by one save are handled together
+    settle_time = 0.05
+
+    def __init__(self):
+        Watcher.__init__(self)
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, 'inotify is only available on Linux')
+        import ctypes
+        import ctypes.util
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                               use_errno=True)
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+            init1 = libc.inotify_init1
+        except AttributeError:
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                    ctypes.c_uint32]
+        self.fd = init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._ctypes = ctypes
+        self.wds = {}
+        """dict of wd:directory"""
+
+    def watch(self, files, dirs):
+        Watcher.watch(self, files, dirs)
+        wanted = set(self.dirs)
+        for f in self.files:
+            wanted.add(os.path.dirname(f) or '.')
+        for wd, d in list(self.wds.items()):
+            if d not in wanted:
+                self._rm_watch(self.fd, wd)
+                del self.wds[wd]
+        watched = set(self.wds.values())
+        mask = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF |
+                IN_ONLYDIR)
+        for d in wanted - watched:
+            wd = self._add_watch(self.fd, os.fsencode(d), mask)
+            if wd >= 0:
+                self.wds[wd] = d
+
+    def _wait_events(self):
+        files = set()
+        dirs = set()
+        timeout = None
+        while True:
+            (ready, _, _) = select.select([self.fd], [], [], timeout)
+            if not ready:
+                if files or dirs:
+                    return files, dirs
+                continue
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                continue
+            i = 0
+            while i < len(data):
+                (wd, mask, _cookie, length) = _event_header.unpack_from(data, i)
+                i += _event_header.size
+                name = data[i:i + length].rstrip(b'\0')
+                i += length
+                if mask & IN_Q_OVERFLOW:
+                    # events were lost, check everything
+                    files.update(self.files)
+                    dirs.update(self.dirs)
+                    continue
+                d = self.wds.get(wd)
+                if d is None:
+                    continue
+                if not name:
+                    # the directory itself was removed or moved
+                    dirs.add(d)
+                    files.update(f for f in self.files
+                                 if os.path.dirname(f) == d)
+                    continue
+                path = os.path.join(d, os.fsdecode(name))
+                if path in self.files:
+                    files.add(path)
+                if d in self.dirs:
+                    dirs.add(d)
+            timeout = self.settle_time
+
+
+def _read_file(filename):
+    try:
+        with io.open(filename, "r", encoding="utf-8") as fd:
+            return fd.read()
+    except IOError as ex:
+        sys.stderr.write("error %s: %s\n" % (filename, ex))
+    except UnicodeDecodeError as ex:
+        s = str(ex).replace('utf-8', 'utf8')
+        sys.stderr.write("%s: unicode error: %s\n" % (filename, s))
+    return None
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    except OSError:
+        return None
+
+
+def _list_dir(d):
+    """Return the set of module files and subdirectories in `d`"""
+    entries = set()
+    try:
+        with os.scandir(d) as it:
+            for entry in it:
+                if entry.is_dir():
+                    entries.add(entry.name + os.sep)
+                elif syntax.re_filename.search(entry.name) is not None:
+                    entries.add(entry.name)
+    except OSError:
+        return None
+    return entries
@@ -58,19 +58,18 @@ def add_extra_xpath_function(name, input_params, output_param):
 def add_prefix(prefix, s):
     "Add `prefix` to all unprefixed names in `s`"
     # tokenize the XPath expression
-    toks = xpath_lexer.scan(s)
-    # add default prefix to unprefixed names
-    toks2 = [_add_prefix(prefix, tok) for tok in toks]
-    # build a string of the patched expression
-    ls = [x.value for x in toks2]
+    toks = xpath_lexer.tokens(s)
+    # build a string of the patched expression, with the default
+    # prefix added to unprefixed names
+    ls = [_add_prefix(prefix, tok) for tok in toks]
     return ''.join(ls)
 
 def _add_prefix(prefix, tok):
     if tok.type == 'name':
         m = xpath_lexer.re_ncname.match(tok.value)
         if m.group(2) is None:
-            tok.value = prefix + ':' + tok.value
-    return tok
+            return prefix + ':' + tok.value
+    return tok.value
 
 ## TODO: validate must/when after deviate
 
@@ -1,12 +1,14 @@
 """XPath 1.0 lexer / scanner
 
-Used with the PLY-based parser xpath_parser.py.
+Used with the parser xpath_parser.py.
 
 See http://www.w3.org/TR/1999/REC-xpath-19991116
 """
 
 import re
 
+from . import util
+
 class XPathError(Exception):
     def __init__(self, msg, line, pos):
         self.msg = msg
@@ -20,27 +22,6 @@ class XPathTok(object):
         self.lineno = line
         self.lexpos = pos
 
-class XPathLexer(object):
-    def input(self, s):
-        self.toks = []
-        self.error = None
-        try:
-            self.toks = scan(s)
-        except SyntaxError as e:
-            self.error = e
-
-    def token(self):
-        while len(self.toks) > 0:
-            tok = self.toks[0]
-            self.toks = self.toks[1:]
-            if tok.type != '_whitespace':
-                return tok
-
-        if self.error is not None:
-            raise self.error
-        else:
-            return None
-
 # not 100% XPath / XML, but good enough for YANG
 namestr=r'[a-zA-Z_][a-zA-Z0-9_\-.]*'
 ncnamestr = '((' + namestr + '):)?(' + namestr + ')'
@@ -90,25 +71,20 @@ operators = {
     'mod': 'MOD',
 }
 
-meta_tokens = ['node_type', 'axis', 'function_name', 'wildcard']
-
 node_types = [ 'comment', 'text', 'processing-instruction', 'node' ]
 axes = [ 'ancestor-or-self', 'ancestor', 'attribute', 'child',
          'descendant-or-self', 'descendant', 'following-sibling',
          'following', 'namespace', 'parent', 'preceding-sibling',
          'preceding', 'self' ]
 
-def token_defs():
-    toks = [p[0] for p in patterns]
-    toks.extend(meta_tokens)
-    toks.extend([operators[op] for op in operators])
-    # remove spc
-    toks.remove('_whitespace')
-    return toks
-
 re_open_para = re.compile(r'\s*\(')
 re_axis = re.compile(r'\s*::')
 
+# all patterns in one regexp; the alternatives are tried in order, so
+# the first pattern which matches is used
+re_token = re.compile('|'.join('(?P<%s>%s)' % (tokname, r.pattern)
+                               for tokname, r in patterns))
+
 def scan(s):
     """Return a list of tokens, or throw SyntaxError on failure.
     """
@@ -117,63 +93,72 @@ def scan(s):
     pos = 0
     toks = []
     while pos < len(s):
-        matched = False
-        for tokname, r in patterns:
-            m = r.match(s, pos)
-            if m is not None:
-                # found a matching token
-                v = m.group(0)
-                prec = _preceding_token(toks)
-                if tokname == 'STAR' and prec is not None and _is_special(prec):
-                    # XPath 1.0 spec, 3.7 special rule 1a
-                    # interpret '*' as a wildcard
-                    tok = XPathTok('wildcard', v, line, linepos)
-                elif (tokname == 'name' and
-                      prec is not None and not _is_special(prec) and
-                      v in operators):
-                    # XPath 1.0 spec, 3.7 special rule 1b
-                    # interpret the name as an operator
-                    tok = XPathTok(operators[v], v, line, linepos)
-                elif tokname == 'name':
-                    # check if next token is '('
-                    if re_open_para.match(s, pos + len(v)):
-                        # XPath 1.0 spec, 3.7 special rule 2
-                        if v in node_types:
-                            # XPath 1.0 spec, 3.7 special rule 2a
-                            tok = XPathTok('node_type', v, line, linepos)
-                        else:
-                            # XPath 1.0 spec, 3.7 special rule 2b
-                            tok = XPathTok('function_name', v, line, linepos)
-                    # check if next token is '::'
-                    elif re_axis.match(s, pos + len(v)):
-                        # XPath 1.0 spec, 3.7 special rule 3
-                        if v in axes:
-                            tok = XPathTok('axis', v, line, linepos)
-                        else:
-                            e = "unknown axis %s" % v
-                            raise XPathError(e, line, linepos)
-                    else:
-                        tok = XPathTok('name', v, line, linepos)
-                else:
-                    tok = XPathTok(tokname, v, line, linepos)
-                if tokname == '_whitespace':
-                    n = v.count('\n')
-                    if n > 0:
-                        line = line + n
-                        linepos = len(v) - v.rfind('\n')
-                    else:
-                        linepos += len(v)
-                else:
-                    linepos += len(v)
-                pos += len(v)
-                toks.append(tok)
-                matched = True
-                break
-        if not matched:
+        m = re_token.match(s, pos)
+        if m is None:
             # no patterns matched
             raise XPathError('syntax error', line, linepos)
+        # found a matching token
+        tokname = m.lastgroup
+        v = m.group(0)
+        prec = _preceding_token(toks)
+        if tokname == 'STAR' and prec is not None and _is_special(prec):
+            # XPath 1.0 spec, 3.7 special rule 1a
+            # interpret '*' as a wildcard
+            tok = XPathTok('wildcard', v, line, linepos)
+        elif (tokname == 'name' and
+              prec is not None and not _is_special(prec) and
+              v in operators):
+            # XPath 1.0 spec, 3.7 special rule 1b
+            # interpret the name as an operator
+            tok = XPathTok(operators[v], v, line, linepos)
+        elif tokname == 'name':
+            # check if next token is '('
+            if re_open_para.match(s, pos + len(v)):
+                # XPath 1.0 spec, 3.7 special rule 2
+                if v in node_types:
+                    # XPath 1.0 spec, 3.7 special rule 2a
+                    tok = XPathTok('node_type', v, line, linepos)
+                else:
+                    # XPath 1.0 spec, 3.7 special rule 2b
+                    tok = XPathTok('function_name', v, line, linepos)
+            # check if next token is '::'
+            elif re_axis.match(s, pos + len(v)):
+                # XPath 1.0 spec, 3.7 special rule 3
+                if v in axes:
+                    tok = XPathTok('axis', v, line, linepos)
+                else:
+                    e = "unknown axis %s" % v
+                    raise XPathError(e, line, linepos)
+            else:
+                tok = XPathTok('name', v, line, linepos)
+        else:
+            tok = XPathTok(tokname, v, line, linepos)
+        if tokname == '_whitespace':
+            n = v.count('\n')
+            if n > 0:
+                line = line + n
+                linepos = len(v) - v.rfind('\n')
+            else:
+                linepos += len(v)
+        else:
+            linepos += len(v)
+        pos += len(v)
+        toks.append(tok)
     return toks
 
+token_cache = util.LRUCache(10000)
+"""Cache of the tokens of expressions, used by `tokens()`"""
+
+def tokens(s):
+    """Return a tuple of the tokens in `s`, like scan().
+
+    The result is cached, so the tokens must not be modified.
+    """
+    return token_cache.get(s, _scan_tuple)
+
+def _scan_tuple(s):
+    return tuple(scan(s))
+
 def _preceding_token(toks):
     if len(toks) > 1 and toks[-1].type == '_whitespace':
         return toks[-2]
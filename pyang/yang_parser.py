@@ -2,22 +2,50 @@
 
 The parser does not check any keywords or grammar.
 """
-import collections
+import copy
+import re
 import sys
 from . import error
 from . import util
 from . import statements
 from . import syntax
 
+# line breaks as recognized by str.splitlines()
+_re_line_break = re.compile('\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]')
+_re_whitespace = re.compile(r'\s*')
+_re_unquoted_end = re.compile(r"""[\s;"'{}]|//|/\*|\*/""")
+_re_dquote_special = re.compile(r'["\\]')
+
+_uninterned_keywords = frozenset(['description', 'reference', 'contact',
+                                  'organization'])
+"""Keywords whose arguments are not interned.
+
+The arguments of all other statements, e.g. identifiers, type names
+and values, are interned, so that equal arguments share one string."""
+
 class YangTokenizer(object):
+    """Tokenizer for YANG text.
+
+    The tokenizer scans the text as one buffer, with `i` as the cursor.
+    The text is consumed line by line, where the current line is
+    text[line_start:eol]; `pos.line` is updated when a new line is
+    read.
+    """
+
     def __init__(self, text, pos, errors,
                  max_line_len=None, keep_comments=False,
                  strict_quoting = False):
-        self.lines = collections.deque(text.splitlines(True))
+        self.text = text
+        self.line_ends = [m.end() for m in _re_line_break.finditer(text)]
+        """end index (exclusive) of each line, including the line break"""
+        if len(text) > (self.line_ends[-1] if self.line_ends else 0):
+            self.line_ends.append(len(text))
+        self.lineno = 0
+        """number of lines read"""
         self.pos = pos
-        self.buf = ''
-        self.offset = 0
-        """Position on line.  Used to remove leading whitespace from strings."""
+        self.i = 0
+        self.line_start = 0
+        self.eol = 0
 
         self.max_line_len = max_line_len
         if self.max_line_len == 0:
@@ -31,16 +59,23 @@ class YangTokenizer(object):
         self.is_1_1 = False
         self.strict_quoting = strict_quoting
 
+    @property
+    def offset(self):
+        """Position on line.  Used to remove leading whitespace from strings."""
+        return self.i - self.line_start
+
     def readline(self):
-        if len(self.lines) == 0:
+        if self.lineno == len(self.line_ends):
             raise error.Eof
-        self.buf = self.lines.popleft()
+        self.line_start = self.i = self.eol
+        self.eol = self.line_ends[self.lineno]
+        self.lineno += 1
         self.pos.line += 1
-        self.offset = 0
         if self.max_line_len is not None:
-            curlen = len(self.buf)
-            if curlen >= 1 and self.buf[-1] == '\n':
-                if curlen >= 2 and self.buf[-2] == '\r':
+            curlen = self.eol - self.line_start
+            text = self.text
+            if curlen >= 1 and text[self.eol-1] == '\n':
+                if curlen >= 2 and text[self.eol-2] == '\r':
                     curlen -= 2
                 else:
                     curlen -= 1
@@ -48,38 +83,35 @@ class YangTokenizer(object):
                 error.err_add(self.errors, self.pos, 'LONG_LINE',
                               (curlen, self.max_line_len))
 
-    def set_buf(self, i):
-        self.offset = self.offset + i
-        self.buf = self.buf[i:]
-
     def skip(self, keep_comments=False):
         """Skip whitespace and count position"""
-        buflen = len(self.buf)
-
+        text = self.text
         while True:
-            self.buf = self.buf.lstrip()
-            if self.buf == '':
-                self.readline()
-                buflen = len(self.buf)
+            i = self.i
+            if i < self.eol and not text[i].isspace():
+                # fast path; nothing to skip
+                if text[i] != '/' or keep_comments:
+                    return
             else:
-                self.offset += (buflen - len(self.buf))
-                break
-
-        # do not keep comments in the syntax tree
-        if not keep_comments:
-            # skip line comment
-            if self.buf[0] == '/':
-                if self.buf[1] == '/':
+                i = self.i = _re_whitespace.match(text, i, self.eol).end()
+                if i == self.eol:
                     self.readline()
-                    return self.skip(keep_comments=keep_comments)
+                    continue
+                if text[i] != '/' or keep_comments:
+                    return
+            # do not keep comments in the syntax tree
+            # skip line comment
+            if text[i+1] == '/':
+                self.readline()
             # skip block comment
-                elif self.buf[1] == '*':
-                    i = self.buf.find('*/')
-                    while i == -1:
-                        self.readline()
-                        i = self.buf.find('*/')
-                    self.set_buf(i+2)
-                    return self.skip(keep_comments=keep_comments)
+            elif text[i+1] == '*':
+                i = text.find('*/', i, self.eol)
+                while i == -1:
+                    self.readline()
+                    i = text.find('*/', self.i, self.eol)
+                self.i = i + 2
+            else:
+                return
 
     def get_comment(self, last_line):
         """ret: string()"""
@@ -87,57 +119,62 @@ class YangTokenizer(object):
         is_line_end = False
         self.skip(keep_comments=True)
         offset = self.offset
-        m = syntax.re_comment.match(self.buf)
+        text = self.text
+        m = syntax.re_comment.match(text, self.i, self.eol)
         if m is None:
             return None, is_line_end, is_multi_line
         else:
             cmt = m.group(0)
-            self.set_buf(m.end())
+            self.i = m.end()
             is_line_end = (last_line == self.pos.line)
             # look for a multiline comment
             if cmt[:2] == '/*' and cmt[-2:] != '*/':
-                i = self.buf.find('*/')
+                i = text.find('*/', self.i, self.eol)
                 is_multi_line = True
                 while i == -1:
                     self.readline()
                     # remove at most the same number of whitespace as
                     # the comment start was indented
-                    j = 0
-                    while (j < offset and j < len(self.buf) and
-                           self.buf[j].isspace()):
+                    j = self.i
+                    while (j < self.line_start + offset and j < self.eol and
+                           text[j].isspace()):
                         j = j + 1
-                    self.buf = self.buf[j:]
-                    cmt += '\n'+self.buf.replace('\n','')
-                    i = self.buf.find('*/')
-                self.set_buf(i+2)
+                    # the removed whitespace does not count as position
+                    # on the line
+                    self.line_start = self.i = j
+                    cmt += '\n' + text[j:self.eol].replace('\n', '')
+                    i = text.find('*/', self.i, self.eol)
+                self.i = i + 2
             return cmt, is_line_end, is_multi_line
 
     def get_keyword(self):
         """ret: identifier | (prefix, identifier)"""
         self.skip()
 
-        m = syntax.re_keyword.match(self.buf)
+        text = self.text
+        m = syntax.re_keyword.match(text, self.i, self.eol)
         if m is None:
             error.err_add(self.errors, self.pos,
-                          'SYNTAX_ERROR', 'illegal keyword: ' + self.buf)
+                          'SYNTAX_ERROR',
+                          'illegal keyword: ' + text[self.i:self.eol])
             raise error.Abort
         else:
-            self.set_buf(m.end())
+            i = self.i = m.end()
             # check the separator
-            if (self.buf[0].isspace() or
-                (self.buf[0] == '/' and self.buf[1] in ('/', '*')) or
-                (self.buf[0] in (';','{'))):
+            if (text[i].isspace() or
+                (text[i] == '/' and text[i+1] in ('/', '*')) or
+                (text[i] in (';','{'))):
                 pass
             else:
                 error.err_add(self.errors, self.pos,
                               'SYNTAX_ERROR', 'expected separator, got: "' +
-                              self.buf[:6] + '..."')
+                              text[i:min(i+6, self.eol)] + '..."')
                 raise error.Abort
 
             if m.group(2) is None: # no prefix
-                return m.group(3)
+                return sys.intern(m.group(3))
             else:
-                return (m.group(2), m.group(3))
+                return (sys.intern(m.group(2)), sys.intern(m.group(3)))
 
     def peek(self):
         """Return next real character in input stream.
@@ -145,129 +182,144 @@ class YangTokenizer(object):
         Skips whitespace and comments, and returns next character
         without consuming it.  Use skip_tok() to consume the characater.
         """
+        i = self.i
+        if i < self.eol:
+            c = self.text[i]
+            if c != '/' and not c.isspace():
+                return c
         self.skip(self.keep_comments)
         try:
-            return self.buf[0]
+            return self.text[self.i]
         except:
             raise error.Eof
 
     def skip_tok(self):
+        i = self.i
+        if i < self.eol:
+            c = self.text[i]
+            if c != '/' and not c.isspace():
+                self.i = i + 1
+                return
         self.skip(self.keep_comments)
-        self.set_buf(1)
+        self.i += 1
 
     def get_strings(self, need_quote=False):
         """ret: string"""
         self.skip()
 
-        if self.buf[0] == ';' or self.buf[0] == '{' or self.buf[0] == '}':
+        text = self.text
+        if text[self.i] in (';', '{', '}'):
             error.err_add(self.errors, self.pos,
-                          'EXPECTED_ARGUMENT', self.buf[0])
+                          'EXPECTED_ARGUMENT', text[self.i])
             raise error.Abort
-        if self.buf[0] == '"' or self.buf[0] == "'":
+        if text[self.i] == '"' or text[self.i] == "'":
             # for double-quoted string,  loop over string and translate
             # escaped characters.  also strip leading whitespace as
             # necessary.
             # for single-quoted string, keep going until end quote is found.
-            quote_char = self.buf[0]
+            quote_char = text[self.i]
             # collect output in strs (list of strings)
             strs = []
             res = []
             # remember position of " character
             indentpos = self.offset
-            i = 1
+            # start of the current line's part of the string
+            linebase = self.i
+            i = self.i + 1
             while True:
-                buflen = len(self.buf)
+                eol = self.eol
                 start = i
-                while i < buflen:
-                    if self.buf[i] == quote_char:
-                        # end-of-string; copy the buf to output
-                        res.append(self.buf[start:i])
+                while True:
+                    if quote_char == '"':
+                        m = _re_dquote_special.search(text, i, eol)
+                        i = eol if m is None else m.start()
+                    else:
+                        i = text.find(quote_char, i, eol)
+                        if i == -1:
+                            i = eol
+                    if i == eol:
+                        break
+                    if text[i] == quote_char:
+                        # end-of-string; copy the text to output
+                        res.append(text[start:i])
                         strs.append((''.join(res), quote_char))
-                        # and trim buf
-                        self.set_buf(i+1)
+                        self.i = i + 1
                         # check for '+' operator
                         self.skip()
-                        if self.buf[0] == '+':
-                            self.set_buf(1)
+                        if text[self.i] == '+':
+                            self.i += 1
                             self.skip()
                             nstrs = self.get_strings(need_quote=True)
                             strs.extend(nstrs)
                         return strs
-                    elif (quote_char == '"' and
-                          self.buf[i] == '\\' and i < (buflen-1)):
+                    elif i < eol - 1:
                         # check for special characters
                         special = None
-                        if self.buf[i+1] == 'n':
+                        c = text[i+1]
+                        if c == 'n':
                             special = '\n'
-                        elif self.buf[i+1] == 't':
+                        elif c == 't':
                             special = '\t'
-                        elif self.buf[i+1] == '\"':
+                        elif c == '\"':
                             special = '\"'
-                        elif self.buf[i+1] == '\\':
+                        elif c == '\\':
                             special = '\\'
                         elif self.strict_quoting and self.is_1_1:
                             error.err_add(self.errors, self.pos,
-                                          'ILLEGAL_ESCAPE', self.buf[i+1])
+                                          'ILLEGAL_ESCAPE', c)
                             raise error.Abort
                         elif self.strict_quoting:
                             error.err_add(self.errors, self.pos,
-                                          'ILLEGAL_ESCAPE_WARN', self.buf[i+1])
+                                          'ILLEGAL_ESCAPE_WARN', c)
                         if special is not None:
-                            res.append(self.buf[start:i])
+                            res.append(text[start:i])
                             res.append(special)
                             i = i + 1
                             start = i + 1
                     i = i + 1
                 # end-of-line
                 # first strip trailing whitespace in double quoted strings
-                # pre: self.buf[i-1] == '\n'
-                if i > 2 and self.buf[i-2] == '\r':
+                # pre: text[i-1] == '\n'
+                if i - linebase > 2 and text[i-2] == '\r':
                     j = i - 3
                 else:
                     j = i - 2
                 k = j
-                while j >= 0 and self.buf[j].isspace():
+                while j >= linebase and text[j].isspace():
                     j = j - 1
                 if j != k: # we found trailing whitespace
-                    s = self.buf[start:j+1] + self.buf[k+1:i]
+                    s = text[start:j+1] + text[k+1:i]
                 else:
-                    s = self.buf[start:i]
+                    s = text[start:i]
                 res.append(s)
                 self.readline()
-                i = 0
+                linebase = i = self.line_start
+                eol = self.eol
                 indent = 0
                 if quote_char == '"':
                     # skip whitespace used for indentation
-                    buflen = len(self.buf)
-                    while (i < buflen and self.buf[i].isspace() and
+                    while (i < eol and text[i].isspace() and
                            indent <= indentpos):
-                        if self.buf[i] == '\t':
+                        if text[i] == '\t':
                             indent = indent + 8
                         else:
                             indent = indent + 1
                         i = i + 1
                     if indent > indentpos + 1:
                         res.append(' ' * (indent - indentpos - 1))
-                    elif i == buflen:
+                    elif i == eol:
                         # whitespace only on this line; keep it as is
-                        i = 0
+                        i = linebase
         elif need_quote is True:
             error.err_add(self.errors, self.pos, 'EXPECTED_QUOTED_STRING', ())
             raise error.Abort
         else:
             # unquoted string
-            buflen = len(self.buf)
-            i = 0
-            while i < buflen:
-                if (self.buf[i].isspace() or self.buf[i] == ';' or
-                    self.buf[i] == '"' or self.buf[i] == "'" or
-                    self.buf[i] == '{' or self.buf[i] == '}' or
-                    self.buf[i:i+2] == '//' or self.buf[i:i+2] == '/*' or
-                    self.buf[i:i+2] == '*/'):
-                    res = self.buf[:i]
-                    self.set_buf(i)
-                    return [(res, '')]
-                i = i + 1
+            m = _re_unquoted_end.search(text, self.i, self.eol)
+            if m is not None:
+                res = text[self.i:m.start()]
+                self.i = m.start()
+                return [(res, '')]
 
 class YangParser(object):
     def __init__(self, extra=None):
@@ -281,6 +333,8 @@ class YangParser(object):
 
         self.ctx = ctx
         self.pos = error.Position(ref)
+        self.stmt_pos = None
+        """the Position shared by the statements on the current line"""
         self.last_line = 0
         self.top = None
         try:
@@ -332,18 +386,23 @@ class YangParser(object):
         else:
             argstrs = self.tokenizer.get_strings()
             arg = ''.join([a[0] for a in argstrs])
+            if keywd not in _uninterned_keywords:
+                arg = sys.intern(arg)
         # check for YANG 1.1
         if keywd == 'yang-version' and arg == '1.1':
             self.tokenizer.is_1_1 = True
             self.tokenizer.strict_quoting = True
 
-        stmt = statements.new_statement(self.top, parent, self.pos, keywd, arg)
+        stmt = statements.new_statement(self.top, parent, None, keywd, arg)
 
         if self.ctx.keep_arg_substrings and argstrs is not None:
             stmt.arg_substrings = argstrs
         if self.top is None:
             self.pos.top = stmt
             self.top = stmt
+        stmt.pos = self.stmt_pos
+        if stmt.pos is None or stmt.pos.line != self.pos.line:
+            stmt.pos = self.stmt_pos = copy.copy(self.pos)
 
         # check for substatements
         tok = self.tokenizer.peek()
@@ -363,6 +422,70 @@ class YangParser(object):
         self.last_line = self.pos.line
         return stmt
 
+_body_keywords = (
+    'extension', 'feature', 'identity', 'typedef', 'grouping', 'rpc',
+    'notification', 'deviation', 'augment', 'container', 'leaf', 'leaf-list',
+    'list', 'choice', 'anydata', 'anyxml', 'uses',
+)
+"""Keywords of the body statements of a (sub)module.
+
+According to the grammar, all revision statements come before the first
+body statement."""
+
+def scan_header(ref, text):
+    """Scan the header of the (sub)module in the YANG string `text`.
+
+    Only the statements before the first body statement are tokenized,
+    and no Statements are built.  This is much cheaper than a full parse
+    when only the name and revision of a module are needed.
+
+    Return (`keyword`, `name`, `latest_revision`), or None if the text
+    cannot be scanned.  In the latter case, the text must be parsed by
+    YangParser, which reports the errors.
+    """
+    tokenizer = YangTokenizer(text, error.Position(ref), [])
+
+    def get_arg():
+        if tokenizer.peek() in ('{', ';'):
+            return None
+        return ''.join([a[0] for a in tokenizer.get_strings()])
+
+    def skip_block():
+        tok = tokenizer.peek()
+        tokenizer.skip_tok()
+        if tok == '{':
+            while tokenizer.peek() != '}':
+                tokenizer.get_keyword()
+                get_arg()
+                skip_block()
+            tokenizer.skip_tok()
+        elif tok != ';':
+            raise error.Abort
+
+    try:
+        keyword = tokenizer.get_keyword()
+        if keyword not in ('module', 'submodule'):
+            return None
+        name = get_arg()
+        if name is None or tokenizer.peek() != '{':
+            return None
+        tokenizer.skip_tok()
+        revisions = []
+        while tokenizer.peek() != '}':
+            keywd = tokenizer.get_keyword()
+            if keywd in _body_keywords:
+                break
+            arg = get_arg()
+            if keywd == 'revision':
+                if arg is None:
+                    return None
+                revisions.append(arg)
+            skip_block()
+    except (error.Abort, error.Eof):
+        return None
+    latest_rev = max(revisions) if revisions else 'unknown'
+    return keyword, name, latest_rev
+
 # FIXME: tmp debug
 def ppkeywd(tok):
     if util.is_prefixed(tok):
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""Memory benchmark for the parsed and validated statement trees.
+
+Parses and validates the given YANG files (by default all modules in
+the modules directory of the source tree) and reports the memory
+allocated after parsing and after validation, in total and per
+statement.
+
+    bench_memory.py [-p <path>] [<file>...]
+
+The statements are counted in the `substmts` trees of all modules in
+the context, and in the `i_children` trees for the statements created
+when the groupings are expanded.
+"""
+
+import glob
+import optparse
+import os
+import sys
+import tracemalloc
+
+from pyang import context
+from pyang import plugin
+from pyang import repository
+
+
+def count_stmts(ctx):
+    """Return (#statements, #expanded statements, #statements with a
+    __dict__)"""
+    stmts = {}
+    def walk(stmt, attr):
+        stmts[id(stmt)] = stmt
+        for s in getattr(stmt, attr, ()):
+            if id(s) not in stmts:
+                walk(s, attr)
+    for m in ctx.modules.values():
+        walk(m, 'substmts')
+    nstmts = len(stmts)
+    for m in ctx.modules.values():
+        for s in getattr(m, 'i_children', ()):
+            walk(s, 'i_children')
+    ndict = len([s for s in stmts.values() if getattr(s, '__dict__', None)])
+    return (nstmts, len(stmts) - nstmts, ndict)
+
+
+def report(what, nbytes, nstmts, nexpanded, ndict):
+    print('%-10s %10.1f MB %8d stmts %8d expanded %7.0f bytes/stmt '
+          '%8d with __dict__' %
+          (what, nbytes / 1e6, nstmts, nexpanded,
+           nbytes / (nstmts + nexpanded), ndict))
+
+
+def run():
+    optparser = optparse.OptionParser(__doc__.split('\n\n')[1])
+    optparser.add_option('-p', '--path', dest='path', default=[],
+                         action='append',
+                         help='search path for the imported modules')
+    (o, args) = optparser.parse_args()
+    modulesdir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              '..', '..', 'modules')
+    if not args:
+        args = sorted(glob.glob(os.path.join(modulesdir, '*', '*.yang')))
+    path = os.pathsep.join(o.path + [modulesdir])
+
+    plugin.init([])
+    repos = repository.FileRepository(path, use_env=False)
+    ctx = context.Context(repos)
+
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    for filename in args:
+        with open(filename, encoding='utf-8') as fd:
+            ctx.add_module(filename, fd.read())
+    parsed = tracemalloc.get_traced_memory()[0] - start
+    (nstmts, _, ndict) = count_stmts(ctx)
+    report('parsed', parsed, nstmts, 0, ndict)
+
+    ctx.validate()
+    validated = tracemalloc.get_traced_memory()[0] - start
+    report('validated', validated, *count_stmts(ctx))
+    if ctx.errors:
+        sys.stderr.write('%d errors\n' % len(ctx.errors))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""Micro-benchmark for the YANG parser.
+
+Parses the given YANG files (or a generated module) a number of times
+and reports the parse time and throughput.
+
+    bench_parser.py [-n <count>] [--lines <n>] [<file>...]
+
+Without files, a module with <n> leafs is generated, both in the normal
+indented layout and with everything on one line.
+"""
+
+import optparse
+import sys
+import time
+
+from pyang import context
+from pyang import repository
+from pyang import yang_parser
+
+
+def gen_module(nleafs, one_line=False):
+    stmts = ['module bench {', '  namespace "urn:bench";', '  prefix b;']
+    for i in range(nleafs):
+        stmts.append('  leaf l%d {' % i)
+        stmts.append('    type string { length "1..255"; }')
+        if one_line:
+            stmts.append('    description "Leaf number %d.";' % i)
+        else:
+            stmts.append('    description')
+            stmts.append('      "Leaf number %d, with a description that is\n'
+                         '       continued on a second line.";' % i)
+        stmts.append('  }')
+    stmts.append('}')
+    sep = ' ' if one_line else '\n'
+    return sep.join(stmts) + '\n'
+
+
+def bench(ctx, name, text, count):
+    best = None
+    for _ in range(count):
+        t0 = time.perf_counter()
+        module = yang_parser.YangParser().parse(ctx, name, text)
+        t = time.perf_counter() - t0
+        if module is None:
+            sys.stderr.write('%s: parse failed\n' % name)
+            return
+        if best is None or t < best:
+            best = t
+    print('%-30s %9d bytes %8.3f s %8.2f MB/s' %
+          (name, len(text), best, len(text) / best / 1e6))
+
+
+def run():
+    optparser = optparse.OptionParser(__doc__.split('\n\n')[1])
+    optparser.add_option('-n', dest='count', type='int', default=3,
+                         help='number of iterations; the best is reported')
+    optparser.add_option('--lines', dest='nleafs', type='int', default=5000,
+                         help='number of leafs in the generated module')
+    (o, args) = optparser.parse_args()
+
+    ctx = context.Context(repository.FileRepository(use_env=False))
+    if args:
+        for filename in args:
+            with open(filename, encoding='utf-8') as f:
+                bench(ctx, filename, f.read(), o.count)
+    else:
+        bench(ctx, 'generated', gen_module(o.nleafs), o.count)
+        bench(ctx, 'generated, one line', gen_module(o.nleafs, True),
+              o.count)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Benchmark for the startup time of the pyang program.
+
+Runs pyang a number of times for some typical command lines and
+reports the best wall clock time for each of them.
+
+    bench_startup.py [-n <count>] [--pyang <cmd>]
+
+`pyang --help` loads all plugins, and is included for comparison with
+the command lines which only load the plugins they use.
+"""
+
+import optparse
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+MODULE = '''module bench {
+  namespace "urn:bench";
+  prefix b;
+  container c {
+    leaf l { type string; }
+  }
+}
+'''
+
+
+def bench(pyang, args, count, cwd):
+    best = None
+    for _ in range(count):
+        t0 = time.perf_counter()
+        p = subprocess.run(pyang + args, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.PIPE, cwd=cwd)
+        t = time.perf_counter() - t0
+        if p.returncode != 0:
+            sys.stderr.write('%s failed: %s\n' %
+                             (' '.join(args), p.stderr.decode('utf-8')))
+            return
+        if best is None or t < best:
+            best = t
+    print('%-30s %8.3f s' % (' '.join(args), best))
+
+
+def run():
+    optparser = optparse.OptionParser(__doc__.split('\n\n')[1])
+    optparser.add_option('-n', dest='count', type='int', default=5,
+                         help='number of iterations; the best is reported')
+    optparser.add_option('--pyang', dest='pyang',
+                         default=os.environ.get('PYANG', 'pyang'),
+                         help='command to run pyang')
+    (o, args) = optparser.parse_args()
+    pyang = shlex.split(o.pyang)
+
+    with tempfile.TemporaryDirectory() as d:
+        with open(os.path.join(d, 'bench.yang'), 'w', encoding='utf-8') as f:
+            f.write(MODULE)
+        bench(pyang, ['--version'], o.count, d)
+        bench(pyang, ['bench.yang'], o.count, d)
+        bench(pyang, ['-f', 'tree', 'bench.yang'], o.count, d)
+        bench(pyang, ['--help'], o.count, d)
+
+
+if __name__ == '__main__':
+    run()
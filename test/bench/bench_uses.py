@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""Benchmark for the memory and time used to expand groupings.
+
+Generates a module with a grouping of a number of leafs, which is used
+a number of times, and reports the memory allocated after validation
+and the time used to validate it.  The module is validated with the
+substatements in `statements._uses_nocopy_keywords` shared between the
+grouping and its expanded copies, and, for comparison, with only the
+substatements which were shared before description, reference, units,
+presence, status and ordered-by were added to the list.
+
+    bench_uses.py [--leafs <n>] [--uses <n>]
+"""
+
+import gc
+import optparse
+import time
+import tracemalloc
+
+from pyang import context
+from pyang import plugin
+from pyang import repository
+from pyang import statements
+
+OLD_NOCOPY = ['type', 'uses', 'unique', 'if-feature', 'typedef', 'grouping']
+
+
+def make_module(nleafs, nuses):
+    lines = ['module bench {', '  namespace "urn:bench";', '  prefix b;',
+             '  grouping g {']
+    for i in range(nleafs):
+        lines.extend([
+            '    leaf l%d {' % i,
+            '      type uint32;',
+            '      units "seconds";',
+            '      status current;',
+            '      description "The leaf number %d of the grouping.";' % i,
+            '      reference "RFC 7950, section 7.6";',
+            '    }'])
+    lines.append('  }')
+    for i in range(nuses):
+        lines.extend([
+            '  container c%d {' % i,
+            '    presence "c%d is used";' % i,
+            '    uses g;',
+            '  }'])
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def bench(what, text):
+    gc.collect()
+    repos = repository.FileRepository('', use_env=False)
+    ctx = context.Context(repos)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    ctx.add_module('bench.yang', text)
+    ctx.validate()
+    t = time.perf_counter() - t0
+    nbytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    if ctx.errors:
+        raise SystemExit('validation failed')
+    print('%-8s %10.1f MB %8.3f s' % (what, nbytes / 1e6, t))
+
+
+def run():
+    optparser = optparse.OptionParser(__doc__.split('\n\n')[1])
+    optparser.add_option('--leafs', dest='leafs', type='int', default=40,
+                         help='number of leafs in the grouping')
+    optparser.add_option('--uses', dest='uses', type='int', default=300,
+                         help='number of uses of the grouping')
+    (o, args) = optparser.parse_args()
+
+    plugin.init([])
+    text = make_module(o.leafs, o.uses)
+    bench('shared', text)
+    nocopy = statements._uses_nocopy_keywords
+    statements._uses_nocopy_keywords = OLD_NOCOPY
+    try:
+        bench('copied', text)
+    finally:
+        statements._uses_nocopy_keywords = nocopy
+
+
+if __name__ == '__main__':
+    run()
@@ -4,10 +4,12 @@
 
 import sys
 import glob
+import optparse
 import subprocess
 
 from pyang import error
 from pyang import grammar
+from pyang import plugin
 from pyang import syntax
 
 
@@ -75,10 +77,42 @@ def chk_stmts():
     return found_error
 
 
+def chk_plugin_manifest():
+    found_error = False
+    plugin.init([])
+    for modname, info in plugin.manifest.items():
+        fmts = {}
+        xforms = {}
+        optparser = optparse.OptionParser(add_help_option=False)
+        for p in plugin.plugins:
+            if type(p).__module__ == modname:
+                p.add_output_format(fmts)
+                p.add_transform(xforms)
+                p.add_opts(optparser)
+        for kind, names in (('formats', fmts), ('transforms', xforms)):
+            if sorted(names) != sorted(info.get(kind, [])):
+                sys.stderr.write("Plugin %s adds %s %s, manifest says %s\n"
+                                 % (modname, kind, sorted(names),
+                                    sorted(info.get(kind, []))))
+                found_error = True
+        options = info.get('options', [])
+        for group in [optparser] + optparser.option_groups:
+            for option in group.option_list:
+                for opt in option._short_opts + option._long_opts:
+                    if opt not in options and not [
+                            o for o in options
+                            if o.endswith('-') and opt.startswith(o)]:
+                        sys.stderr.write("Plugin %s option %s not in "
+                                         "manifest\n" % (modname, opt))
+                        found_error = True
+    return found_error
+
+
 def main():
     return any([
         chk_error_codes(),
         chk_stmts(),
+        chk_plugin_manifest(),
     ])
 
 sys.exit(main())
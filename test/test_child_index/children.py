@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+
+# This program checks the index of the i_children lists: the children
+# are found by module name and argument, also in choices and cases,
+# the index follows the changes of the list, and it is not shared by
+# copies of the list.
+
+import copy
+import pickle
+import sys
+
+from pyang import context
+from pyang import plugin
+from pyang import repository
+from pyang import statements
+from pyang import util
+
+plugin.init([])
+ctx = context.Context(repository.FileRepository('.', use_env=False))
+for filename in sys.argv[1:]:
+    with open(filename, encoding="utf-8") as f:
+        ctx.add_module(filename, f.read())
+ctx.validate()
+if ctx.errors:
+    sys.exit('validation failed')
+
+top = ctx.get_module('a').search_one('container', 'top')
+chs = top.i_children
+
+def name(s):
+    if s is None:
+        return None
+    return '%s:%s %s' % (s.i_module.i_modulename, s.keyword, s.arg)
+
+def check(what, children):
+    """Print the search results for some names, and check that they
+    are the same as without the index"""
+    print('# %s' % what)
+    for (modulename, identifier) in (('a', 'x'), ('b', 'x'), ('b', 'w'),
+                                     ('a', 'w'), ('a', 'y'), ('a', 'z'),
+                                     ('a', 'ch'), ('a', 'n')):
+        res = (statements.search_child(children, modulename, identifier),
+               statements.search_data_node(children, modulename,
+                                           identifier))
+        plain = (statements.search_child(list(children), modulename,
+                                         identifier),
+                 statements.search_data_node(list(children), modulename,
+                                             identifier))
+        if res != plain:
+            sys.exit('%s %s:%s: %s, expected %s' %
+                     (what, modulename, identifier, res, plain))
+        print('%s:%s child %s, data node %s' %
+              (modulename, identifier, name(res[0]), name(res[1])))
+
+check('validated', chs)
+
+# the index is kept up to date when a child is appended, and dropped
+# when the list is changed otherwise
+(x, ch, n, bx, bw) = chs
+chs.get_index()
+del chs[0]
+check('del', chs)
+chs.insert(0, x)
+check('insert', chs)
+chs.remove(bx)
+check('remove', chs)
+chs.append(bx)
+check('append', chs)
+chs[0] = n
+check('setitem', chs)
+chs[0] = x
+chs.reverse()
+check('reverse', chs)
+chs.sort(key=lambda s: s.arg)
+print('sorted: %s' % ' '.join(s.arg for s in chs))
+check('sort', chs)
+chs.pop(0)
+check('pop', chs)
+chs += [ch]
+check('iadd', chs)
+print('children with arg x: %s' % ', '.join(name(s) for s in
+                                               chs.children_with_arg('x')))
+
+# the copies have their own index
+class Module(object):
+    def __init__(self, name):
+        self.i_modulename = name
+
+class Child(object):
+    def __init__(self, module, keyword, arg):
+        self.i_module = module
+        self.keyword = keyword
+        self.arg = arg
+
+m = Module('m')
+simple = util.ChildList([Child(m, 'leaf', 'p'), Child(m, 'leaf', 'q')])
+simple.get_index()
+for (what, other) in (('copy', copy.copy(simple)),
+                      ('deepcopy', copy.deepcopy(simple)),
+                      ('pickle', pickle.loads(pickle.dumps(simple)))):
+    if type(other) is not util.ChildList or other._index is not None:
+        sys.exit('%s: the index is copied' % what)
+    print('%s: %s' % (what, ' '.join(name(s) for s in other)))
+other = copy.copy(chs)
+chs.get_index()
+other.get_index()
+other.remove(x)
+check('original after a change of the copy', chs)
+check('copy', other)
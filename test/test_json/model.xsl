@@ -0,0 +1,2 @@
+<?xml version='1.0' encoding='utf-8'?>
+<stylesheet version="1.0" xmlns="http://www.w3.org/1999/XSL/Transform" xmlns:nc="urn:ietf:params:xml:ns:netconf:base:1.0" xmlns:en="urn:ietf:params:xml:ns:netconf:notification:1.0" xmlns:a="http://example.com/a" xmlns:b="http://example.com/b" xmlns:c="http://example.com/c" xmlns:inet="urn:ietf:params:xml:ns:yang:ietf-inet-types" xmlns:md="urn:ietf:params:xml:ns:yang:ietf-yang-metadata"><output method="text" /><include href="/root/package/xslt/jsonxsl-templates.xsl" /><strip-space elements="*" /><template name="nsuri-to-module"><param name="uri" /><choose><when test="$uri='http://example.com/a'"><text>amod</text></when><when test="$uri='http://example.com/b'"><text>bmod</text></when><when test="$uri='http://example.com/c'"><text>cmod</text></when><when test="$uri='urn:ietf:params:xml:ns:yang:ietf-inet-types'"><text>ietf-inet-types</text></when><when test="$uri='urn:ietf:params:xml:ns:netconf:base:1.0'"><text>ietf-netconf</text></when><when test="$uri='urn:ietf:params:xml:ns:yang:ietf-yang-metadata'"><text>ietf-yang-metadata</text></when></choose></template><template match="//nc:*/a:subtop"><call-template name="container"><with-param name="level">1</with-param><with-param name="nsid">amod:</with-param></call-template></template><template match="//nc:*/a:subtop/a:baz"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">unquoted</with-param></call-template></template><template match="//nc:*/a:subtop/b:baz"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="nsid">bmod:</with-param><with-param name="type">union</with-param><with-param name="options">integer,other,</with-param></call-template></template><template match="//nc:*/a:subtop/b:pac"><call-template name="list"><with-param name="level">2</with-param><with-param name="nsid">bmod:</with-param></call-template></template><template match="//nc:*/a:subtop/b:pac/b:k1"><call-template name="leaf"><with-param name="level">4</with-param><with-param name="type">unquoted</with-param></call-template></template><template match="//nc:*/a:subtop/b:pac/b:k2"><call-template name="leaf"><with-param name="level">4</with-param><with-param name="type">string</with-param></call-template></template><template match="//nc:*/a:subtop/b:pac/b:pusu"><call-template name="leaf"><with-param name="level">4</with-param><with-param name="type">identityref</with-param></call-template></template><template match="//nc:*/a:top"><call-template name="container"><with-param name="level">1</with-param><with-param name="nsid">amod:</with-param></call-template></template><template match="//nc:*/a:top/a:foo"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">other</with-param></call-template></template><template match="//nc:*/a:top/a:session-id"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">unquoted</with-param></call-template></template><template match="//nc:*/a:top/a:pac"><call-template name="leaf-list"><with-param name="level">2</with-param><with-param name="type">union</with-param><with-param name="options">boolean,integer,other,</with-param></call-template></template><template match="//nc:*/a:top/a:bar"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">empty</with-param></call-template></template><template match="//nc:*/a:top/a:baz"><call-template name="leaf-list"><with-param name="level">2</with-param><with-param name="type">other</with-param></call-template></template><template match="//nc:*/a:top/a:mek"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">other</with-param></call-template></template><template match="//nc:*/a:top/a:junk"><call-template name="anyxml"><with-param name="level">2</with-param></call-template></template><template match="//nc:*/a:top/a:e"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">empty</with-param></call-template></template><template match="//nc:*/a:top/b:bar"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="nsid">bmod:</with-param><with-param name="type">union</with-param><with-param name="options">integer,other,</with-param></call-template></template><template match="//nc:*/a:top/b:abar"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="nsid">bmod:</with-param><with-param name="type">instance-identifier</with-param></call-template></template><template match="@b:quux"><param name="level" select="0" /><call-template name="leaf"><with-param name="level" select="$level" /><with-param name="nsid">bmod:</with-param><with-param name="type">unquoted</with-param></call-template></template><template match="@c:idann"><param name="level" select="0" /><call-template name="leaf"><with-param name="level" select="$level" /><with-param name="nsid">cmod:</with-param><with-param name="type">identityref</with-param></call-template></template><template match="@c:iiann"><param name="level" select="0" /><call-template name="leaf"><with-param name="level" select="$level" /><with-param name="nsid">cmod:</with-param><with-param name="type">instance-identifier</with-param></call-template></template><template match="@c:strann"><param name="level" select="0" /><call-template name="leaf"><with-param name="level" select="$level" /><with-param name="nsid">cmod:</with-param><with-param name="type">string</with-param></call-template></template><template match="@c:u64ann"><param name="level" select="0" /><call-template name="leaf"><with-param name="level" select="$level" /><with-param name="nsid">cmod:</with-param><with-param name="type">other</with-param></call-template></template><template match="/nc:rpc/nc:get-config"><call-template name="rpc-input"><with-param name="nsid">ietf-netconf:</with-param></call-template></template><template match="/nc:rpc/nc:get-config/nc:source"><call-template name="container"><with-param name="level">2</with-param></call-template></template><template match="/nc:rpc/nc:get-config/nc:source/nc:candidate"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:get-config/nc:source/nc:running"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:get-config/nc:source/nc:startup"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:get-config/nc:filter"><call-template name="anyxml"><with-param name="level">2</with-param></call-template></template><template match="/nc:rpc-reply/nc:data"><call-template name="anyxml"><with-param name="level">1</with-param></call-template></template><template match="/nc:rpc/nc:edit-config"><call-template name="rpc-input"><with-param name="nsid">ietf-netconf:</with-param></call-template></template><template match="/nc:rpc/nc:edit-config/nc:target"><call-template name="container"><with-param name="level">2</with-param></call-template></template><template match="/nc:rpc/nc:edit-config/nc:target/nc:candidate"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:edit-config/nc:target/nc:running"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:edit-config/nc:default-operation"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">other</with-param></call-template></template><template match="/nc:rpc/nc:edit-config/nc:test-option"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">other</with-param></call-template></template><template match="/nc:rpc/nc:edit-config/nc:error-option"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">other</with-param></call-template></template><template match="/nc:rpc/nc:edit-config/nc:config"><call-template name="anyxml"><with-param name="level">2</with-param></call-template></template><template match="/nc:rpc/nc:edit-config/nc:url"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">string</with-param></call-template></template><template match="/nc:rpc/nc:copy-config"><call-template name="rpc-input"><with-param name="nsid">ietf-netconf:</with-param></call-template></template><template match="/nc:rpc/nc:copy-config/nc:target"><call-template name="container"><with-param name="level">2</with-param></call-template></template><template match="/nc:rpc/nc:copy-config/nc:target/nc:candidate"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:copy-config/nc:target/nc:running"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:copy-config/nc:target/nc:startup"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:copy-config/nc:target/nc:url"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">string</with-param></call-template></template><template match="/nc:rpc/nc:copy-config/nc:source"><call-template name="container"><with-param name="level">2</with-param></call-template></template><template match="/nc:rpc/nc:copy-config/nc:source/nc:candidate"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:copy-config/nc:source/nc:running"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:copy-config/nc:source/nc:startup"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:copy-config/nc:source/nc:url"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">string</with-param></call-template></template><template match="/nc:rpc/nc:copy-config/nc:source/nc:config"><call-template name="anyxml"><with-param name="level">3</with-param></call-template></template><template match="/nc:rpc/nc:delete-config"><call-template name="rpc-input"><with-param name="nsid">ietf-netconf:</with-param></call-template></template><template match="/nc:rpc/nc:delete-config/nc:target"><call-template name="container"><with-param name="level">2</with-param></call-template></template><template match="/nc:rpc/nc:delete-config/nc:target/nc:startup"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:delete-config/nc:target/nc:url"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">string</with-param></call-template></template><template match="/nc:rpc/nc:lock"><call-template name="rpc-input"><with-param name="nsid">ietf-netconf:</with-param></call-template></template><template match="/nc:rpc/nc:lock/nc:target"><call-template name="container"><with-param name="level">2</with-param></call-template></template><template match="/nc:rpc/nc:lock/nc:target/nc:candidate"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:lock/nc:target/nc:running"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:lock/nc:target/nc:startup"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:unlock"><call-template name="rpc-input"><with-param name="nsid">ietf-netconf:</with-param></call-template></template><template match="/nc:rpc/nc:unlock/nc:target"><call-template name="container"><with-param name="level">2</with-param></call-template></template><template match="/nc:rpc/nc:unlock/nc:target/nc:candidate"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:unlock/nc:target/nc:running"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:unlock/nc:target/nc:startup"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:get"><call-template name="rpc-input"><with-param name="nsid">ietf-netconf:</with-param></call-template></template><template match="/nc:rpc/nc:get/nc:filter"><call-template name="anyxml"><with-param name="level">2</with-param></call-template></template><template match="/nc:rpc-reply/nc:data"><call-template name="anyxml"><with-param name="level">1</with-param></call-template></template><template match="/nc:rpc/nc:close-session" /><template match="/nc:rpc/nc:kill-session"><call-template name="rpc-input"><with-param name="nsid">ietf-netconf:</with-param></call-template></template><template match="/nc:rpc/nc:kill-session/nc:session-id"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">unquoted</with-param></call-template></template><template match="/nc:rpc/nc:commit"><call-template name="rpc-input"><with-param name="nsid">ietf-netconf:</with-param></call-template></template><template match="/nc:rpc/nc:commit/nc:confirmed"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:commit/nc:confirm-timeout"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">unquoted</with-param></call-template></template><template match="/nc:rpc/nc:commit/nc:persist"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">string</with-param></call-template></template><template match="/nc:rpc/nc:commit/nc:persist-id"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">string</with-param></call-template></template><template match="/nc:rpc/nc:discard-changes" /><template match="/nc:rpc/nc:cancel-commit"><call-template name="rpc-input"><with-param name="nsid">ietf-netconf:</with-param></call-template></template><template match="/nc:rpc/nc:cancel-commit/nc:persist-id"><call-template name="leaf"><with-param name="level">2</with-param><with-param name="type">string</with-param></call-template></template><template match="/nc:rpc/nc:validate"><call-template name="rpc-input"><with-param name="nsid">ietf-netconf:</with-param></call-template></template><template match="/nc:rpc/nc:validate/nc:source"><call-template name="container"><with-param name="level">2</with-param></call-template></template><template match="/nc:rpc/nc:validate/nc:source/nc:candidate"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:validate/nc:source/nc:running"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:validate/nc:source/nc:startup"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">empty</with-param></call-template></template><template match="/nc:rpc/nc:validate/nc:source/nc:url"><call-template name="leaf"><with-param name="level">3</with-param><with-param name="type">string</with-param></call-template></template><template match="/nc:rpc/nc:validate/nc:source/nc:config"><call-template name="anyxml"><with-param name="level">3</with-param></call-template></template></stylesheet>
\ No newline at end of file
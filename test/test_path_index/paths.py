@@ -0,0 +1,70 @@
+#! /usr/bin/env python
+
+# This program prints the paths of the schema nodes in the given
+# modules, as kept in the path index of the context, and checks them
+# against the paths computed from statements.mk_path_list()
+
+import sys
+
+from pyang import context
+from pyang import plugin
+from pyang import repository
+from pyang import statements
+
+plugin.init([])
+ctx = context.Context(repository.FileRepository('.', use_env=False))
+for filename in sys.argv[1:]:
+    with open(filename, encoding="utf-8") as f:
+        ctx.add_module(filename, f.read())
+ctx.validate()
+if ctx.errors:
+    sys.exit('validation failed')
+
+variants = [
+    {},
+    {'with_prefixes': True},
+    {'prefix_onchange': True, 'prefix_to_module': True},
+    {'with_prefixes': True, 'resolve_top_prefix_to_module': True},
+    {'prefix_onchange': True, 'with_keys': True},
+]
+
+def mk_path_str(stmt, with_prefixes=False, prefix_onchange=False,
+                prefix_to_module=False, resolve_top_prefix_to_module=False,
+                with_keys=False):
+    elements = []
+    last_prefix = None
+    for i, (modulename, prefix, name, keys) in \
+            enumerate(statements.mk_path_list(stmt)):
+        if with_prefixes or (prefix_onchange and prefix != last_prefix):
+            if prefix_to_module or (i == 0 and resolve_top_prefix_to_module):
+                name = '%s:%s' % (modulename, name)
+            else:
+                name = '%s:%s' % (prefix, name)
+        if with_keys:
+            name += ''.join(['[%s]' % key for key in keys])
+        elements.append(name)
+        last_prefix = prefix
+    return '/' + '/'.join(elements)
+
+index = ctx.path_index
+
+def walk(stmts):
+    for s in stmts:
+        print('%s %s' % (s.keyword, s.arg))
+        for variant in variants:
+            path = statements.mk_path_str(s, **variant)
+            print('  %s' % path)
+            if path != mk_path_str(s, **variant):
+                print('  mismatch, expected %s' % mk_path_str(s, **variant))
+        if s.keyword not in ('case', 'input', 'output'):
+            path = statements.get_xpath(s, prefix_to_module=True)
+            if index.get_node(path) is not s:
+                print('  %s not found' % path)
+        walk(getattr(s, 'i_children', []))
+
+for m in ctx.modules.values():
+    walk(m.i_children)
+
+print(index.get_node('/a:top/server/transport'))
+print(index.get_node('/a:top/server/b:stats/count'))
+print(index.get_node('/a:top/server/stats'))
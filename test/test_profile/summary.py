@@ -0,0 +1,20 @@
+#! /usr/bin/env python
+
+# This program prints the phases, function calls and modules of a
+# validation profile written by --profile-validation-json, without
+# the times
+
+import json
+import sys
+
+with open(sys.argv[1], encoding="utf-8") as f:
+    profile = json.load(f)
+
+for x in sorted(profile['phases'], key=lambda x: x['phase']):
+    print('%s %d' % (x['phase'], x['count']))
+for x in sorted(profile['functions'],
+                key=lambda x: (x['phase'], x['keyword'], x['function'])):
+    print('%s %s %s %d' %
+          (x['phase'], x['keyword'], x['function'], x['calls']))
+for x in sorted(profile['modules'], key=lambda x: x['module']):
+    print('%s %s' % (x['module'], ' '.join(sorted(x['phases']))))
@@ -0,0 +1,13 @@
+"""Output plugin which fails, used to test the server's error handling"""
+
+from pyang import plugin
+
+def pyang_plugin_init():
+    plugin.register_plugin(BrokenPlugin())
+
+class BrokenPlugin(plugin.PyangPlugin):
+    def add_output_format(self, fmts):
+        fmts['broken'] = self
+
+    def emit(self, ctx, modules, fd):
+        raise RuntimeError('broken output')
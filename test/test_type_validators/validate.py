@@ -0,0 +1,41 @@
+#! /usr/bin/env python
+
+# This program validates columns of values against the leafs in a
+# module, and prints the paths of the leafs and the invalid values
+
+import sys
+
+from pyang import context
+from pyang import instance
+from pyang import plugin
+from pyang import repository
+
+plugin.init([])
+ctx = context.Context(repository.FileRepository('.', use_env=False))
+with open(sys.argv[1], encoding="utf-8") as f:
+    module = ctx.add_module(sys.argv[1], f.read())
+ctx.validate()
+if ctx.errors:
+    sys.exit('%s: validation failed' % sys.argv[1])
+
+validators = instance.get_leaf_validators([module])
+for path in sorted(validators):
+    print(path)
+
+columns = {
+    '/a:top/r': ['0', '100', '101', 'x', '100', '0o7'],
+    '/a:top/lr': ['5', '0x5', '200'],
+    '/a:top/s': ['ab', 'abcde', 'A', ''],
+    '/a:top/e': ['one', 'two', 'three'],
+    '/a:top/b': ['', 'x', 'y x', 'z'],
+    '/a:top/u': ['-5', 'none', '300', '0x1', '+7'],
+    '/a:top/i': ['a', 'a:a', 'base'],
+    '/a:top/d': ['1.25', '-0.1', '1.255', '11'],
+    '/a:top/m': ['', 'x'],
+    '/a:top/x': ['true', 'false', '1'],
+    '/a:top/l/ll': ['1', '0x10', 'a', '010', '+3', '1_0'],
+}
+errors = instance.validate_columns(validators, columns)
+for path in sorted(errors):
+    for (i, msg) in errors[path]:
+        print('%s %d %s: %s' % (path, i, columns[path][i], msg))
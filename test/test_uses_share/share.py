@@ -0,0 +1,47 @@
+#! /usr/bin/env python
+
+# This program checks that the substatements which are shared by a
+# grouping and its expanded copies are not changed by a refine or a
+# deviation of one of the copies: u1 refines the presence and the
+# description of the container, dev.yang replaces the units of the
+# leaf in u2 and deletes them in u3, and u4 and the grouping itself
+# must keep their original values.
+
+import sys
+
+from pyang import context
+from pyang import plugin
+from pyang import repository
+
+plugin.init([])
+ctx = context.Context(repository.FileRepository('.', use_env=False))
+with open('a.yang', encoding="utf-8") as f:
+    a = ctx.add_module('a.yang', f.read())
+with open('dev.yang', encoding="utf-8") as f:
+    ctx.deviation_modules.append(ctx.add_module('dev.yang', f.read()))
+ctx.validate()
+if ctx.errors:
+    sys.exit('validation failed')
+
+def arg(stmt, keyword):
+    s = stmt.search_one(keyword)
+    return None if s is None else s.arg
+
+def child(stmt, keyword, name):
+    return stmt.search_one(keyword, name, stmt.i_children)
+
+def report(what, c):
+    l = child(c, 'leaf', 'l')
+    print('%s: presence %r, description %r; l: units %r, description %r' %
+          (what, arg(c, 'presence'), arg(c, 'description'),
+           arg(l, 'units'), arg(l, 'description')))
+
+g = a.search_one('grouping', 'g').search_one('container', 'c')
+report('g', g)
+for name in ('u1', 'u2', 'u3', 'u4'):
+    report(name, child(child(a, 'container', name), 'container', 'c'))
+
+# the statements which are not refined or deviated are shared
+u4 = child(child(a, 'container', 'u4'), 'container', 'c')
+print('u4 shares the description of c: %s' %
+      (u4.search_one('description') is g.search_one('description')))
@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+
+# This program validates a module which imports a module from the
+# same directory, and then changes the files of the modules in a
+# scratch directory.  The changes are found with a PollWatcher, and
+# the context is updated with a ModuleUpdater; the type of the leaf
+# in the primary module and the errors are printed after each change.
+# The errors are kept in the context between the changes, as in
+# pyang --watch.
+
+import os
+import shutil
+import sys
+
+from pyang import context
+from pyang import plugin
+from pyang import repository
+from pyang import watch
+
+work = sys.argv[1]
+shutil.rmtree(work, ignore_errors=True)
+os.mkdir(work)
+for name in ('a.yang', 'b.yang'):
+    shutil.copy(name, work)
+
+plugin.init([])
+ctx = context.Context(repository.FileRepository(work, use_env=False))
+filename = os.path.join(work, 'a.yang')
+
+def add_primary_module(filename, text):
+    return ctx.add_module(filename, text, primary_module=True)
+
+def report(what, modules):
+    print('# %s' % what)
+    for m in modules:
+        spec = m.search_one('leaf', 'x').search_one('type').i_type_spec
+        print('%s: x is %s' % (m.arg, spec.name if spec else 'unknown'))
+    for (epos, etag, eargs) in sorted(ctx.errors, key=lambda e: e[0].line):
+        print('%s:%d: %s' % (os.path.basename(epos.ref), epos.line, etag))
+
+def change(name, old, new):
+    path = os.path.join(work, name)
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text.replace(old, new))
+
+def wait():
+    (changed, dirs_changed) = watcher.wait()
+    print('changed: %s%s' % (' '.join(sorted(os.path.basename(f)
+                                             for f in changed)),
+                             ', directory changed' if dirs_changed else ''))
+    modules = updater.update(changed, dirs_changed)
+    ctx.validate()
+    return modules
+
+with open(filename, encoding='utf-8') as f:
+    modules = [add_primary_module(filename, f.read())]
+ctx.validate()
+report('start', modules)
+
+updater = watch.ModuleUpdater(ctx, [filename], [], add_primary_module)
+watcher = watch.PollWatcher(0.05)
+
+# a change in the imported module revalidates the primary module
+watcher.watch(updater.get_files(), updater.get_dirs())
+change('b.yang', 'type string;', 'type int8;')
+report('b changed', wait())
+
+# an error in the imported module
+watcher.watch(updater.get_files(), updater.get_dirs())
+change('b.yang', 'type int8;', 'type undefined;')
+report('b broken', wait())
+
+# a new module is found when the directory changes
+watcher.watch(updater.get_files(), updater.get_dirs())
+with open(os.path.join(work, 'c2.yang'), 'w', encoding='utf-8') as f:
+    f.write('module c2 { namespace urn:c2; prefix c; typedef t { type uint16; } }')
+change('a.yang', 'import b', 'import c2')
+report('c2 added', wait())
+
+# a syntax error in the primary module, and its error goes away when
+# it is fixed
+watcher.watch(updater.get_files(), updater.get_dirs())
+change('a.yang', 'type b:t;', 'type b:t')
+report('a broken', wait())
+watcher.watch(updater.get_files(), updater.get_dirs())
+change('a.yang', 'type b:t\n', 'type b:t;\n')
+report('a fixed', wait())
+
+shutil.rmtree(work)